@@ -43,6 +43,15 @@ The most likely required settings are: SECRET_KEY, DEBUG, ALLOWED_HOSTS, DATABAS
   default: sqlite://db.sqlite3
   URL to database - uses format described at https://github.com/jacobian/dj-database-url
 
+- CACHE_LOCATION
+  default: .cache
+  Directory where cached data (e.g. network snapshots) should be stored - shared by all worker
+  processes
+
+- EXPORT_ROOT
+  default: .exports
+  Directory where exported data files are written by the export worker - shared with the web server
+
 - DBBACKUP_STORAGE_LOCATION
   default: .dbbackup
   Directory where database backups should be stored
@@ -218,6 +227,21 @@ DATABASES = {
            cast=dj_database_url.parse)
 }
 
+# Cache - must be shared between worker processes so that invalidation is seen by all of them
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_LOCATION',
+                           default=str(BASE_DIR.joinpath('.cache'))),
+    }
+}
+
+# Exported data files - written by `manage.py export_worker`
+
+EXPORT_ROOT = config('EXPORT_ROOT', default=str(BASE_DIR.joinpath('.exports')))
+
 # Django DBBackup
 # https://django-dbbackup.readthedocs.io/en/stable/index.html
 
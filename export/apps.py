@@ -1,5 +1,28 @@
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
 
 class ExportConfig(AppConfig):
     name = 'export'
+
+    def ready(self) -> None:
+        from . import changes, stats, versioning
+
+        # Exported data is out of date when the data it is built from changes
+        for model in versioning.get_source_models():
+            post_save.connect(versioning.invalidate, sender=model)
+            post_delete.connect(versioning.invalidate, sender=model)
+            post_save.connect(changes.record_saved, sender=model)
+
+            # Answers are added to answer sets using many to many tables - which send this instead
+            if model._meta.auto_created:
+                m2m_changed.connect(versioning.invalidate, sender=model)
+                m2m_changed.connect(changes.record_m2m_changed, sender=model)
+
+        # Keep counts of the records of each exported table
+        for model in stats.get_models():
+            post_save.connect(stats.record_saved, sender=model)
+            post_delete.connect(stats.record_deleted, sender=model)
+
+            if model._meta.auto_created:
+                m2m_changed.connect(stats.record_m2m_changed, sender=model)
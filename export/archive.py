@@ -0,0 +1,89 @@
+"""
+Export all datasets as CSV files in a single zip archive.
+
+Datasets are written at the same time by a pool of processes, each with its own database
+connection, so that the archive takes about as long as the largest dataset rather than all of them.
+"""
+
+import concurrent.futures
+import os
+import pathlib
+import shutil
+import tempfile
+import typing
+import zipfile
+
+import django
+from django.db import connections
+
+from . import datasets, writers
+
+
+def init_worker() -> None:
+    """Prepare a worker process - which opens its own database connection when first needed."""
+    # Needed if processes are spawned rather than forked
+    django.setup()
+
+
+def write_dataset(name: str, directory: str) -> typing.Tuple[str, int]:
+    """Write a dataset to a CSV file in a directory - in a worker process.
+
+    :return: Name of the dataset and number of rows written
+    """
+    dataset = datasets.DATASETS[name]
+    n_rows = 0
+
+    def progress(rows_written):
+        nonlocal n_rows
+        n_rows = rows_written
+
+    try:
+        with open(os.path.join(directory, f'{name}.csv'), 'w', newline='',
+                  encoding='utf-8') as f:
+            f.writelines(
+                writers.csv_rows(dataset.serializer_class, dataset.get_queryset(),
+                                 progress=progress))
+
+    finally:
+        connections.close_all()
+
+    return name, n_rows
+
+
+def write_archive(path: typing.Union[str, pathlib.Path],
+                  progress: typing.Optional[typing.Callable[[int], None]] = None,
+                  max_workers: typing.Optional[int] = None) -> None:
+    """Write all datasets as CSV files in a zip archive.
+
+    :param path: Path of the zip archive
+    :param progress: Function called with the total number of rows written as each dataset is done
+    :param max_workers: Number of processes - defaults to the number of CPUs
+    """
+    path = pathlib.Path(path)
+    names = list(datasets.DATASETS)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    directory = tempfile.mkdtemp(prefix=path.name, dir=path.parent)
+    try:
+        # Worker processes must not share this process's connections
+        connections.close_all()
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(max_workers, len(names)),
+                                                    initializer=init_worker) as executor:
+            futures = [executor.submit(write_dataset, name, directory) for name in names]
+
+            n_rows = 0
+            for future in concurrent.futures.as_completed(futures):
+                name, n_dataset_rows = future.result()
+                n_rows += n_dataset_rows
+
+                if progress is not None:
+                    progress(n_rows)
+
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for name in names:
+                archive.write(os.path.join(directory, f'{name}.csv'), arcname=f'{name}.csv')
+
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,233 @@
+"""
+Export all datasets as a single SQLite database, compressed in a zip archive.
+
+Each dataset becomes a table with the same columns as its CSV export, but with typed columns,
+primary and foreign keys between the tables and indexes on the foreign keys - so that the
+datasets may be loaded and joined without parsing and re-linking ten CSV files.
+"""
+
+import os
+import pathlib
+import sqlite3
+import typing
+import zipfile
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Model
+from rest_framework import serializers
+
+from . import datasets, writers
+
+#: Name of the database within the archive
+DATABASE_NAME = 'breccia-mapper.sqlite3'
+
+#: SQLite column types of Django model fields - other fields are stored as text
+SQL_TYPES = {
+    'AutoField': 'INTEGER',
+    'BigAutoField': 'INTEGER',
+    'BigIntegerField': 'INTEGER',
+    'BooleanField': 'BOOLEAN',
+    'DateField': 'DATE',
+    'DateTimeField': 'TIMESTAMP',
+    'DecimalField': 'DECIMAL',
+    'FloatField': 'REAL',
+    'ForeignKey': 'INTEGER',
+    'IntegerField': 'INTEGER',
+    'NullBooleanField': 'BOOLEAN',
+    'OneToOneField': 'INTEGER',
+    'PositiveIntegerField': 'INTEGER',
+    'PositiveSmallIntegerField': 'INTEGER',
+    'SmallIntegerField': 'INTEGER',
+}
+
+
+class Column(typing.NamedTuple):
+    """A column of a table in the exported database."""
+    name: str
+
+    type: str = 'TEXT'
+
+    #: Is this the primary key of its table?
+    primary_key: bool = False
+
+    #: Table referred to by this column, if it is a foreign key
+    references: typing.Optional[str] = None
+
+
+def quote(name: str) -> str:
+    """Quote an SQL identifier - column names contain dots."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def table_name(dataset: 'datasets.Dataset') -> str:
+    return dataset.name.replace('-', '_')
+
+
+def sql_value(value: typing.Any) -> typing.Any:
+    """Convert a serialized value to a type which may be stored by SQLite.
+
+    Answers to hardcoded questions may be objects such as countries - which are written as text,
+    as they are in CSV exports.
+    """
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+
+    return str(value)
+
+
+def get_model_field(model: typing.Type[Model], source: str):
+    """Get the model field serialized by a serializer field, if it is one."""
+    if source == 'pk':
+        return model._meta.pk
+
+    try:
+        return model._meta.get_field(source)
+
+    except FieldDoesNotExist:
+        # Not a model field - e.g. a property or method
+        return None
+
+
+def describe_fields(serializer: serializers.BaseSerializer,
+                    model: typing.Type[Model],
+                    tables: typing.Mapping[typing.Type[Model], str],
+                    prefix: str = '') -> typing.Dict[str, Column]:
+    """Describe the columns produced by the fields of a serializer - including nested serializers.
+
+    :param serializer: Serializer of instances of `model`
+    :param model: Model serialized by this part of the serializer tree
+    :param tables: Table names of exported models - to find foreign keys
+    :param prefix: Prefix of flattened column names for this part of the serializer tree
+    """
+    columns = {}
+    for key, field in serializer.fields.items():
+        model_field = get_model_field(model, field.source)
+        name = prefix + key
+
+        if isinstance(field, serializers.BaseSerializer):
+            if model_field is None or model_field.related_model is None:
+                continue
+
+            related_model = model_field.related_model
+            nested = describe_fields(field, related_model, tables, prefix=f'{name}.')
+
+            # The primary key of a related object refers to that object's table
+            for column in nested.values():
+                if column.primary_key:
+                    nested[column.name] = column._replace(primary_key=False,
+                                                          references=tables.get(related_model))
+
+            columns.update(nested)
+
+        elif model_field is not None:
+            columns[name] = Column(name,
+                                   type=SQL_TYPES.get(model_field.get_internal_type(), 'TEXT'),
+                                   primary_key=model_field.primary_key)
+
+    return columns
+
+
+def get_columns(dataset: 'datasets.Dataset', serializer: serializers.BaseSerializer,
+                tables: typing.Mapping[typing.Type[Model], str]) -> typing.List[Column]:
+    """Describe the columns of the table of a dataset - in the order of its CSV export."""
+    described = describe_fields(serializer, dataset.view_class.model, tables)
+
+    # A question may share its slug with another column
+    names = dict.fromkeys(serializer.column_headers)
+
+    return [described.get(name, Column(name)) for name in names]
+
+
+def create_table(connection: sqlite3.Connection, table: str,
+                 columns: typing.Sequence[Column]) -> None:
+    definitions = []
+    for column in columns:
+        definition = f'{quote(column.name)} {column.type}'
+        if column.primary_key:
+            definition += ' PRIMARY KEY'
+
+        elif column.references is not None:
+            definition += f' REFERENCES {quote(column.references)}'
+
+        definitions.append(definition)
+
+    connection.execute(f'CREATE TABLE {quote(table)} ({", ".join(definitions)})')
+
+
+def create_indexes(connection: sqlite3.Connection, table: str,
+                   columns: typing.Sequence[Column]) -> None:
+    """Index the foreign keys of a table - after it has been filled, which is faster."""
+    for column in columns:
+        if column.references is not None:
+            index = f'{table}_{column.name.replace(".", "_")}_idx'
+            connection.execute(
+                f'CREATE INDEX {quote(index)} ON {quote(table)} ({quote(column.name)})')
+
+
+def write_database(path: typing.Union[str, pathlib.Path],
+                   progress: typing.Optional[typing.Callable[[int], None]] = None) -> None:
+    """Write all datasets to a new SQLite database.
+
+    Each table is read from the database once, in chunks.
+
+    :param path: Path of the database - must not already exist
+    :param progress: Function called with the total number of rows written after each chunk
+    """
+    tables = {
+        dataset.view_class.model: table_name(dataset) for dataset in datasets.DATASETS.values()
+    }
+
+    connection = sqlite3.connect(str(path))
+    try:
+        # The database is discarded if writing fails - so needs no journal
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+
+        n_previous = 0
+        for dataset in datasets.DATASETS.values():
+            table = table_name(dataset)
+            serializer = dataset.serializer_class()
+            columns = get_columns(dataset, serializer, tables)
+            create_table(connection, table, columns)
+
+            def table_progress(n_rows, n_previous=n_previous):
+                if progress is not None:
+                    progress(n_previous + n_rows)
+
+            # Missing values are stored as NULL rather than empty text
+            insert = (f'INSERT INTO {quote(table)} VALUES '
+                      f'({", ".join("?" for _ in columns)})')
+            connection.executemany(insert, (
+                tuple(sql_value(row.get(column.name)) for column in columns)
+                for row in writers.serialized_rows(serializer,
+                                                   dataset.get_queryset(),
+                                                   progress=table_progress)))
+
+            create_indexes(connection, table, columns)
+            connection.commit()
+
+            n_previous += connection.execute(f'SELECT COUNT(*) FROM {quote(table)}').fetchone()[0]
+
+    finally:
+        connection.close()
+
+
+def write_bundle(path: typing.Union[str, pathlib.Path],
+                 progress: typing.Optional[typing.Callable[[int], None]] = None) -> None:
+    """Write all datasets to a SQLite database compressed in a zip archive.
+
+    :param path: Path of the zip archive
+    :param progress: Function called with the total number of rows written after each chunk
+    """
+    path = pathlib.Path(path)
+    database_path = path.with_name(path.name + '.sqlite3')
+
+    try:
+        write_database(database_path, progress=progress)
+
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.write(database_path, arcname=DATABASE_NAME)
+
+    finally:
+        if database_path.exists():
+            os.remove(database_path)
@@ -0,0 +1,105 @@
+"""
+Log of changes to exported data, allowing exports of only the rows which changed since a cursor.
+
+Every save of an object in the people or activities apps records a :class:`DataChange`.  The
+number of the latest change is the cursor returned by an export, so that a later export may
+select the rows built from any object which has changed since.
+
+Deleted objects are not reported - a full export is needed to find them.
+"""
+
+import typing
+
+from django.db.models import Model, Q, QuerySet
+from rest_framework import serializers
+
+from .models import DataChange
+from .serializers.base import FlattenedModelSerializer
+
+#: Name of the relation from an answer set to the object it describes
+ANSWER_SETS_RELATED_NAME = 'answer_sets'
+
+
+def record(model: typing.Type[Model], pks: typing.Iterable[int]) -> None:
+    """Record changes to several objects of a model."""
+    label = model._meta.label_lower
+
+    DataChange.objects.bulk_create(
+        [DataChange(model=label, object_id=pk) for pk in set(pks) if pk is not None])
+
+
+def record_saved(sender: typing.Type[Model], instance: Model, **kwargs) -> None:
+    """Record that an object was saved - to be used as a `post_save` receiver."""
+    record(sender, [instance.pk])
+
+    # A new answer set changes the current state of the object it describes
+    for field in sender._meta.concrete_fields:
+        if field.is_relation and field.remote_field.related_name == ANSWER_SETS_RELATED_NAME:
+            record(field.related_model, [getattr(instance, field.attname)])
+
+
+def record_m2m_changed(sender: typing.Type[Model], instance: Model, action: str,
+                       model: typing.Type[Model], pk_set: typing.Optional[typing.Set[int]],
+                       **kwargs) -> None:
+    """Record that objects were linked or unlinked - to be used as an `m2m_changed` receiver.
+
+    Both the object whose relation changed and the objects added or removed have changed.
+    """
+    if not action.startswith('post_'):
+        return
+
+    record(type(instance), [instance.pk])
+    if pk_set:
+        record(model, pk_set)
+
+
+def get_cursor() -> int:
+    """Get the number of the latest change - to be passed to a later export as `since`."""
+    return DataChange.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def related_lookups(serializer: serializers.BaseSerializer,
+                    model: typing.Type[Model],
+                    prefix: str = '') -> typing.Iterator[typing.Tuple[str, typing.Type[Model]]]:
+    """Find the related objects from which a serializer builds its output.
+
+    These are the objects of nested serializers and any dependencies declared by the serializers
+    - see :meth:`FlattenedModelSerializer.get_dependencies`.
+
+    :return: Pairs of lookup from `model` to a related object and the model of that object
+    """
+    for field in serializer.fields.values():
+        if isinstance(field, serializers.BaseSerializer):
+            related_model = model._meta.get_field(field.source).related_model
+            lookup = prefix + field.source
+
+            yield lookup, related_model
+            yield from related_lookups(field, related_model, prefix=f'{lookup}__')
+
+    if isinstance(serializer, FlattenedModelSerializer):
+        for lookup, related_model in serializer.get_dependencies():
+            yield prefix + lookup, related_model
+
+
+def changed_since(queryset: QuerySet, serializer: serializers.BaseSerializer,
+                  since: int) -> QuerySet:
+    """Filter to objects whose serialized rows may have changed since a cursor.
+
+    A row has changed if the object itself has changed, or any related object included in the row.
+
+    :param queryset: Objects to be serialized
+    :param serializer: Serializer for the model of the queryset
+    :param since: Cursor returned by a previous export
+    """
+    def changed(model: typing.Type[Model]) -> QuerySet:
+        return DataChange.objects.filter(model=model._meta.label_lower,
+                                         pk__gt=since).values('object_id')
+
+    condition = Q(pk__in=changed(queryset.model))
+    for lookup, related_model in related_lookups(serializer, queryset.model):
+        condition |= Q(**{f'{lookup}__in': changed(related_model)})
+
+    # Lookups through many related objects would repeat rows if used in the filter directly
+    changed_pks = queryset.model._default_manager.filter(condition).values('pk')
+
+    return queryset.filter(pk__in=changed_pks)
@@ -0,0 +1,53 @@
+"""
+Datasets which may be exported - by a request to the export views or by a background job.
+"""
+
+import collections
+import typing
+
+from django.db.models import QuerySet
+
+from .views import activities, base, people
+
+
+class Dataset(typing.NamedTuple):
+    """A table which may be exported as CSV."""
+    #: Identifier used in URLs and file names
+    name: str
+
+    #: Name displayed to users
+    title: str
+
+    #: Name of URL pattern of the view exporting this dataset in a request
+    url_name: str
+
+    #: View exporting this dataset in a request - defines the model and serializer
+    view_class: typing.Type[base.CsvExportView]
+
+    @property
+    def serializer_class(self) -> typing.Type:
+        return self.view_class.serializer_class
+
+    def get_queryset(self) -> QuerySet:
+        return self.view_class.model._default_manager.order_by('pk')
+
+
+DATASETS = collections.OrderedDict((dataset.name, dataset) for dataset in [
+    Dataset('people', 'People', 'person', people.PersonExportView),
+    Dataset('person-answer-sets', 'Person Answer Sets', 'person-answer-set',
+            people.PersonAnswerSetExportView),
+    Dataset('relationships', 'Relationships', 'relationship', people.RelationshipExportView),
+    Dataset('relationship-answer-sets', 'Relationship Answer Sets', 'relationship-answer-set',
+            people.RelationshipAnswerSetExportView),
+    Dataset('organisation', 'Organisation', 'organisation', people.OrganisationExportView),
+    Dataset('organisation-answer-sets', 'Organisation Answer Sets', 'organisation-answer-set',
+            people.OrganisationAnswerSetExportView),
+    Dataset('organisation-relationships', 'Organisation Relationships',
+            'organisation-relationship', people.OrganisationRelationshipExportView),
+    Dataset('organisation-relationship-answer-sets', 'Organisation Relationship Answer Sets',
+            'organisation-relationship-answer-set',
+            people.OrganisationRelationshipAnswerSetExportView),
+    Dataset('activities', 'Activities', 'activity', activities.ActivityExportView),
+    Dataset('activity-attendance', 'Activity Attendance', 'activity-attendance',
+            activities.ActivityAttendanceExportView),
+])
@@ -0,0 +1,310 @@
+"""
+Write the filtered network in formats for graph analysis tools - GraphML, GEXF and edge lists.
+
+Nodes and edges are those of the network snapshot shown by the network view, with the answers
+valid at the date of the network as attributes.  Output is produced one element at a time and
+answers are loaded in chunks, so memory use does not grow with the number of answers.
+"""
+
+import csv
+import datetime
+import typing
+from xml.sax.saxutils import escape, quoteattr
+
+from people import network
+
+from . import writers
+from .serializers import people as serializers
+
+
+class Attribute(typing.NamedTuple):
+    """An attribute of nodes or edges."""
+    #: Name of the attribute - question attributes are prefixed by the kind of element
+    name: str
+
+    #: GraphML type of the attribute values
+    type: str = 'string'
+
+
+class ElementKind(typing.NamedTuple):
+    """A kind of node or edge - with the answer sets from which its attributes are read."""
+    #: Prefix of element ids and of attribute names - as in the network view
+    prefix: str
+
+    #: Name of the table of these elements in a network snapshot
+    table: str
+
+    serializer_class: typing.Optional[typing.Type[serializers.AnswerSetSerializer]] = None
+
+    #: Name of the field of the answer sets referring to the element
+    owner_field: typing.Optional[str] = None
+
+
+#: Kinds of node in the network
+NODE_KINDS = [
+    ElementKind('person', 'people', serializers.PersonAnswerSetSerializer, 'person'),
+    ElementKind('organisation', 'organisations', serializers.OrganisationAnswerSetSerializer,
+                'organisation'),
+]
+
+#: Kinds of edge in the network - with the tables of nodes at their source and target
+EDGE_KINDS = [
+    (ElementKind('relationship', 'relationships', serializers.RelationshipAnswerSetSerializer,
+                 'relationship'), 'people', 'people'),
+    (ElementKind('organisation-relationship', 'organisation_relationships',
+                 serializers.OrganisationRelationshipAnswerSetSerializer,
+                 'relationship'), 'people', 'organisations'),
+    (ElementKind('organisation-relationship-membership', 'memberships'), 'people', 'organisations'),
+]
+
+#: Attributes of every node
+NODE_ATTRIBUTES = [
+    Attribute('kind'),
+    Attribute('name'),
+    Attribute('x', 'double'),
+    Attribute('y', 'double'),
+    Attribute('degree', 'int'),
+]
+
+#: Attributes of every edge
+EDGE_ATTRIBUTES = [
+    Attribute('kind'),
+]
+
+#: Columns of edge lists before any attributes
+EDGE_LIST_COLUMNS = ['source', 'target', 'id']
+
+#: Element types of GEXF attributes
+GEXF_TYPES = {
+    'string': 'string',
+    'double': 'double',
+    'int': 'integer',
+}
+
+Element = typing.Tuple[str, typing.Dict[str, typing.Any]]
+Edge = typing.Tuple[str, str, str, typing.Dict[str, typing.Any]]
+
+
+class Graph:
+    """The network matching a set of valid filter forms, ready to be written."""
+    def __init__(self, all_forms):
+        self.snapshot = network.get_snapshot(all_forms)
+        self.at_date = network.get_at_date(all_forms)
+
+        self.answer_serializers = {
+            kind.prefix: kind.serializer_class()
+            for kind in NODE_KINDS + [edge_kind for edge_kind, *tables in EDGE_KINDS]
+            if kind.serializer_class is not None
+        }
+
+    def question_attributes(self, kind: ElementKind) -> typing.List[Attribute]:
+        """Get attributes for the answers to questions about a kind of element."""
+        if kind.serializer_class is None:
+            return []
+
+        return [
+            Attribute(f'{kind.prefix}.{serializers.underscore(slug)}')
+            for question, slug in self.answer_serializers[kind.prefix].questions
+        ]
+
+    @property
+    def node_attributes(self) -> typing.List[Attribute]:
+        attributes = list(NODE_ATTRIBUTES)
+        for kind in NODE_KINDS:
+            attributes.extend(self.question_attributes(kind))
+
+        return attributes
+
+    @property
+    def edge_attributes(self) -> typing.List[Attribute]:
+        attributes = list(EDGE_ATTRIBUTES)
+        for kind, *tables in EDGE_KINDS:
+            attributes.extend(self.question_attributes(kind))
+
+        return attributes
+
+    def answers(self, kind: ElementKind,
+                pks: typing.Sequence[int]) -> typing.Dict[int, typing.Dict[str, typing.Any]]:
+        """Get attributes from the answers about a chunk of elements valid at the network date."""
+        if kind.serializer_class is None:
+            return {}
+
+        serializer = self.answer_serializers[kind.prefix]
+        answer_sets = list(kind.serializer_class.Meta.model.objects.as_of(self.at_date).filter(**{
+            f'{kind.owner_field}__in': pks
+        }).order_by('timestamp'))
+        serializer.prefetch(answer_sets)
+
+        # Should only be one valid answer set for each element - but if not take the latest
+        answers = {}
+        for answer_set in answer_sets:
+            answers[getattr(answer_set, f'{kind.owner_field}_id')] = {
+                f'{kind.prefix}.{serializers.underscore(slug)}': answer
+                for slug, answer in serializer.build_question_answers(answer_set).items()
+            }
+
+        return answers
+
+    def nodes(self) -> typing.Iterator[Element]:
+        """Get the id and attributes of each node."""
+        for kind in NODE_KINDS:
+            table = self.snapshot[kind.table]
+
+            for start in range(0, len(table['id']), writers.CHUNK_SIZE):
+                rows = range(start, min(start + writers.CHUNK_SIZE, len(table['id'])))
+                answers = self.answers(kind, [table['id'][i] for i in rows])
+
+                for i in rows:
+                    pk = table['id'][i]
+                    yield f'{kind.prefix}-{pk}', {
+                        'kind': kind.prefix,
+                        'name': table['name'][i],
+                        'x': table['x'][i],
+                        'y': table['y'][i],
+                        'degree': table['degree'][i],
+                        **answers.get(pk, {}),
+                    }
+
+    def edges(self) -> typing.Iterator[Edge]:
+        """Get the id, source node id, target node id and attributes of each edge."""
+        for kind, source_table, target_table in EDGE_KINDS:
+            table = self.snapshot[kind.table]
+            source_ids = self.snapshot[source_table]['id']
+            target_ids = self.snapshot[target_table]['id']
+            source_prefix = node_prefix(source_table)
+            target_prefix = node_prefix(target_table)
+
+            for start in range(0, len(table['id']), writers.CHUNK_SIZE):
+                rows = range(start, min(start + writers.CHUNK_SIZE, len(table['id'])))
+                answers = self.answers(kind, [table['id'][i] for i in rows])
+
+                for i in rows:
+                    pk = table['id'][i]
+                    yield (
+                        f'{kind.prefix}-{pk}',
+                        f'{source_prefix}-{source_ids[table["source"][i]]}',
+                        f'{target_prefix}-{target_ids[table["target"][i]]}',
+                        {'kind': kind.prefix, **answers.get(pk, {})},
+                    )
+
+
+def node_prefix(table: str) -> str:
+    """Get the id prefix of the nodes in a table of a network snapshot."""
+    return next(kind.prefix for kind in NODE_KINDS if kind.table == table)
+
+
+def is_present(value: typing.Any) -> bool:
+    """Should an attribute value be written?  Unanswered questions are left out."""
+    return value is not None and value != ''
+
+
+def graphml(graph: Graph) -> typing.Iterator[str]:
+    """Write a network as GraphML."""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield ('<graphml xmlns="http://graphml.graphdrawing.org/xmlns"'
+           ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+           ' xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns'
+           ' http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">\n')
+
+    keys = {}
+    for domain, attributes in [('node', graph.node_attributes), ('edge', graph.edge_attributes)]:
+        keys[domain] = {}
+        for i, attribute in enumerate(attributes):
+            key = f'{domain[0]}{i}'
+            keys[domain][attribute.name] = key
+            yield (f'  <key id="{key}" for="{domain}" attr.name={quoteattr(attribute.name)}'
+                   f' attr.type="{attribute.type}"/>\n')
+
+    yield '  <graph id="G" edgedefault="directed">\n'
+
+    def data(domain, values):
+        return ''.join(f'<data key="{keys[domain][name]}">{escape(str(value))}</data>'
+                       for name, value in values.items() if is_present(value))
+
+    for node_id, values in graph.nodes():
+        yield f'    <node id={quoteattr(node_id)}>{data("node", values)}</node>\n'
+
+    for edge_id, source, target, values in graph.edges():
+        yield (f'    <edge id={quoteattr(edge_id)} source={quoteattr(source)}'
+               f' target={quoteattr(target)}>{data("edge", values)}</edge>\n')
+
+    yield '  </graph>\n'
+    yield '</graphml>\n'
+
+
+def gexf(graph: Graph) -> typing.Iterator[str]:
+    """Write a network as GEXF - node names are labels and layout positions are included."""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield ('<gexf xmlns="http://www.gexf.net/1.2draft"'
+           ' xmlns:viz="http://www.gexf.net/1.2draft/viz" version="1.2">\n')
+    yield (f'  <meta lastmodifieddate="{datetime.date.today().isoformat()}">'
+           '<creator>BRECcIA Mapper</creator></meta>\n')
+    yield '  <graph mode="static" defaultedgetype="directed">\n'
+
+    # Names and positions have their own places in GEXF
+    node_attributes = [
+        attribute for attribute in graph.node_attributes if attribute.name not in {'name', 'x', 'y'}
+    ]
+
+    ids = {}
+    for domain, attributes in [('node', node_attributes), ('edge', graph.edge_attributes)]:
+        ids[domain] = {attribute.name: str(i) for i, attribute in enumerate(attributes)}
+
+        yield f'    <attributes class="{domain}">\n'
+        for attribute in attributes:
+            yield (f'      <attribute id="{ids[domain][attribute.name]}"'
+                   f' title={quoteattr(attribute.name)} type="{GEXF_TYPES[attribute.type]}"/>\n')
+        yield '    </attributes>\n'
+
+    def attvalues(domain, values):
+        present = ''.join(f'<attvalue for="{ids[domain][name]}" value={quoteattr(str(value))}/>'
+                          for name, value in values.items()
+                          if name in ids[domain] and is_present(value))
+
+        return f'<attvalues>{present}</attvalues>' if present else ''
+
+    yield '    <nodes>\n'
+    for node_id, values in graph.nodes():
+        yield (f'      <node id={quoteattr(node_id)} label={quoteattr(values["name"])}>'
+               f'{attvalues("node", values)}'
+               f'<viz:position x="{values["x"]}" y="{values["y"]}" z="0.0"/></node>\n')
+    yield '    </nodes>\n'
+
+    yield '    <edges>\n'
+    for edge_id, source, target, values in graph.edges():
+        yield (f'      <edge id={quoteattr(edge_id)} source={quoteattr(source)}'
+               f' target={quoteattr(target)}>'
+               f'{attvalues("edge", values)}</edge>\n')
+    yield '    </edges>\n'
+
+    yield '  </graph>\n'
+    yield '</gexf>\n'
+
+
+def edge_list(graph: Graph) -> typing.Iterator[str]:
+    """Write the edges of a network as CSV - with their attributes."""
+    attributes = [attribute.name for attribute in graph.edge_attributes]
+    writer = csv.DictWriter(writers.Echo(),
+                            dialect=writers.QuotedCsv,
+                            fieldnames=EDGE_LIST_COLUMNS + attributes)
+    yield writer.writeheader()
+
+    for edge_id, source, target, values in graph.edges():
+        yield writer.writerow({'source': source, 'target': target, 'id': edge_id, **values})
+
+
+class Format(typing.NamedTuple):
+    """A format in which the network may be exported."""
+    write: typing.Callable[[Graph], typing.Iterator[str]]
+
+    content_type: str
+
+    extension: str
+
+
+#: Formats in which the network may be exported - by name used in URLs
+FORMATS = {
+    'graphml': Format(graphml, 'application/graphml+xml', 'graphml'),
+    'gexf': Format(gexf, 'application/gexf+xml', 'gexf'),
+    'edge-list': Format(edge_list, 'text/csv', 'csv'),
+}
@@ -0,0 +1,169 @@
+"""
+Background export jobs.
+
+Staff request an export of a dataset, which is written to a file under `settings.EXPORT_ROOT`
+by a worker process - see `manage.py export_worker`.  Files are reused by later requests for
+the same dataset until the data version changes.
+"""
+
+import logging
+import os
+import typing
+
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from . import archive, bundle, datasets, versioning, writers
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+#: How long files are kept after a newer export of their dataset finishes - to allow downloads
+#: in progress, or being resumed, to complete
+STALE_FILE_AGE = timezone.timedelta(days=1)
+
+
+def request_export(dataset: str, user=None) -> ExportJob:
+    """Get a job exporting the current version of a dataset - reusing an existing job if possible.
+
+    :param dataset: Name of the dataset - key of :data:`export.datasets.DATASETS` or an archive
+        of several datasets - see :attr:`ExportJob.ARCHIVE_CHOICES`
+    :param user: User requesting the export
+    """
+    if dataset not in datasets.DATASETS and dataset not in dict(ExportJob.ARCHIVE_CHOICES):
+        raise KeyError(f'No dataset named {dataset}')
+
+    data_version = versioning.get_data_version()
+
+    with transaction.atomic():
+        for job in ExportJob.objects.filter(
+                dataset=dataset,
+                data_version=data_version,
+                status__in=[ExportJob.PENDING, ExportJob.RUNNING, ExportJob.DONE]):
+            if job.status != ExportJob.DONE or job.path.exists():
+                return job
+
+        return ExportJob.objects.create(dataset=dataset,
+                                        data_version=data_version,
+                                        requested_by=user)
+
+
+def claim_next() -> typing.Optional[ExportJob]:
+    """Claim the oldest waiting job - safe to use from several workers at once."""
+    for job in ExportJob.objects.filter(status=ExportJob.PENDING).order_by('created'):
+        claimed = ExportJob.objects.filter(pk=job.pk, status=ExportJob.PENDING).update(
+            status=ExportJob.RUNNING, started=timezone.now())
+
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+    return None
+
+
+#: Functions writing each kind of archive of several datasets
+ARCHIVE_WRITERS = {
+    ExportJob.CSV_ARCHIVE: archive.write_archive,
+    ExportJob.SQLITE_BUNDLE: bundle.write_bundle,
+}
+
+
+def count_rows(job: ExportJob) -> int:
+    """Count the rows to be written by a job."""
+    if job.is_archive:
+        return sum(dataset.get_queryset().count() for dataset in datasets.DATASETS.values())
+
+    return datasets.DATASETS[job.dataset].get_queryset().count()
+
+
+def write(job: ExportJob, path, progress: typing.Callable[[int], None]) -> None:
+    """Write the exported file of a job."""
+    if job.is_archive:
+        ARCHIVE_WRITERS[job.dataset](path, progress=progress)
+        return
+
+    dataset = datasets.DATASETS[job.dataset]
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        f.writelines(
+            writers.csv_rows(dataset.serializer_class, dataset.get_queryset(), progress=progress))
+
+
+def run(job: ExportJob) -> None:
+    """Write the exported file of a claimed job, recording progress as rows are written."""
+    job.total_rows = count_rows(job)
+    job.save(update_fields=['total_rows'])
+
+    def progress(n_rows):
+        ExportJob.objects.filter(pk=job.pk).update(rows_written=n_rows)
+
+    path = job.path
+    partial_path = path.with_name(path.name + '.partial')
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write(job, partial_path, progress)
+
+        # Files are only visible once complete
+        os.replace(partial_path, path)
+
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.exception('Export job %d of %s failed', job.pk, job.dataset)
+
+        if partial_path.exists():
+            partial_path.unlink()
+
+        job.refresh_from_db()
+        job.status = ExportJob.FAILED
+        job.error = str(exc)
+        job.finished = timezone.now()
+        job.save()
+        return
+
+    job.refresh_from_db()
+    job.status = ExportJob.DONE
+    job.size = path.stat().st_size
+    job.finished = timezone.now()
+    job.save()
+
+    logger.info('Export job %d wrote %d rows of %s', job.pk, job.rows_written, job.dataset)
+
+
+def restart_interrupted() -> int:
+    """Return jobs which were running when a worker stopped to the queue.
+
+    Should only be used when no other worker is running.
+    """
+    return ExportJob.objects.filter(status=ExportJob.RUNNING).update(
+        status=ExportJob.PENDING, started=None, rows_written=0)
+
+
+def remove_stale() -> int:
+    """Delete finished jobs which were superseded a while ago, and their files.
+
+    A job is superseded when a later job for the same dataset finishes - its file is kept for
+    :data:`STALE_FILE_AGE` after that.  The latest finished job of each dataset is never
+    superseded, so is kept to serve downloads and to estimate the size of later exports - see
+    :func:`export.stats.get_estimates`.
+
+    :return: Number of files deleted
+    """
+    cutoff = timezone.now() - STALE_FILE_AGE
+
+    superseded = ExportJob.objects.filter(
+        dataset=OuterRef('dataset'), status=ExportJob.DONE, created__gt=OuterRef('created')
+    ).order_by('finished').values('finished')[:1]
+
+    stale = ExportJob.objects.annotate(superseded=Subquery(superseded)).filter(
+        Q(status=ExportJob.DONE, superseded__lt=cutoff)
+        | Q(status=ExportJob.FAILED, finished__lt=cutoff))
+
+    n_deleted = 0
+    for job in stale:
+        if job.path.exists():
+            job.path.unlink()
+            n_deleted += 1
+
+        job.delete()
+
+    return n_deleted
@@ -0,0 +1,42 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from export import jobs, stats
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class Command(BaseCommand):
+    help = 'Run background export jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once',
+                            action='store_true',
+                            help='Exit when there are no more waiting jobs')
+        parser.add_argument('--interval',
+                            type=float,
+                            default=2.0,
+                            help='Seconds to wait between checks for new jobs')
+
+    def handle(self, *args, **options):
+        n_restarted = jobs.restart_interrupted()
+        if n_restarted:
+            logger.warning('Restarting %d interrupted export jobs', n_restarted)
+
+        while True:
+            job = jobs.claim_next()
+
+            if job is None:
+                jobs.remove_stale()
+                stats.reconcile_if_due()
+
+                if options['once']:
+                    break
+
+                time.sleep(options['interval'])
+                continue
+
+            self.stdout.write(f'Exporting {job.dataset}')
+            jobs.run(job)
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.28 on 2026-10-16 23:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('export', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=255)),
+                ('object_id', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='datachange',
+            index=models.Index(fields=['model', 'id'], name='datachange_model_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.28 on 2026-10-16 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('export', '0002_datachange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=255, unique=True)),
+                ('count', models.IntegerField(default=0)),
+                ('reconciled', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,167 @@
+import pathlib
+import typing
+
+from django.conf import settings
+from django.db import models
+from django.urls import reverse
+
+
+class ExportJob(models.Model):
+    """
+    A request to export a dataset to a file, which is written by a background worker.
+
+    The file may be reused by later requests until the exported data changes.
+    """
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            # For finding reusable jobs for a dataset
+            models.Index(fields=['dataset', 'data_version', 'status'],
+                         name='exportjob_reuse_idx'),
+        ]
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (PENDING, 'Waiting'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    #: Export of all datasets as CSV files in a zip archive - see :mod:`export.archive`
+    CSV_ARCHIVE = 'csv-archive'
+
+    #: Export of all datasets as a zipped SQLite database - see :mod:`export.bundle`
+    SQLITE_BUNDLE = 'sqlite-bundle'
+
+    #: Exports of several datasets in a single zip archive, rather than a CSV file
+    ARCHIVE_CHOICES = [
+        (CSV_ARCHIVE, 'All Data (CSV)'),
+        (SQLITE_BUNDLE, 'All Data (SQLite Database)'),
+    ]
+
+    #: Name of the exported dataset - see :data:`export.datasets.DATASETS` and
+    #: :attr:`ARCHIVE_CHOICES`
+    dataset = models.CharField(max_length=255, blank=False, null=False)
+
+    #: Version of the data when the export was requested - see :mod:`export.versioning`
+    data_version = models.CharField(max_length=255, blank=False, null=False)
+
+    status = models.CharField(max_length=16,
+                              choices=STATUS_CHOICES,
+                              default=PENDING,
+                              blank=False, null=False)
+
+    #: Who requested this export?
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL,
+                                     related_name='export_jobs',
+                                     on_delete=models.SET_NULL,
+                                     blank=True, null=True)
+
+    created = models.DateTimeField(auto_now_add=True, editable=False)
+
+    started = models.DateTimeField(blank=True, null=True)
+
+    finished = models.DateTimeField(blank=True, null=True)
+
+    #: Number of rows to be written - known once the job has started
+    total_rows = models.PositiveIntegerField(blank=True, null=True)
+
+    #: Number of rows written so far
+    rows_written = models.PositiveIntegerField(default=0, blank=False, null=False)
+
+    #: Size of the exported file in bytes
+    size = models.PositiveIntegerField(blank=True, null=True)
+
+    #: Reason the job failed
+    error = models.TextField(blank=True, null=False)
+
+    def __str__(self) -> str:
+        return f'{self.dataset} ({self.get_status_display()})'
+
+    @property
+    def is_archive(self) -> bool:
+        return self.dataset in dict(self.ARCHIVE_CHOICES)
+
+    @property
+    def filename(self) -> str:
+        if self.is_archive:
+            return f'{self.dataset}.zip'
+
+        return f'{self.dataset}.csv'
+
+    @property
+    def content_type(self) -> str:
+        if self.is_archive:
+            return 'application/zip'
+
+        return 'text/csv'
+
+    @property
+    def path(self) -> pathlib.Path:
+        """Path at which the exported file is written."""
+        return pathlib.Path(settings.EXPORT_ROOT).joinpath(f'{self.pk}-{self.filename}')
+
+    @property
+    def progress(self) -> typing.Optional[float]:
+        """Fraction of rows written."""
+        if self.status == self.DONE:
+            return 1.0
+
+        if not self.total_rows:
+            return None
+
+        return min(self.rows_written / self.total_rows, 1.0)
+
+    @property
+    def is_available(self) -> bool:
+        """Can the exported file be downloaded?"""
+        return self.status == self.DONE and self.path.exists()
+
+    def get_absolute_url(self):
+        return reverse('export:job.detail', kwargs={'pk': self.pk})
+
+
+class DataChange(models.Model):
+    """
+    A record that an exported object changed - numbered in the order in which changes were made.
+
+    The number of the latest change is used as a cursor, so that a later export may include only
+    the objects which have changed since - see :mod:`export.changes`.
+    """
+    class Meta:
+        indexes = [
+            # For finding changes to a model since a cursor
+            models.Index(fields=['model', 'id'], name='datachange_model_idx'),
+        ]
+
+    #: Label of the changed object's model - e.g. `people.person`
+    model = models.CharField(max_length=255, blank=False, null=False)
+
+    #: Primary key of the changed object
+    object_id = models.PositiveIntegerField(blank=False, null=False)
+
+    def __str__(self) -> str:
+        return f'{self.model} {self.object_id}'
+
+
+class RecordCount(models.Model):
+    """
+    The number of records of an exported model - maintained as records are saved and deleted.
+
+    See :mod:`export.stats`.
+    """
+    #: Label of the counted model - e.g. `people.person`
+    model = models.CharField(max_length=255, unique=True, blank=False, null=False)
+
+    count = models.IntegerField(default=0, blank=False, null=False)
+
+    #: When was the count last checked against the table?
+    reconciled = models.DateTimeField(blank=False, null=False)
+
+    def __str__(self) -> str:
+        return f'{self.model}: {self.count}'
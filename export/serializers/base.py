@@ -5,8 +5,27 @@ Serialize models to and deserialize from JSON.
 from collections import OrderedDict
 import typing
 
+from django.db.models import Model, prefetch_related_objects
 from rest_framework import serializers
 
+#: Flattened column headers of each serializer class - see `FlattenedModelSerializer.column_headers`
+_flattened_headers = {}
+
+
+def prefetch_nested(serializer: serializers.BaseSerializer, instances: typing.Sequence) -> None:
+    """Load the related objects of nested serializers for a batch of instances in bulk."""
+    for field in serializer.fields.values():
+        if isinstance(field, serializers.BaseSerializer):
+            prefetch_related_objects(instances, field.source)
+
+            related = [getattr(instance, field.source) for instance in instances]
+            related = [obj for obj in related if obj is not None]
+
+            if isinstance(field, FlattenedModelSerializer):
+                field.prefetch(related)
+            else:
+                prefetch_nested(field, related)
+
 
 class FlattenedModelSerializer(serializers.ModelSerializer):
     @classmethod
@@ -48,11 +67,29 @@ class FlattenedModelSerializer(serializers.ModelSerializer):
         """
         Get all column headers that will be output by this serializer.
         """
-        fields = self.flatten_data(self.fields,
-                                   sub_type=serializers.BaseSerializer,
-                                   sub_value_accessor=lambda x: x.fields.items())
+        # Fields are the same for every instance of a serializer class - so only flatten them once
+        cls = type(self)
+        if cls not in _flattened_headers:
+            fields = self.flatten_data(self.fields,
+                                       sub_type=serializers.BaseSerializer,
+                                       sub_value_accessor=lambda x: x.fields.items())
+            _flattened_headers[cls] = list(fields)
+
+        return list(_flattened_headers[cls])
 
-        return list(fields)
+    def get_dependencies(self) -> typing.List[typing.Tuple[str, typing.Type[Model]]]:
+        """
+        Get lookups to related objects, other than those of nested serializers, from which rows are
+        built - so that rows may be exported again when they change.  See :mod:`export.changes`.
+        """
+        return []
+
+    def prefetch(self, instances: typing.Sequence) -> None:
+        """
+        Load data needed to serialize a batch of instances in bulk, so that serializing each of them
+        needs no further queries.
+        """
+        prefetch_nested(self, instances)
 
     def to_representation(self, instance) -> OrderedDict:
         """
@@ -1,8 +1,20 @@
+import collections
 import typing
 
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework import serializers
+
 from people import models
 
 from . import base
+from .. import versioning
+
+#: Prefix for cache keys of the questions answered in each type of answer set
+SCHEMA_CACHE_PREFIX = 'export.schema'
+
+#: How long should questions be kept in the cache?  Seconds
+SCHEMA_CACHE_TIMEOUT = 60 * 60 * 24
 
 
 def underscore(slug: str) -> str:
@@ -14,30 +26,137 @@ def underscore_dict_keys(dict_: typing.Mapping[str, typing.Any]):
     return {underscore(key): value for key, value in dict_.items()}
 
 
+def organisation_names(pks: typing.Iterable[int]) -> typing.Dict[int, str]:
+    """Get the names of organisations as displayed - preferring the names in current answers."""
+    return {
+        pk: display_name or name
+        for pk, name, display_name in models.Organisation.objects.filter(
+            pk__in=set(pks)).values_list('pk', 'name', 'display_name')
+    }
+
+
 class AnswerSetSerializer(base.FlattenedModelSerializer):
     question_model = None
 
+    #: Question answers of the current batch of answer sets - see :meth:`prefetch`
+    _answers = None
+
+    #: Fields referring to an organisation which are used by hardcoded questions
+    _organisation_fields = None
+
+    #: Names of organisations referred to by the current batch of answer sets
+    _organisation_names = None
+
+    @cached_property
+    def questions(self) -> typing.List[typing.Tuple[models.question.Question, str]]:
+        """Get all questions with their slugs - cached until the data changes."""
+        key = (f'{SCHEMA_CACHE_PREFIX}.{self.question_model._meta.label_lower}.'
+               f'{versioning.get_data_version()}')
+
+        def get_questions():
+            return [(question, question.slug) for question in self.question_model.objects.all()]
+
+        return cache.get_or_set(key, get_questions, timeout=SCHEMA_CACHE_TIMEOUT)
+
     @property
     def column_headers(self) -> typing.List[str]:
         headers = super().column_headers
 
         # Add relationship questions to columns
-        for question in self.question_model.objects.all():
-            headers.append(underscore(question.slug))
+        for question, slug in self.questions:
+            headers.append(underscore(slug))
 
         return headers
 
+    def get_dependencies(self) -> typing.List[typing.Tuple[str, typing.Type]]:
+        # Hardcoded questions referring to an organisation display its current name
+        hardcoded_fields = {question.hardcoded_field for question, slug in self.questions}
+
+        return [(field.name, models.Organisation)
+                for field in self.Meta.model._meta.concrete_fields
+                if field.name in hardcoded_fields and field.related_model is models.Organisation]
+
+    def prefetch(self, instances: typing.Sequence[models.question.AnswerSet]) -> None:
+        """Load nested objects and question answers for a batch of answer sets."""
+        super().prefetch(instances)
+
+        # Query the table joining answer sets to answers directly - answers are ordered by choice id,
+        # as read by the per-row query using the unique index of this table
+        field = self.Meta.model._meta.get_field('question_answers')
+        answer_set_field = field.m2m_field_name()
+        answer_field = field.m2m_reverse_field_name()
+
+        self._answers = collections.defaultdict(list)
+        for answer_set, text, question in field.remote_field.through.objects.filter(**{
+                f'{answer_set_field}__in': instances
+        }).order_by(answer_set_field, f'{answer_field}_id').values_list(
+            answer_set_field, f'{answer_field}__text', f'{answer_field}__question'
+        ):
+            self._answers[answer_set].append({'text': text, 'question_id': question})
+
+        # Hardcoded questions may refer to an organisation - which is displayed by name
+        hardcoded_fields = {question.hardcoded_field for question, slug in self.questions}
+        self._organisation_fields = {
+            field.name: field.attname for field in self.Meta.model._meta.concrete_fields
+            if field.name in hardcoded_fields and field.related_model is models.Organisation
+        }
+        self._organisation_names = organisation_names(
+            getattr(instance, attname)
+            for instance in instances for attname in self._organisation_fields.values()
+        )
+
+    def build_question_answers(
+            self, instance: models.question.AnswerSet) -> typing.Dict[str, typing.Any]:
+        """Collect answers to all questions - as :meth:`AnswerSet.build_question_answers`.
+
+        Uses answers loaded by :meth:`prefetch`.
+        """
+        if self._answers is None:
+            return instance.build_question_answers(use_slugs=True, show_all=True)
+
+        answerset_answers = self._answers.get(instance.pk, [])
+
+        question_answers = {}
+        try:
+            for question, slug in self.questions:
+                if question.hardcoded_field in self._organisation_fields:
+                    pk = getattr(instance, self._organisation_fields[question.hardcoded_field])
+                    answer = self._organisation_names.get(pk)
+
+                elif question.hardcoded_field:
+                    answer = getattr(instance, question.hardcoded_field)
+                    if isinstance(answer, list):
+                        answer = ', '.join(map(str, answer))
+
+                else:
+                    answer = ', '.join(
+                        answer['text'] for answer in answerset_answers
+                        if answer['question_id'] == question.id
+                    )
+
+                question_answers[slug] = answer
+
+        except AttributeError:
+            # No AnswerSet yet
+            pass
+
+        return question_answers
+
     def to_representation(self, instance: models.question.AnswerSet):
         rep = super().to_representation(instance)
 
-        rep.update(
-            underscore_dict_keys(instance.build_question_answers(use_slugs=True, show_all=True))
-        )
+        rep.update(underscore_dict_keys(self.build_question_answers(instance)))
 
         return rep
 
 
 class PersonSerializer(base.FlattenedModelSerializer):
+    organisation = serializers.SerializerMethodField()
+    country_of_residence = serializers.SerializerMethodField()
+
+    #: Organisation name and country of the current batch of people - see :meth:`prefetch`
+    _current = None
+
     class Meta:
         model = models.Person
         fields = [
@@ -47,6 +166,47 @@ class PersonSerializer(base.FlattenedModelSerializer):
             'country_of_residence',
         ]
 
+    def get_dependencies(self) -> typing.List[typing.Tuple[str, typing.Type]]:
+        # The current organisation is displayed by its current name
+        return [('answer_sets__organisation', models.Organisation)]
+
+    def prefetch(self, instances: typing.Sequence[models.Person]) -> None:
+        """Load the current organisation and country of a batch of people."""
+        super().prefetch(instances)
+
+        current = models.Person.objects.filter(
+            pk__in=[instance.pk for instance in instances], current_answer_set__isnull=False
+        ).values_list('pk', 'current_answer_set__organisation',
+                      'current_answer_set__country_of_residence')
+
+        names = organisation_names(organisation for person, organisation, country in current)
+        self._current = {
+            person: (names.get(organisation), country)
+            for person, organisation, country in current
+        }
+
+    def get_organisation(self, instance: models.Person) -> typing.Any:
+        if self._current is not None:
+            return self._current.get(instance.pk, (None, None))[0]
+
+        try:
+            return instance.organisation
+
+        except AttributeError:
+            # No AnswerSet yet
+            return None
+
+    def get_country_of_residence(self, instance: models.Person) -> typing.Any:
+        if self._current is not None:
+            return self._current.get(instance.pk, (None, None))[1]
+
+        try:
+            return instance.country_of_residence
+
+        except AttributeError:
+            # No AnswerSet yet
+            return None
+
 
 class PersonAnswerSetSerializer(AnswerSetSerializer):
     question_model = models.PersonQuestion
@@ -0,0 +1,33 @@
+// Interval between checks of background export progress - milliseconds
+const export_poll_interval = 2000;
+
+/**
+ * Update the progress bar of a background export - reloading the page once it has finished.
+ */
+function pollExportJob(element) {
+    fetch(element.dataset.url, {credentials: 'same-origin'})
+        .then(response => response.json())
+        .then(data => {
+            if (data.status === 'done' || data.status === 'failed') {
+                window.location.reload();
+                return;
+            }
+
+            const bar = element.querySelector('.progress-bar');
+            if (data.progress != null) {
+                const percent = Math.round(100 * data.progress);
+                bar.style.width = percent + '%';
+                bar.textContent = data.rows_written + ' / ' + data.total_rows + ' rows';
+            } else {
+                bar.textContent = data.status_display;
+            }
+
+            setTimeout(pollExportJob, export_poll_interval, element);
+        });
+}
+
+document.addEventListener('DOMContentLoaded', function () {
+    for (const element of document.querySelectorAll('.export-job')) {
+        pollExportJob(element);
+    }
+});
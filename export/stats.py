@@ -0,0 +1,140 @@
+"""
+Counts of the records in each exported table, and estimates of the size of exports.
+
+Counting every table each time the export page is shown would be slow for large tables, so counts
+are kept in :class:`RecordCount`.  They are adjusted as records are saved and deleted, and
+reconciled with the tables from time to time by the export worker - to correct changes which
+send no signals, such as bulk updates.
+"""
+
+import typing
+
+from django.db.models import F, Model
+from django.utils import timezone
+
+from . import datasets
+from .models import ExportJob, RecordCount
+
+#: How often counts are reconciled with the tables
+RECONCILE_INTERVAL = timezone.timedelta(hours=1)
+
+
+class Estimate(typing.NamedTuple):
+    """Estimated size of an export and how long it will take."""
+    #: Size in bytes
+    size: int
+
+    #: Duration in seconds
+    duration: float
+
+
+def get_models() -> typing.List[typing.Type[Model]]:
+    """Get the models of all exported datasets."""
+    return [dataset.view_class.model for dataset in datasets.DATASETS.values()]
+
+
+def count(model: typing.Type[Model]) -> int:
+    """Count the records of a model, correcting the stored count."""
+    n_records = model._default_manager.count()
+    RecordCount.objects.update_or_create(model=model._meta.label_lower,
+                                         defaults={
+                                             'count': n_records,
+                                             'reconciled': timezone.now(),
+                                         })
+
+    return n_records
+
+
+def reconcile() -> None:
+    """Correct the stored counts of all exported models."""
+    for model in get_models():
+        count(model)
+
+
+def reconcile_if_due() -> bool:
+    """Correct the stored counts if any have not been checked recently.
+
+    :return: Were the counts reconciled?
+    """
+    n_recent = RecordCount.objects.filter(reconciled__gte=timezone.now() -
+                                          RECONCILE_INTERVAL).count()
+    if n_recent >= len(get_models()):
+        return False
+
+    reconcile()
+    return True
+
+
+def adjust(model: typing.Type[Model], change: int) -> None:
+    """Add to the stored count of a model - counting it if there is no stored count."""
+    n_updated = RecordCount.objects.filter(model=model._meta.label_lower).update(
+        count=F('count') + change)
+
+    if not n_updated:
+        count(model)
+
+
+def record_saved(sender: typing.Type[Model], created: bool, **kwargs) -> None:
+    """Count a new record - to be used as a `post_save` receiver."""
+    if created:
+        adjust(sender, 1)
+
+
+def record_deleted(sender: typing.Type[Model], **kwargs) -> None:
+    """Count a deleted record - to be used as a `post_delete` receiver."""
+    adjust(sender, -1)
+
+    # Links in many to many tables are deleted with the records they link, without signals
+    for model in get_models():
+        if model._meta.auto_created and any(field.related_model is sender
+                                            for field in model._meta.concrete_fields):
+            count(model)
+
+
+def record_m2m_changed(sender: typing.Type[Model], action: str,
+                       pk_set: typing.Optional[typing.Set[int]], **kwargs) -> None:
+    """Count records of a many to many table - to be used as an `m2m_changed` receiver."""
+    if action == 'post_add':
+        # Only links which did not already exist are included
+        adjust(sender, len(pk_set))
+
+    elif action in {'post_remove', 'post_clear'}:
+        # Removed links are not known exactly
+        count(sender)
+
+
+def get_counts() -> typing.Dict[str, int]:
+    """Get the number of records in each dataset - by dataset name."""
+    counts = dict(RecordCount.objects.values_list('model', 'count'))
+
+    result = {}
+    for name, dataset in datasets.DATASETS.items():
+        model = dataset.view_class.model
+        label = model._meta.label_lower
+
+        result[name] = counts[label] if label in counts else count(model)
+
+    return result
+
+
+def get_estimates(counts: typing.Mapping[str, int]) -> typing.Dict[str, Estimate]:
+    """Estimate the size of exports and how long they take - from the latest finished job of each.
+
+    :param counts: Number of records in each export, by dataset or archive name
+    """
+    jobs = ExportJob.objects.filter(status=ExportJob.DONE,
+                                    total_rows__gt=0,
+                                    size__isnull=False,
+                                    started__isnull=False,
+                                    finished__isnull=False).order_by('finished')
+
+    estimates = {}
+    for job in jobs:
+        if job.dataset in counts:
+            n_rows = counts[job.dataset]
+            duration = (job.finished - job.started).total_seconds()
+
+            estimates[job.dataset] = Estimate(size=int(job.size * n_rows / job.total_rows),
+                                              duration=duration * n_rows / job.total_rows)
+
+    return estimates
@@ -49,4 +49,24 @@ urlpatterns = [
     path('export/activity-attendance',
          views.activities.ActivityAttendanceExportView.as_view(),
          name='activity-attendance'),
+
+    path('export/jobs',
+         views.jobs.ExportJobCreateView.as_view(),
+         name='job.create'),
+
+    path('export/jobs/<int:pk>',
+         views.jobs.ExportJobDetailView.as_view(),
+         name='job.detail'),
+
+    path('export/jobs/<int:pk>/download',
+         views.jobs.ExportJobDownloadView.as_view(),
+         name='job.download'),
+
+    path('export/network-metrics',
+         views.network.NetworkMetricsExportView.as_view(),
+         name='network-metrics'),
+
+    path('export/network/<str:format>',
+         views.network.NetworkGraphExportView.as_view(),
+         name='network-graph'),
 ]
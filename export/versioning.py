@@ -0,0 +1,44 @@
+"""
+Version of the data which may be exported.
+
+The version changes whenever a model in the people or activities apps is written, so that
+exported files may be reused until they are out of date.
+"""
+
+import time
+
+from django.apps import apps
+from django.core.cache import cache
+
+#: Cache key under which the current data version is stored
+VERSION_CACHE_KEY = 'export.data.version'
+
+#: Apps containing models which may be exported
+SOURCE_APPS = ['people', 'activities']
+
+#: Models in source apps which are never exported - writes to these do not change the version
+EXCLUDED_MODELS = ['people.User']
+
+
+def get_source_models():
+    """Get all models whose changes may change exported data - including many to many tables."""
+    excluded = {apps.get_model(label) for label in EXCLUDED_MODELS}
+
+    return [
+        model for app_label in SOURCE_APPS
+        for model in apps.get_app_config(app_label).get_models(include_auto_created=True)
+        if model not in excluded
+    ]
+
+
+def get_data_version() -> str:
+    """Get the version of the data which may be exported."""
+    return str(cache.get_or_set(VERSION_CACHE_KEY, time.time, timeout=None))
+
+
+def invalidate(*args, **kwargs) -> None:
+    """Change the data version, so that all exported data is out of date.
+
+    May be used directly as a signal receiver.
+    """
+    cache.set(VERSION_CACHE_KEY, time.time(), timeout=None)
@@ -2,12 +2,16 @@ from .base import ExportListView
 
 from . import (
     activities,
+    jobs,
+    network,
     people
 )
 
 
 __all__ = [
     'activities',
+    'jobs',
+    'network',
     'people',
     'ExportListView',
 ]
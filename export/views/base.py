@@ -1,14 +1,22 @@
-import csv
 import typing
 
 from django.contrib.auth.mixins import UserPassesTestMixin
-from django.http import HttpResponse
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.views.generic import TemplateView
 from django.views.generic.list import BaseListView
 
+from .. import changes, stats, versioning
+from ..models import ExportJob
+from ..writers import csv_rows, store_output
 
-class QuotedCsv(csv.excel):
-    quoting = csv.QUOTE_NONNUMERIC
+#: Prefix for cache keys of complete exports
+EXPORT_CACHE_PREFIX = 'export.csv'
+
+#: How long should complete exports be kept in the cache?  Seconds
+EXPORT_CACHE_TIMEOUT = 60 * 60 * 24
 
 
 class UserIsStaffMixin(UserPassesTestMixin):
@@ -17,22 +25,109 @@ class UserIsStaffMixin(UserPassesTestMixin):
 
 
 class CsvExportView(UserIsStaffMixin, BaseListView):
+    """Export a table as CSV.
+
+    If a `since` cursor from a previous export is given, only rows which have changed since are
+    exported.  The cursor for the next export is returned in the `X-Export-Cursor` header.
+    """
     model = None
     serializer_class = None
 
+    def get(self, request, *args, **kwargs):
+        since = request.GET.get('since')
+        self.since = None
+
+        if since:
+            try:
+                self.since = int(since)
+
+            except ValueError:
+                return HttpResponseBadRequest('Cursor must be an integer')
+
+            if not 0 <= self.since <= changes.get_cursor():
+                return HttpResponseBadRequest('Unknown cursor')
+
+        return super().get(request, *args, **kwargs)
+
     def render_to_response(self, context: typing.Dict) -> HttpResponse:
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{self.get_context_object_name(self.object_list)}.csv"'
+        version = versioning.get_data_version()
+        label = self.model._meta.label_lower
+
+        # Exports only change when the data does
+        etag = quote_etag(f'{label}.{version}.{self.since}')
+        last_modified = int(float(version))
+
+        response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.export(f'{EXPORT_CACHE_PREFIX}.{label}.{version}')
+            filename = self.get_context_object_name(self.object_list)
+            response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # May be reused, but must be revalidated every time
+        patch_cache_control(response, private=True, no_cache=True)
+
+        return response
+
+    def export(self, cache_key: str) -> HttpResponse:
+        """Export the table - complete exports are cached until the data changes."""
+        if self.since is None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                cursor, content = cached
+                response = HttpResponse(content, content_type='text/csv')
+                response['X-Export-Cursor'] = str(cursor)
+
+                return response
+
+        # Read before the data - so that changes made during the export are exported again later
+        cursor = changes.get_cursor()
 
         # Force ordering by PK - though this should be default anyway
-        serializer = self.serializer_class(self.get_queryset().order_by('pk'), many=True)
+        queryset = self.get_queryset().order_by('pk')
+        if self.since is not None:
+            queryset = changes.changed_since(queryset, self.serializer_class(), self.since)
+
+        rows = csv_rows(self.serializer_class, queryset)
+        if self.since is None:
+            rows = store_output(rows, lambda content: cache.set(
+                cache_key, (cursor, content), timeout=EXPORT_CACHE_TIMEOUT))
 
-        writer = csv.DictWriter(response, dialect=QuotedCsv, fieldnames=serializer.child.column_headers)
-        writer.writeheader()
-        writer.writerows(serializer.data)
+        response = StreamingHttpResponse(rows, content_type='text/csv')
+        response['X-Export-Cursor'] = str(cursor)
 
         return response
 
 
 class ExportListView(UserIsStaffMixin, TemplateView):
     template_name = 'export/export.html'
+
+    def get_context_data(self, **kwargs: typing.Any) -> typing.Dict[str, typing.Any]:
+        """Add datasets and archives with the number of records, estimated size of their export and
+        their latest background export job for current data.
+        """
+        # Datasets are defined using views in this module
+        from .. import datasets  # pylint: disable=import-outside-toplevel
+
+        context = super().get_context_data(**kwargs)
+
+        latest_jobs = {}
+        for job in ExportJob.objects.filter(data_version=versioning.get_data_version()):
+            latest_jobs.setdefault(job.dataset, job)
+
+        counts = stats.get_counts()
+        for name, title in ExportJob.ARCHIVE_CHOICES:
+            counts[name] = sum(counts[dataset] for dataset in datasets.DATASETS)
+        estimates = stats.get_estimates(counts)
+
+        context['datasets'] = [
+            (dataset, latest_jobs.get(name), counts[name], estimates.get(name))
+            for name, dataset in datasets.DATASETS.items()
+        ]
+        context['archives'] = [
+            (name, title, latest_jobs.get(name), counts[name], estimates.get(name))
+            for name, title in ExportJob.ARCHIVE_CHOICES
+        ]
+
+        return context
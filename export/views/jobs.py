@@ -0,0 +1,158 @@
+"""
+Views for requesting background export jobs, following their progress and downloading the result.
+"""
+
+import re
+import typing
+
+from django.http import (FileResponse, Http404, HttpRequest, HttpResponse, HttpResponseBadRequest,
+                         JsonResponse, StreamingHttpResponse)
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
+from django.utils.http import http_date, quote_etag
+from django.views.generic import View
+
+from .. import jobs
+from ..models import ExportJob
+from . import base
+
+#: Size of blocks read from exported files when serving part of them
+BLOCK_SIZE = 64 * 1024
+
+#: Pattern matching a Range header requesting a single range of bytes
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def job_status(job: ExportJob) -> typing.Dict[str, typing.Any]:
+    """Describe the progress of an export job."""
+    download_url = None
+    if job.is_available:
+        download_url = reverse('export:job.download', kwargs={'pk': job.pk})
+
+    return {
+        'id': job.pk,
+        'dataset': job.dataset,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'rows_written': job.rows_written,
+        'total_rows': job.total_rows,
+        'progress': job.progress,
+        'size': job.size,
+        'error': job.error,
+        'download_url': download_url,
+    }
+
+
+def parse_range(header: str, size: int) -> typing.Optional[typing.Tuple[int, int]]:
+    """Parse a Range header requesting a single range of bytes.
+
+    :return: Inclusive first and last byte positions, or None if the header is not understood
+    :raises ValueError: If the range cannot be satisfied
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range - the last n bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+
+        return max(size - length, 0), size - 1
+
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first > last:
+        raise ValueError('Range starts after end of file')
+
+    return first, last
+
+
+def read_range(path, first: int, last: int) -> typing.Iterator[bytes]:
+    """Read an inclusive range of bytes from a file in blocks."""
+    with open(path, 'rb') as f:
+        f.seek(first)
+
+        remaining = last - first + 1
+        while remaining > 0:
+            block = f.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+
+            remaining -= len(block)
+            yield block
+
+
+class ExportJobCreateView(base.UserIsStaffMixin, View):
+    """Request a background export of a dataset - reusing an up to date export if there is one."""
+    def post(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        try:
+            job = jobs.request_export(request.POST.get('dataset', ''), user=request.user)
+
+        except KeyError:
+            return HttpResponseBadRequest('Unknown dataset')
+
+        if request.is_ajax():
+            return JsonResponse(job_status(job))
+
+        return redirect('export:index')
+
+
+class ExportJobDetailView(base.UserIsStaffMixin, View):
+    """Progress of a background export job as JSON."""
+    def get(self, request: HttpRequest, *args, **kwargs) -> JsonResponse:
+        job = get_object_or_404(ExportJob, pk=kwargs['pk'])
+
+        return JsonResponse(job_status(job))
+
+
+class ExportJobDownloadView(base.UserIsStaffMixin, View):
+    """Download the file written by a background export job.
+
+    Supports requests for a single range of bytes, so that interrupted downloads may be resumed.
+    """
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        job = get_object_or_404(ExportJob, pk=kwargs['pk'])
+        if not job.is_available:
+            raise Http404('Export is not available')
+
+        path = job.path
+        stat = path.stat()
+        etag = quote_etag(f'{job.pk}-{job.data_version}-{stat.st_size}')
+
+        byte_range = None
+        range_header = request.META.get('HTTP_RANGE')
+        if_range = request.META.get('HTTP_IF_RANGE')
+
+        # A range of an older version of the file must not be combined with this one
+        if range_header and (if_range is None or if_range == etag):
+            try:
+                byte_range = parse_range(range_header, stat.st_size)
+
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{stat.st_size}'
+                return response
+
+        if byte_range is None:
+            response = FileResponse(open(path, 'rb'), content_type=job.content_type)
+
+        else:
+            first, last = byte_range
+            response = StreamingHttpResponse(read_range(path, first, last),
+                                             status=206,
+                                             content_type=job.content_type)
+            response['Content-Length'] = str(last - first + 1)
+            response['Content-Range'] = f'bytes {first}-{last}/{stat.st_size}'
+
+        response['Content-Disposition'] = f'attachment; filename="{job.filename}"'
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+
+        return response
@@ -0,0 +1,83 @@
+import csv
+
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.views.generic import View
+
+from people import analytics, network
+from people.views.network import NetworkFilterMixin
+
+from . import base
+from .. import graphs, writers
+
+
+class NetworkMetricsExportView(base.UserIsStaffMixin, NetworkFilterMixin, View):
+    """Export metrics of each node in the network.
+
+    Accepts the same filter parameters as the network view - by default the whole current network.
+    """
+    fieldnames = [
+        'id',
+        'kind',
+        'pk',
+        'name',
+        'degree',
+        'betweenness',
+        'component',
+        'is_articulation_point',
+    ]
+
+    def get(self, request, *args, **kwargs) -> HttpResponse:
+        all_forms = self.get_forms()
+        if not all(map(lambda f: f.is_valid(), all_forms.values())):
+            return HttpResponse(status=400)
+
+        snapshot = network.get_snapshot(all_forms)
+        metrics = analytics.get_metrics(all_forms)
+
+        names = {}
+        for prefix, table in [('person', snapshot['people']),
+                              ('organisation', snapshot['organisations'])]:
+            names.update(
+                (f'{prefix}-{pk}', name) for pk, name in zip(table['id'], table['name'])
+            )
+
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="network-metrics.csv"'
+
+        writer = csv.DictWriter(response, dialect=writers.QuotedCsv, fieldnames=self.fieldnames)
+        writer.writeheader()
+
+        for node, node_metrics in metrics['nodes'].items():
+            kind, pk = node.rsplit('-', 1)
+            writer.writerow({
+                'id': node,
+                'kind': kind,
+                'pk': int(pk),
+                'name': names[node],
+                **node_metrics,
+            })
+
+        return response
+
+
+class NetworkGraphExportView(base.UserIsStaffMixin, NetworkFilterMixin, View):
+    """Export the network in a format for graph analysis tools - see :data:`graphs.FORMATS`.
+
+    Accepts the same filter parameters as the network view - by default the whole current network.
+    """
+    def get(self, request, *args, **kwargs) -> HttpResponse:
+        try:
+            graph_format = graphs.FORMATS[kwargs['format']]
+
+        except KeyError:
+            raise Http404('Unknown network format')
+
+        all_forms = self.get_forms()
+        if not all(map(lambda f: f.is_valid(), all_forms.values())):
+            return HttpResponse(status=400)
+
+        response = StreamingHttpResponse(graph_format.write(graphs.Graph(all_forms)),
+                                         content_type=graph_format.content_type)
+        response['Content-Disposition'] = f'attachment; filename="network.{graph_format.extension}"'
+
+        return response
@@ -0,0 +1,118 @@
+"""
+Write serialized data to export files.
+
+Rows are produced one at a time so that exports may be streamed to a response or written to
+disk without holding the whole table in memory.
+"""
+
+import csv
+import typing
+
+from django.db.models import QuerySet
+
+#: Number of rows read from the database at once
+CHUNK_SIZE = 2000
+
+#: Largest output which may be kept by :func:`store_output` - larger output is not kept
+STORE_MAX_SIZE = 16 * 1024 * 1024
+
+
+class QuotedCsv(csv.excel):
+    quoting = csv.QUOTE_NONNUMERIC
+
+
+class Echo:
+    """File-like object which returns what is written to it - to stream CSV rows."""
+    def write(self, value: str) -> str:
+        return value
+
+
+def iter_chunks(queryset: QuerySet, chunk_size: int = CHUNK_SIZE) -> typing.Iterator[typing.List]:
+    """Read a queryset in chunks in order of primary key, without caching the results.
+
+    Each chunk is read by its own query, which is finished before the chunk is used.  An open
+    cursor would hold a lock on an SQLite database, blocking all writes for as long as a slow
+    client takes to download an export.
+    """
+    queryset = queryset.order_by('pk')
+    chunk = list(queryset[:chunk_size])
+
+    while chunk:
+        yield chunk
+
+        if len(chunk) < chunk_size:
+            break
+
+        chunk = list(queryset.filter(pk__gt=chunk[-1].pk)[:chunk_size])
+
+
+def serialized_rows(
+    serializer,
+    queryset: QuerySet,
+    progress: typing.Optional[typing.Callable[[int], None]] = None,
+    chunk_size: int = CHUNK_SIZE
+) -> typing.Iterator[typing.Mapping[str, typing.Any]]:
+    """Serialize a queryset one row at a time.
+
+    :param serializer: Flattened serializer for the model of the queryset
+    :param queryset: Objects to serialize - which are written in order of primary key
+    :param progress: Function called with the number of rows serialized after each chunk
+    :param chunk_size: Number of rows read from the database at once
+    """
+    n_rows = 0
+    for chunk in iter_chunks(queryset, chunk_size):
+        # Related data is loaded for each chunk at once
+        serializer.prefetch(chunk)
+        for instance in chunk:
+            yield serializer.to_representation(instance)
+
+        n_rows += len(chunk)
+        if progress is not None:
+            progress(n_rows)
+
+
+def csv_rows(serializer_class: typing.Type,
+             queryset: QuerySet,
+             progress: typing.Optional[typing.Callable[[int], None]] = None,
+             chunk_size: int = CHUNK_SIZE) -> typing.Iterator[str]:
+    """Serialize a queryset as lines of CSV, starting with a header.
+
+    :param serializer_class: Flattened serializer for the model of the queryset
+    :param queryset: Objects to serialize - which are written in order of primary key
+    :param progress: Function called with the number of rows written after each chunk
+    :param chunk_size: Number of rows read from the database at once
+    """
+    serializer = serializer_class()
+
+    writer = csv.DictWriter(Echo(), dialect=QuotedCsv, fieldnames=serializer.column_headers)
+    yield writer.writeheader()
+
+    for row in serialized_rows(serializer, queryset, progress=progress, chunk_size=chunk_size):
+        yield writer.writerow(row)
+
+
+def store_output(chunks: typing.Iterable[str],
+                 store: typing.Callable[[str], None],
+                 max_size: int = STORE_MAX_SIZE) -> typing.Iterator[str]:
+    """Pass on chunks of output - then store the complete output if it was small enough.
+
+    :param chunks: Output to be passed on
+    :param store: Function called with the complete output, once all of it has been passed on
+    :param max_size: Largest number of characters to be stored
+    """
+    parts = []
+    size = 0
+
+    for chunk in chunks:
+        if parts is not None:
+            parts.append(chunk)
+            size += len(chunk)
+
+            # Too large to keep - but continue passing on output
+            if size > max_size:
+                parts = None
+
+        yield chunk
+
+    if parts is not None:
+        store(''.join(parts))
@@ -0,0 +1,310 @@
+"""
+Aggregated views of the relationship network for networks too large to display in full.
+
+People may be grouped into clusters by their organisation or country of residence at the date
+of the network, with edges between clusters weighted by the number of relationships between
+their members.  Grouping is done by the database and results are cached alongside the network
+snapshot with the same filters.
+
+Alternatively, a preview of only the most connected people may be shown.
+"""
+
+import collections
+import logging
+import typing
+
+from django.core.cache import cache
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.forms import Form
+from django_countries import countries
+
+from people import layout, models, network
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+#: Fields of :class:`PersonAnswerSet` by which people may be grouped into clusters
+GROUPINGS = {
+    'organisation': 'organisation',
+    'country': 'country_of_residence',
+}
+
+#: Id of the cluster of people with no value for the grouping field
+UNKNOWN_CLUSTER = 'cluster-unknown'
+
+#: Prefix of cache keys of the previous positions of aggregated networks, by grouping
+#: Kept apart from the positions of the full network, which has no clusters
+POSITIONS_CACHE_KEY = 'people.aggregation.positions'
+
+#: Default number of people to show in a preview of the most connected people
+TOP_K_DEFAULT = 100
+
+#: Serialized aggregated network in a compact columnar format
+#:
+#: The node table contains parallel lists of 'id', 'name', 'kind', 'size', 'x' and 'y'.
+#: The edge table contains parallel lists of 'source', 'target' and 'weight' where the source
+#: and target are row indices into the node table.
+Aggregate = typing.Dict[str, typing.Dict[str, typing.List]]
+
+
+def cluster_id(grouping: str, value: typing.Any) -> str:
+    """Get the id of the cluster containing people with a value of the grouping field.
+
+    Ids of organisation clusters match the ids of organisation nodes in the network.
+    """
+    if value is None or value == '':
+        return UNKNOWN_CLUSTER
+
+    return f'{grouping}-{value}'
+
+
+def cluster_filter(grouping: str, cluster: str, lookup: str) -> Q:
+    """Build a filter selecting the members of a cluster.
+
+    :param grouping: Name of grouping
+    :param cluster: Id of cluster
+    :param lookup: Lookup of the grouping field value of each person
+    """
+    if cluster == UNKNOWN_CLUSTER:
+        condition = Q(**{f'{lookup}__isnull': True})
+        if grouping == 'country':
+            condition |= Q(**{lookup: ''})
+
+        return condition
+
+    prefix = f'{grouping}-'
+    if not cluster.startswith(prefix):
+        raise ValueError(f'Cluster {cluster} is not a {grouping} cluster')
+
+    return Q(**{lookup: cluster[len(prefix):]})
+
+
+def cluster_names(grouping: str,
+                  values: typing.Iterable[typing.Any]) -> typing.Dict[typing.Any, str]:
+    """Get display names for the clusters with each value of the grouping field."""
+    if grouping == 'organisation':
+        return dict(models.Organisation.objects.filter(pk__in=values).values_list('pk', 'name'))
+
+    return {value: countries.name(value) for value in values}
+
+
+def current_value(field: str, person_ref: str, at_date) -> Subquery:
+    """Build a subquery getting a field from the answer set of a person valid at a date.
+
+    :param field: Field of :class:`PersonAnswerSet`
+    :param person_ref: Name of the field of the outer query referring to a :class:`Person`
+    :param at_date: Date at which the answer set should be valid
+    """
+    return Subquery(
+        models.PersonAnswerSet.objects.as_of(at_date).filter(
+            person=OuterRef(person_ref)
+        ).order_by('-timestamp').values(field)[:1]
+    )
+
+
+def expanded_member(group_lookup: str, person_lookup: str, grouping: str,
+                    expand: typing.Optional[str]) -> typing.Union[Case, Value]:
+    """Build an expression which is the person if they are in the expanded cluster, else null."""
+    if expand is None:
+        return Value(None, output_field=IntegerField())
+
+    return Case(
+        When(cluster_filter(grouping, expand, group_lookup), then=F(person_lookup)),
+        default=Value(None),
+        output_field=IntegerField()
+    )
+
+
+def build_aggregate(all_forms: typing.Mapping[str, Form],
+                    grouping: str,
+                    expand: typing.Optional[str] = None) -> Aggregate:
+    """Build the aggregated network matching a set of valid filter forms.
+
+    :param all_forms: Valid network filter forms
+    :param grouping: Name of grouping - key of :data:`GROUPINGS`
+    :param expand: Id of a cluster which should be shown as individual people
+    """
+    field = GROUPINGS[grouping]
+    at_date = network.get_at_date(all_forms)
+
+    people = network.filter_people(all_forms['person'], at_date=at_date)
+    organisations = network.filter_organisations(all_forms['organisation'], at_date=at_date)
+    answer_sets = models.PersonAnswerSet.objects.as_of(at_date).filter(person__in=people)
+
+    # Node id -> [name, kind, size]
+    nodes = collections.OrderedDict()
+
+    organisation_nodes = {
+        f'organisation-{pk}': [name, 'organisation', 0]
+        for pk, name in organisations.values_list('pk', 'name')
+    }
+    nodes.update(organisation_nodes)
+
+    clusters = dict(
+        answer_sets.values_list(field).annotate(size=Count('person', distinct=True)).order_by()
+    )
+    names = cluster_names(grouping, [value for value in clusters if value])
+
+    for value, size in clusters.items():
+        node = cluster_id(grouping, value)
+
+        # Blank and null values are both in the unknown cluster
+        if node in nodes and nodes[node][1] == 'cluster':
+            size += nodes[node][2]
+
+        nodes[node] = [names.get(value, 'Unknown'), 'cluster', size]
+
+    if expand is not None:
+        # An expanded organisation cluster is still an organisation
+        if expand in organisation_nodes:
+            nodes[expand] = organisation_nodes[expand]
+        else:
+            nodes.pop(expand, None)
+
+        members = answer_sets.filter(cluster_filter(grouping, expand, field)).values_list(
+            'person', 'person__name'
+        ).distinct()
+
+        for pk, name in members:
+            nodes[f'person-{pk}'] = [name, 'person', 1]
+
+    def endpoint(group, member):
+        return f'person-{member}' if member is not None else cluster_id(grouping, group)
+
+    # (source id, target id) -> weight
+    edges = collections.Counter()
+
+    relationships = network.filter_relationships(
+        all_forms['relationship'], at_date=at_date
+    ).filter(source__in=people, target__in=people).annotate(
+        source_group=current_value(field, 'source', at_date),
+        target_group=current_value(field, 'target', at_date),
+    ).annotate(
+        source_member=expanded_member('source_group', 'source', grouping, expand),
+        target_member=expanded_member('target_group', 'target', grouping, expand),
+    ).values('source_group', 'source_member', 'target_group', 'target_member').annotate(
+        weight=Count('pk')
+    ).order_by()
+
+    for row in relationships:
+        edges[(endpoint(row['source_group'], row['source_member']),
+               endpoint(row['target_group'], row['target_member']))] += row['weight']
+
+    organisation_relationships = models.OrganisationRelationship.objects.filter(
+        source__in=people, target__in=organisations
+    ).annotate(
+        source_group=current_value(field, 'source', at_date),
+    ).annotate(
+        source_member=expanded_member('source_group', 'source', grouping, expand),
+    ).values('source_group', 'source_member', 'target').annotate(
+        weight=Count('pk')
+    ).order_by()
+
+    for row in organisation_relationships:
+        edges[(endpoint(row['source_group'], row['source_member']),
+               f'organisation-{row["target"]}')] += row['weight']
+
+    memberships = answer_sets.filter(organisation__in=organisations).annotate(
+        member=expanded_member(field, 'person', grouping, expand),
+    ).values(field, 'member', 'organisation').annotate(
+        weight=Count('person', distinct=True)
+    ).order_by()
+
+    for row in memberships:
+        edges[(endpoint(row[field], row['member']),
+               f'organisation-{row["organisation"]}')] += row['weight']
+
+    # Relationships within a cluster are not shown
+    edges = {
+        ends: weight for ends, weight in edges.items()
+        if ends[0] != ends[1] and ends[0] in nodes and ends[1] in nodes
+    }
+
+    node_ids = list(nodes)
+    positions = layout.compute_layout(node_ids, list(edges),
+                                      cache_key=f'{POSITIONS_CACHE_KEY}.{grouping}')
+    index = {node: i for i, node in enumerate(node_ids)}
+
+    logger.info('Aggregated network by %s into %d nodes', grouping, len(node_ids))
+
+    return {
+        'nodes': {
+            'id': node_ids,
+            'name': [nodes[node][0] for node in node_ids],
+            'kind': [nodes[node][1] for node in node_ids],
+            'size': [nodes[node][2] for node in node_ids],
+            'x': [positions[node][0] for node in node_ids],
+            'y': [positions[node][1] for node in node_ids],
+        },
+        'edges': {
+            'source': [index[source] for source, target in edges],
+            'target': [index[target] for source, target in edges],
+            'weight': list(edges.values()),
+        },
+    }
+
+
+def build_top(all_forms: typing.Mapping[str, Form], k: int = TOP_K_DEFAULT) -> network.Snapshot:
+    """Build a network of the k people with most relationships matching a set of valid filter forms.
+
+    Degree is counted by the database over the whole filtered network.
+    The result is in the same format as a full network snapshot.
+    """
+    at_date = network.get_at_date(all_forms)
+
+    people = network.filter_people(all_forms['person'], at_date=at_date)
+    relationships = network.filter_relationships(
+        all_forms['relationship'], at_date=at_date
+    ).filter(source__in=people, target__in=people)
+
+    degree = collections.Counter()
+    for side in ['source', 'target']:
+        degree.update(dict(relationships.values_list(side).annotate(count=Count('pk')).order_by()))
+
+    top = [pk for pk, count in degree.most_common(k)]
+
+    snapshot = {
+        'people': network.node_table(people.filter(pk__in=top)),
+        'organisations': network.node_table(models.Organisation.objects.none()),
+    }
+    snapshot['relationships'] = network.edge_table(
+        relationships.filter(source__in=top, target__in=top).values_list('pk', 'source', 'target'),
+        snapshot['people'], snapshot['people']
+    )
+    snapshot['organisation_relationships'] = network.edge_table(
+        [], snapshot['people'], snapshot['organisations']
+    )
+    snapshot['memberships'] = network.edge_table([], snapshot['people'], snapshot['organisations'])
+
+    # Starts from the positions of the full network, but doesn't replace them
+    network.add_layout(snapshot, {f'person-{pk}': count for pk, count in degree.items()},
+                       persist=False)
+
+    return snapshot
+
+
+def get_aggregate(all_forms: typing.Mapping[str, Form],
+                  grouping: str,
+                  expand: typing.Optional[str] = None) -> Aggregate:
+    """Get the aggregated network matching a set of valid filter forms - from the cache if
+    possible.
+    """
+    key = f'{network.snapshot_key(all_forms)}.aggregate.{grouping}.{expand}'
+
+    aggregate = cache.get(key)
+    if aggregate is None:
+        aggregate = build_aggregate(all_forms, grouping, expand)
+        cache.set(key, aggregate, timeout=network.SNAPSHOT_TIMEOUT)
+
+    return aggregate
+
+
+def get_top(all_forms: typing.Mapping[str, Form], k: int = TOP_K_DEFAULT) -> network.Snapshot:
+    """Get the network of the k most connected people - from the cache if possible."""
+    key = f'{network.snapshot_key(all_forms)}.top.{k}'
+
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_top(all_forms, k)
+        cache.set(key, snapshot, timeout=network.SNAPSHOT_TIMEOUT)
+
+    return snapshot
@@ -0,0 +1,252 @@
+"""
+Graph analytics over the relationship network.
+
+Metrics are calculated from a network snapshot - so honour the same filters and date as the
+network view - and are cached alongside the snapshot from which they were calculated.
+
+The network is treated as undirected for all metrics.
+"""
+
+import logging
+import typing
+
+from django.core.cache import cache
+from django.forms import Form
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+from people import network
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+#: Networks with more nodes than this use sampled approximations of expensive metrics
+EXACT_MAX_NODES = 1000
+
+#: Number of source nodes sampled to approximate betweenness centrality on large networks
+BETWEENNESS_SAMPLES = 256
+
+#: Number of source nodes for which shortest paths are found at once - limits memory use
+BETWEENNESS_BATCH_SIZE = 64
+
+
+def build_adjacency(n_nodes: int, edges: np.ndarray) -> sparse.csr_matrix:
+    """Build a symmetric binary adjacency matrix with no self loops.
+
+    :param n_nodes: Number of nodes in the network
+    :param edges: Integer array of shape (m, 2) of node indices at each end of an edge
+    """
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    both_ways = np.concatenate([edges, edges[:, ::-1]])
+
+    adjacency = sparse.csr_matrix(
+        (np.ones(len(both_ways)), (both_ways[:, 0], both_ways[:, 1])),
+        shape=(n_nodes, n_nodes)
+    )
+    # Duplicate edges are summed on construction - but we only care if nodes are connected
+    adjacency.data[:] = 1
+
+    return adjacency
+
+
+def index_elements(nodes: typing.Sequence[str],
+                   edges: typing.Iterable[typing.Tuple[str, str]]) -> np.ndarray:
+    """Convert pairs of node ids into an array of node indices, dropping edges to missing nodes."""
+    index = {node: i for i, node in enumerate(nodes)}
+
+    return np.array(
+        [(index[source], index[target]) for source, target in edges
+         if source in index and target in index],
+        dtype=int
+    ).reshape(-1, 2)
+
+
+def degree(n_nodes: int, edges: np.ndarray) -> np.ndarray:
+    """Count the edges incident to each node - as displayed in the network."""
+    return np.bincount(edges.ravel(), minlength=n_nodes)
+
+
+def betweenness(adjacency: sparse.csr_matrix,
+                sources: typing.Optional[np.ndarray] = None) -> np.ndarray:
+    """Calculate betweenness centrality using Brandes' algorithm.
+
+    Shortest paths from a batch of sources are found at once by breadth first search using
+    sparse matrix products.
+
+    :param adjacency: Symmetric binary adjacency matrix
+    :param sources: Nodes from which to count shortest paths - defaults to all nodes.
+        If a sample is given the result is scaled to estimate the value for all sources.
+    :return: Array of unnormalised betweenness of each node
+    """
+    n_nodes = adjacency.shape[0]
+    if sources is None:
+        sources = np.arange(n_nodes)
+
+    result = np.zeros(n_nodes)
+
+    for start in range(0, len(sources), BETWEENNESS_BATCH_SIZE):
+        batch = sources[start:start + BETWEENNESS_BATCH_SIZE]
+        columns = np.arange(len(batch))
+
+        # Number of shortest paths from each source (column) to each node (row)
+        sigma = np.zeros((n_nodes, len(batch)))
+        sigma[batch, columns] = 1
+
+        visited = sigma > 0
+        frontier = sigma.copy()
+        levels = [visited.copy()]
+
+        while True:
+            paths = adjacency @ frontier
+            paths[visited] = 0
+
+            reached = paths > 0
+            if not reached.any():
+                break
+
+            visited |= reached
+            sigma += paths
+            frontier = paths
+            levels.append(reached)
+
+        # Accumulate dependencies from the furthest nodes back towards each source
+        delta = np.zeros_like(sigma)
+        for level in range(len(levels) - 1, 0, -1):
+            coefficient = np.where(levels[level], (1 + delta) / np.maximum(sigma, 1), 0)
+            delta += np.where(levels[level - 1], sigma * (adjacency @ coefficient), 0)
+
+        delta[batch, columns] = 0
+        result += delta.sum(axis=1)
+
+    # Each path is counted from both ends in an undirected network
+    result /= 2
+
+    if len(sources) < n_nodes:
+        result *= n_nodes / max(len(sources), 1)
+
+    return result
+
+
+def bridges_and_articulation_points(
+    adjacency: sparse.csr_matrix
+) -> typing.Tuple[typing.List[typing.Tuple[int, int]], typing.Set[int]]:
+    """Find bridges and articulation points using an iterative version of Tarjan's algorithm.
+
+    A bridge is an edge whose removal would disconnect the network.
+    An articulation point is a node whose removal would disconnect the network.
+
+    :param adjacency: Symmetric binary adjacency matrix
+    :return: List of bridges as pairs of node indices and set of articulation point indices
+    """
+    indptr = adjacency.indptr.tolist()
+    indices = adjacency.indices.tolist()
+    n_nodes = adjacency.shape[0]
+
+    discovered = [-1] * n_nodes
+    low = [0] * n_nodes
+    counter = 0
+
+    bridges = []
+    articulation_points = set()
+
+    for root in range(n_nodes):
+        if discovered[root] >= 0:
+            continue
+
+        discovered[root] = low[root] = counter
+        counter += 1
+        root_children = 0
+
+        # Stack of (node, parent, position in list of neighbours)
+        stack = [(root, -1, indptr[root])]
+        while stack:
+            node, parent, position = stack[-1]
+
+            if position < indptr[node + 1]:
+                stack[-1] = (node, parent, position + 1)
+                neighbour = indices[position]
+
+                if neighbour == parent:
+                    continue
+
+                if discovered[neighbour] < 0:
+                    discovered[neighbour] = low[neighbour] = counter
+                    counter += 1
+                    if node == root:
+                        root_children += 1
+
+                    stack.append((neighbour, node, indptr[neighbour]))
+
+                else:
+                    low[node] = min(low[node], discovered[neighbour])
+
+            else:
+                stack.pop()
+                if parent >= 0:
+                    low[parent] = min(low[parent], low[node])
+
+                    if low[node] > discovered[parent]:
+                        bridges.append((parent, node))
+
+                    if parent != root and low[node] >= discovered[parent]:
+                        articulation_points.add(parent)
+
+        if root_children > 1:
+            articulation_points.add(root)
+
+    return bridges, articulation_points
+
+
+def compute_metrics(snapshot: typing.Mapping[str, typing.Any]) -> typing.Dict[str, typing.Any]:
+    """Calculate metrics for a network snapshot.
+
+    :return: Dictionary of network summary values and per-node metrics keyed by node id
+    """
+    nodes, edges = network.get_elements(snapshot)
+    n_nodes = len(nodes)
+    edge_array = index_elements(nodes, edges)
+    adjacency = build_adjacency(n_nodes, edge_array)
+
+    approximate = n_nodes > EXACT_MAX_NODES
+    sources = None
+    if approximate:
+        rng = np.random.default_rng(0)
+        sources = rng.choice(n_nodes, size=BETWEENNESS_SAMPLES, replace=False)
+
+    n_components, component_labels = csgraph.connected_components(adjacency, directed=False)
+    node_betweenness = betweenness(adjacency, sources)
+    node_degree = degree(n_nodes, edge_array)
+    bridges, articulation_points = bridges_and_articulation_points(adjacency)
+
+    logger.info('Computed metrics for network of %d nodes', n_nodes)
+
+    return {
+        'approximate': approximate,
+        'components': int(n_components),
+        'bridges': [[nodes[source], nodes[target]] for source, target in bridges],
+        'articulation_points': [nodes[i] for i in sorted(articulation_points)],
+        'nodes': {
+            node: {
+                'degree': int(node_degree[i]),
+                'betweenness': round(float(node_betweenness[i]), 2),
+                'component': int(component_labels[i]),
+                'is_articulation_point': i in articulation_points,
+            }
+            for i, node in enumerate(nodes)
+        },
+    }
+
+
+def get_metrics(all_forms: typing.Mapping[str, Form]) -> typing.Dict[str, typing.Any]:
+    """Get metrics for the network matching a set of valid filter forms - from the cache if
+    possible.
+    """
+    key = network.snapshot_key(all_forms)
+    metrics_key = f'{key}.metrics'
+
+    metrics = cache.get(metrics_key)
+    if metrics is None:
+        metrics = compute_metrics(network.get_snapshot(all_forms, key=key))
+        cache.set(metrics_key, metrics, timeout=network.SNAPSHOT_TIMEOUT)
+
+    return metrics
@@ -3,7 +3,7 @@ import logging
 from django.apps import AppConfig
 from django.conf import settings
 from django.core import serializers
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
@@ -65,5 +65,22 @@ class PeopleConfig(AppConfig):
     name = 'people'
 
     def ready(self) -> None:
+        from . import geo, network
+
         # Activate signal handlers
         post_save.connect(send_welcome_email, sender='people.user')
+
+        # Invalidate cached network snapshots when the data they are built from changes
+        for model in network.SOURCE_MODELS:
+            post_save.connect(network.invalidate_snapshots, sender=model)
+            post_delete.connect(network.invalidate_snapshots, sender=model)
+
+            # Answers are added after an answer set has been saved
+            if hasattr(model, 'question_answers'):
+                m2m_changed.connect(network.invalidate_snapshots,
+                                    sender=model.question_answers.through)
+
+        # Invalidate cached map data when locations may have changed
+        for model in geo.SOURCE_MODELS:
+            post_save.connect(geo.invalidate, sender=model)
+            post_delete.connect(geo.invalidate, sender=model)
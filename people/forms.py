@@ -1,5 +1,6 @@
 """Forms for creating / updating models belonging to the 'people' app."""
 
+import re
 import typing
 
 from django import forms
@@ -330,6 +331,124 @@ class DateForm(forms.Form):
     )
 
 
+class NetworkCompareForm(forms.Form):
+    compare_date = forms.DateField(
+        required=False,
+        widget=DatePickerInput(format='%Y-%m-%d'),
+        help_text='Highlight changes to the network since this date'
+    )
+
+
+class NetworkAggregateForm(forms.Form):
+    """Choose how a large network should be simplified for display."""
+    #: Patterns matching the ids of clusters which may be expanded for each type of aggregation
+    cluster_patterns = {
+        'organisation': re.compile(r'^(organisation-\d+|cluster-unknown)$'),
+        'country': re.compile(r'^(country-[A-Z]{2}|cluster-unknown)$'),
+    }
+
+    aggregate = forms.ChoiceField(
+        choices=[
+            ('', 'Show everyone'),
+            ('organisation', 'Group people by organisation'),
+            ('country', 'Group people by country of residence'),
+            ('top', 'Show only the most connected people'),
+        ],
+        required=False,
+        label='Simplify network',
+        help_text='Large networks are easier to read when simplified'
+    )
+    top_k = forms.IntegerField(
+        min_value=1,
+        max_value=1000,
+        required=False,
+        label='Number of people',
+        help_text='How many of the most connected people to show'
+    )
+    expand = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    def clean(self):
+        cleaned_data = super().clean()
+
+        expand = cleaned_data.get('expand')
+        if expand:
+            pattern = self.cluster_patterns.get(cleaned_data.get('aggregate'))
+            if pattern is None or not pattern.match(expand):
+                self.add_error('expand', 'This group cannot be expanded')
+
+        return cleaned_data
+
+
+class NetworkEgoForm(forms.Form):
+    """Choose to show only the part of the network around a person."""
+    ego = forms.IntegerField(required=False, widget=forms.HiddenInput)
+    hops = forms.IntegerField(
+        min_value=1,
+        max_value=5,
+        required=False,
+        label='Distance',
+        help_text='Show people within this many relationships of the selected person'
+    )
+
+
+class NetworkPathForm(forms.Form):
+    """Choose how chains of contacts between people should be found."""
+    weight = forms.ModelChoiceField(
+        queryset=models.RelationshipQuestion.objects.all(),
+        required=False,
+        empty_label='Fewest introductions',
+        label='Prefer relationships by',
+        help_text='Prefer relationships with answers nearer the top of the list for this question'
+    )
+
+
+class MapClusterForm(forms.Form):
+    """Choose the zoom level at which map markers should be clustered."""
+    zoom = forms.IntegerField(min_value=0, max_value=21)
+
+
+class MapFeaturesForm(forms.Form):
+    """Choose the area within which map markers should be found.
+
+    Either a bounding box or a location and radius must be given.
+    """
+    #: Bounding box as 'south,west,north,east' in degrees
+    bbox = forms.CharField(required=False)
+
+    lat = forms.FloatField(min_value=-90, max_value=90, required=False)
+
+    lng = forms.FloatField(min_value=-180, max_value=180, required=False)
+
+    #: Distance from location in kilometres
+    radius = forms.FloatField(min_value=0, max_value=20040, required=False)
+
+    def clean_bbox(self):
+        bbox = self.cleaned_data['bbox']
+        if not bbox:
+            return None
+
+        try:
+            south, west, north, east = map(float, bbox.split(','))
+
+        except ValueError:
+            raise forms.ValidationError('Bounding box must be four numbers: south,west,north,east')
+
+        if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+            raise forms.ValidationError('Bounding box is outside of the map')
+
+        return south, west, north, east
+
+    def clean(self):
+        cleaned_data = super().clean()
+
+        location = [cleaned_data.get(field) for field in ['lat', 'lng', 'radius']]
+        if not cleaned_data.get('bbox') and None in location and 'bbox' not in self.errors:
+            raise forms.ValidationError(
+                'Either a bounding box or a location and radius is required')
+
+        return cleaned_data
+
+
 class FilterForm(DynamicAnswerSetBase):
     """Filter objects by answerset responses."""
     field_class = forms.ModelMultipleChoiceField
@@ -0,0 +1,460 @@
+"""
+Locations of people and organisations for display on a map.
+
+Markers for every person and organisation are built together in a constant number of queries.
+They are grouped into clusters on a grid for each zoom level of the map, so that the map
+only needs to draw one marker per cluster.  Markers at exactly the same location are always
+grouped.  Clusters are cached until a location may have changed.
+
+When zoomed in, markers within the visible area are found using the geohash index of current
+answer sets.
+"""
+
+import logging
+import time
+import typing
+
+from django.core.cache import cache
+from django.db.models import F, Q, QuerySet
+from django.urls import reverse
+from django_countries import countries
+import numpy as np
+
+from people import geohash, models
+from people.models.question import VALID_TO_CURRENT
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+#: Cache key under which the current location data version is stored
+VERSION_CACHE_KEY = 'people.geo.version'
+
+#: Prefix for cache keys of map data
+CACHE_PREFIX = 'people.geo'
+
+#: How long should map data be kept in the cache?  Seconds
+CACHE_TIMEOUT = 60 * 60 * 24
+
+#: Models from which locations are taken - writes to these invalidate cached map data
+SOURCE_MODELS = [
+    models.Person,
+    models.PersonAnswerSet,
+    models.Organisation,
+    models.OrganisationAnswerSet,
+]
+
+#: Size of the map at zoom level 0 - in screen pixels
+TILE_SIZE = 256
+
+#: Width of the grid cells in which markers are clustered - in screen pixels
+GRID_SIZE = 60
+
+#: Maximum zoom level of the map
+MAX_ZOOM = 21
+
+#: Zoom level beyond which only markers at the same location are clustered
+MAX_CLUSTER_ZOOM = 16
+
+#: Mean radius of the Earth - in kilometres
+EARTH_RADIUS = 6371.0088
+
+#: Marker types
+TYPES = ['Person', 'Organisation']
+
+#: Data to mark a person or organisation on a map
+Marker = typing.Dict[str, typing.Any]
+
+#: Locations of markers as parallel lists of 'type', 'pk', 'name', 'url', 'lat' and 'lng'
+Points = typing.Dict[str, typing.List]
+
+#: Bounding box as (south, west, north, east) in degrees - crosses the antimeridian if west > east
+BoundingBox = typing.Tuple[float, float, float, float]
+
+
+def get_data_version() -> float:
+    """Get the version of the data from which map data is built."""
+    return cache.get_or_set(VERSION_CACHE_KEY, time.time, timeout=None)
+
+
+def invalidate(*args, **kwargs) -> None:
+    """Invalidate all cached map data.
+
+    May be used directly as a signal receiver.
+    """
+    cache.set(VERSION_CACHE_KEY, time.time(), timeout=None)
+
+
+def build_markers(people: typing.Optional[QuerySet] = None,
+                  organisations: typing.Optional[QuerySet] = None) -> typing.List[Marker]:
+    """Prepare data to mark people and organisations on a map.
+
+    Current answer sets, organisations and URLs are resolved for all markers at once in a
+    constant number of queries.
+
+    :param people: People to mark - defaults to all
+    :param organisations: Organisations to mark - defaults to all
+    :return: Markers for people then organisations
+    """
+    if people is None:
+        people = models.Person.objects.all()
+    if organisations is None:
+        organisations = models.Organisation.objects.all()
+
+    # Current answer sets are joined through the pointer maintained on each person
+    person_answers = {
+        row['pk']: row
+        for row in people.filter(current_answer_set__isnull=False).values(
+            'pk',
+            latitude=F('current_answer_set__latitude'),
+            longitude=F('current_answer_set__longitude'),
+            country_of_residence=F('current_answer_set__country_of_residence'),
+            organisation=F('current_answer_set__organisation'),
+            organisation_name=F('current_answer_set__organisation__name'),
+        )
+    }
+
+    # Locations of organisations being marked and those people are members of
+    organisation_names = dict(organisations.values_list('pk', 'name'))
+    organisation_pks = set(organisation_names)
+    organisation_pks.update(
+        row['organisation'] for row in person_answers.values() if row['organisation'] is not None
+    )
+    organisation_answers = {
+        pk: (lat, lng)
+        for pk, lat, lng in models.Organisation.objects.filter(
+            pk__in=organisation_pks, current_answer_set__isnull=False
+        ).values_list('pk', 'current_answer_set__latitude', 'current_answer_set__longitude')
+    }
+
+    markers = []
+
+    for pk, name in people.values_list('pk', 'name'):
+        answers = person_answers.get(pk, {})
+        organisation = answers.get('organisation')
+        org_lat, org_lng = organisation_answers.get(organisation, (None, None))
+        country = answers.get('country_of_residence')
+
+        markers.append({
+            'name': name,
+            'lat': answers.get('latitude'),
+            'lng': answers.get('longitude'),
+            'organisation': answers.get('organisation_name'),
+            'org_lat': org_lat,
+            'org_lng': org_lng,
+            'country': countries.name(country) if country else None,
+            'url': reverse('people:person.detail', kwargs={'pk': pk}),
+            'type': 'Person',
+            'pk': pk,
+        })
+
+    for pk, name in organisation_names.items():
+        lat, lng = organisation_answers.get(pk, (None, None))
+
+        # The organisation of an organisation's answer set is itself
+        markers.append({
+            'name': name,
+            'lat': lat,
+            'lng': lng,
+            'organisation': name if pk in organisation_answers else None,
+            'org_lat': lat,
+            'org_lng': lng,
+            'country': None,
+            'url': reverse('people:organisation.detail', kwargs={'pk': pk}),
+            'type': 'Organisation',
+            'pk': pk,
+        })
+
+    return markers
+
+
+def get_markers() -> typing.List[Marker]:
+    """Get markers for every person and organisation - from the cache if possible."""
+    key = f'{CACHE_PREFIX}.markers.{get_data_version()}'
+
+    markers = cache.get(key)
+    if markers is None:
+        markers = build_markers()
+        cache.set(key, markers, timeout=CACHE_TIMEOUT)
+        logger.info('Built %d map markers', len(markers))
+
+    return markers
+
+
+def build_points(markers: typing.Iterable[Marker]) -> Points:
+    """Get the location of every marker with a known location.
+
+    People without a location of their own are placed at the location of their organisation.
+    """
+    points = {'type': [], 'pk': [], 'name': [], 'url': [], 'lat': [], 'lng': []}
+
+    for marker in markers:
+        lat, lng = marker['lat'], marker['lng']
+        if lat is None or lng is None:
+            lat, lng = marker['org_lat'], marker['org_lng']
+
+        if lat is not None and lng is not None:
+            points['type'].append(marker['type'])
+            points['pk'].append(marker['pk'])
+            points['name'].append(marker['name'])
+            points['url'].append(marker['url'])
+            points['lat'].append(lat)
+            points['lng'].append(lng)
+
+    return points
+
+
+def get_points() -> Points:
+    """Get the current location of every person and organisation - from the cache if possible."""
+    key = f'{CACHE_PREFIX}.points.{get_data_version()}'
+
+    points = cache.get(key)
+    if points is None:
+        points = build_points(get_markers())
+        cache.set(key, points, timeout=CACHE_TIMEOUT)
+
+    return points
+
+
+def project(lat: np.ndarray, lng: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """Project latitude and longitude to Web Mercator world coordinates as used by Google Maps.
+
+    :return: Arrays of x and y coordinates in pixels at zoom level 0
+    """
+    x = (lng + 180) / 360 * TILE_SIZE
+
+    sin_lat = np.clip(np.sin(np.radians(lat)), -0.9999, 0.9999)
+    y = (0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * np.pi)) * TILE_SIZE
+
+    return x, y
+
+
+def build_clusters(points: Points, zoom: int) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Group markers into clusters on a grid at a zoom level.
+
+    :param points: Locations of markers
+    :param zoom: Zoom level of the map
+    :return: Clusters, each with its mean location, bounds and number of markers of each type.
+        Clusters of one marker, or of markers at exactly the same location, list their members.
+    """
+    lat = np.array(points['lat'], dtype=float)
+    lng = np.array(points['lng'], dtype=float)
+    if not len(lat):
+        return []
+
+    if zoom > MAX_CLUSTER_ZOOM:
+        keys = np.stack([lat, lng], axis=1)
+
+    else:
+        x, y = project(lat, lng)
+        scale = 2 ** zoom / GRID_SIZE
+        keys = np.stack([np.floor(x * scale), np.floor(y * scale)], axis=1)
+
+    _, labels = np.unique(keys, axis=0, return_inverse=True)
+    labels = labels.ravel()
+    n_clusters = labels.max() + 1
+
+    counts = np.bincount(labels, minlength=n_clusters)
+    mean_lat = np.bincount(labels, weights=lat, minlength=n_clusters) / counts
+    mean_lng = np.bincount(labels, weights=lng, minlength=n_clusters) / counts
+
+    south = np.full(n_clusters, np.inf)
+    north = np.full(n_clusters, -np.inf)
+    west = np.full(n_clusters, np.inf)
+    east = np.full(n_clusters, -np.inf)
+    np.minimum.at(south, labels, lat)
+    np.maximum.at(north, labels, lat)
+    np.minimum.at(west, labels, lng)
+    np.maximum.at(east, labels, lng)
+
+    type_counts = {}
+    for type_name in TYPES:
+        is_type = np.array([t == type_name for t in points['type']], dtype=float)
+        type_counts[type_name] = np.bincount(labels, weights=is_type, minlength=n_clusters)
+
+    co_located = (south == north) & (west == east)
+    members = {label: [] for label in np.flatnonzero(co_located).tolist()}
+    for i, label in enumerate(labels.tolist()):
+        if label in members:
+            members[label].append({
+                'type': points['type'][i],
+                'name': points['name'][i],
+                'url': points['url'][i],
+                'lat': points['lat'][i],
+                'lng': points['lng'][i],
+            })
+
+    return [{
+        'lat': float(mean_lat[i]),
+        'lng': float(mean_lng[i]),
+        'count': int(counts[i]),
+        'counts': {type_name: int(type_counts[type_name][i]) for type_name in TYPES},
+        'bounds': {
+            'south': float(south[i]),
+            'west': float(west[i]),
+            'north': float(north[i]),
+            'east': float(east[i]),
+        },
+        'members': members.get(i),
+    } for i in range(n_clusters)]
+
+
+def get_clusters(zoom: int) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Get clusters of markers at a zoom level - from the cache if possible."""
+    key = f'{CACHE_PREFIX}.clusters.{get_data_version()}.{zoom}'
+
+    clusters = cache.get(key)
+    if clusters is None:
+        clusters = build_clusters(get_points(), zoom)
+        cache.set(key, clusters, timeout=CACHE_TIMEOUT)
+        logger.info('Built %d map clusters at zoom level %d', len(clusters), zoom)
+
+    return clusters
+
+
+def geohash_filter(bbox: BoundingBox) -> Q:
+    """Build a filter selecting current answer sets with a location in or near a bounding box.
+
+    Each range of geohashes is a separate condition on the location index.
+    """
+    south, west, north, east = bbox
+
+    boxes = [(south, west, north, east)]
+    if west > east:
+        boxes = [(south, west, north, 180), (south, -180, north, east)]
+
+    condition = Q()
+    for box in boxes:
+        for start, end in geohash.cover(*box):
+            condition |= Q(valid_to=VALID_TO_CURRENT, geohash__gte=start, geohash__lt=end)
+
+    return condition
+
+
+def in_bbox(lat: np.ndarray, lng: np.ndarray, bbox: BoundingBox) -> np.ndarray:
+    """Test which locations are within a bounding box."""
+    south, west, north, east = bbox
+
+    in_lat = (lat >= south) & (lat <= north)
+    if west > east:
+        return in_lat & ((lng >= west) | (lng <= east))
+
+    return in_lat & (lng >= west) & (lng <= east)
+
+
+def select_points(points: Points, mask: np.ndarray) -> Points:
+    """Select the markers for which a mask is true."""
+    indices = np.flatnonzero(mask).tolist()
+    return {field: [values[i] for i in indices] for field, values in points.items()}
+
+
+def find_points(bbox: BoundingBox) -> Points:
+    """Find the current location of every person and organisation within a bounding box.
+
+    People without a location of their own are placed at the location of their organisation.
+    """
+    condition = geohash_filter(bbox)
+    points = {'type': [], 'pk': [], 'name': [], 'url': [], 'lat': [], 'lng': []}
+
+    def add(type_name, rows, view_name):
+        for pk, name, lat, lng in rows:
+            points['type'].append(type_name)
+            points['pk'].append(pk)
+            points['name'].append(name)
+            points['url'].append(reverse(view_name, kwargs={'pk': pk}))
+            points['lat'].append(lat)
+            points['lng'].append(lng)
+
+    organisations = list(
+        models.OrganisationAnswerSet.objects.filter(condition).values_list(
+            'organisation', 'organisation__name', 'latitude', 'longitude'
+        ).order_by()
+    )
+    add('Organisation', organisations, 'people:organisation.detail')
+
+    add('Person',
+        models.PersonAnswerSet.objects.filter(condition).values_list(
+            'person', 'person__name', 'latitude', 'longitude'
+        ).order_by(),
+        'people:person.detail')
+
+    locations = {pk: (lat, lng) for pk, name, lat, lng in organisations}
+    members = models.PersonAnswerSet.objects.filter(
+        Q(latitude__isnull=True) | Q(longitude__isnull=True),
+        valid_to=VALID_TO_CURRENT,
+        organisation__in=list(locations)
+    ).values_list('person', 'person__name', 'organisation').order_by()
+
+    add('Person', [(pk, name) + locations[organisation] for pk, name, organisation in members],
+        'people:person.detail')
+
+    # Cells covering the bounding box may overhang it
+    return select_points(
+        points,
+        in_bbox(np.array(points['lat'], dtype=float), np.array(points['lng'], dtype=float), bbox)
+    )
+
+
+def haversine(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Calculate the great circle distance from one location to each of many - in kilometres."""
+    lat, lng, lats, lngs = map(np.radians, (lat, lng, lats, lngs))
+
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def radius_bbox(lat: float, lng: float, radius: float) -> BoundingBox:
+    """Find a bounding box containing every location within a distance of a location.
+
+    :param radius: Distance in kilometres
+    """
+    angle = radius / EARTH_RADIUS
+    south = max(lat - np.degrees(angle), -90)
+    north = min(lat + np.degrees(angle), 90)
+
+    # Circles containing a pole contain every longitude
+    if south == -90 or north == 90:
+        return south, -180, north, 180
+
+    ratio = np.sin(angle) / np.cos(np.radians(lat))
+    if ratio >= 1:
+        return south, -180, north, 180
+
+    spread = np.degrees(np.arcsin(ratio))
+    west = (lng - spread + 180) % 360 - 180
+    east = (lng + spread + 180) % 360 - 180
+
+    return south, west, north, east
+
+
+def find_points_within(lat: float, lng: float, radius: float) -> Points:
+    """Find the current location of every person and organisation within a distance of a location.
+
+    :param radius: Distance in kilometres
+    :return: Locations of markers, with their distance in kilometres as 'distance', nearest first
+    """
+    points = find_points(radius_bbox(lat, lng, radius))
+
+    distance = haversine(lat, lng, np.array(points['lat'], dtype=float),
+                         np.array(points['lng'], dtype=float))
+    points['distance'] = distance.round(3).tolist()
+
+    order = np.argsort(distance, kind='stable')
+    order = order[distance[order] <= radius].tolist()
+
+    return {field: [values[i] for i in order] for field, values in points.items()}
+
+
+def to_geojson(points: Points) -> typing.Dict[str, typing.Any]:
+    """Convert marker locations to a GeoJSON feature collection."""
+    properties = [field for field in points if field not in {'lat', 'lng'}]
+
+    return {
+        'type': 'FeatureCollection',
+        'features': [{
+            'type': 'Feature',
+            'geometry': {
+                'type': 'Point',
+                'coordinates': [lng, lat],
+            },
+            'properties': {field: points[field][i] for field in properties},
+        } for i, (lat, lng) in enumerate(zip(points['lat'], points['lng']))],
+    }
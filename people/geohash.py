@@ -0,0 +1,105 @@
+"""
+Geohash encoding of locations for indexed spatial queries.
+
+A geohash is a base 32 string identifying a rectangular cell on a grid over the Earth, formed by
+interleaving the bits of the cell's longitude and latitude indices.  Each character added to a
+geohash divides its cell into 32, so the locations within a cell are exactly those whose geohash
+starts with the cell's geohash - and a bounding box can be searched as a few ranges of an
+ordinary index.
+"""
+
+import typing
+
+#: Characters used to encode geohashes - in increasing order, as are their character codes
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+#: Character sorting after all geohash characters - used as an exclusive upper bound
+END = '{'
+
+#: Number of characters in stored geohashes - cells of roughly 5m by 5m
+PRECISION = 9
+
+#: Maximum number of cells used to cover a bounding box
+MAX_CELLS = 32
+
+
+def bits(precision: int) -> typing.Tuple[int, int]:
+    """Get the number of bits of latitude and longitude in a geohash of a given precision."""
+    total = 5 * precision
+    return total // 2, total - total // 2
+
+
+def cell_index(value: float, minimum: float, maximum: float, n_bits: int) -> int:
+    """Get the index of the cell along one axis containing a value."""
+    n_cells = 2 ** n_bits
+    index = int((value - minimum) / (maximum - minimum) * n_cells)
+
+    return min(max(index, 0), n_cells - 1)
+
+
+def interleave(lat_index: int, lng_index: int, precision: int) -> int:
+    """Interleave the bits of the latitude and longitude indices of a cell - longitude first."""
+    lat_bits, lng_bits = bits(precision)
+
+    value = 0
+    for i in range(lat_bits + lng_bits):
+        if i % 2 == 0:
+            bit = lng_index >> (lng_bits - 1 - i // 2)
+        else:
+            bit = lat_index >> (lat_bits - 1 - i // 2)
+
+        value = (value << 1) | (bit & 1)
+
+    return value
+
+
+def to_string(value: int, precision: int) -> str:
+    """Encode the interleaved bits of a cell as a geohash string."""
+    return ''.join(BASE32[(value >> (5 * (precision - 1 - i))) & 31] for i in range(precision))
+
+
+def encode(lat: typing.Optional[float],
+           lng: typing.Optional[float],
+           precision: int = PRECISION) -> str:
+    """Get the geohash of a location - empty if the location is not known."""
+    if lat is None or lng is None:
+        return ''
+
+    lat_bits, lng_bits = bits(precision)
+    return to_string(
+        interleave(cell_index(lat, -90, 90, lat_bits), cell_index(lng, -180, 180, lng_bits),
+                   precision), precision)
+
+
+def cover(south: float, west: float, north: float,
+          east: float) -> typing.List[typing.Tuple[str, str]]:
+    """Find ranges of geohashes covering a bounding box which does not cross the antimeridian.
+
+    The most precise grid needing no more than :data:`MAX_CELLS` cells is used, so the ranges
+    may include locations a little outside of the box.
+
+    :return: List of (inclusive lower bound, exclusive upper bound) pairs
+    """
+    for precision in range(PRECISION, 0, -1):
+        lat_bits, lng_bits = bits(precision)
+        lat_range = range(cell_index(south, -90, 90, lat_bits),
+                          cell_index(north, -90, 90, lat_bits) + 1)
+        lng_range = range(cell_index(west, -180, 180, lng_bits),
+                          cell_index(east, -180, 180, lng_bits) + 1)
+
+        if len(lat_range) * len(lng_range) <= MAX_CELLS:
+            break
+
+    cells = sorted(interleave(i, j, precision) for i in lat_range for j in lng_range)
+
+    # Join neighbouring cells into a single range
+    ranges = []
+    start = previous = cells[0]
+    for cell in cells[1:] + [None]:
+        if cell != previous + 1:
+            ranges.append((to_string(start, precision), to_string(previous, precision) + END))
+            start = cell
+
+        previous = cell
+
+    return ranges
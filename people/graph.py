@@ -0,0 +1,396 @@
+"""
+Neighbourhood and path queries over the relationship network.
+
+Queries use an adjacency index of the network matching a set of filters.  Indexes are cached
+alongside the network snapshot with the same filters, and each process keeps the most recently
+used indexes in memory.
+"""
+
+import collections
+import functools
+import heapq
+import logging
+import typing
+
+from django.core.cache import cache
+from django.forms import Form
+import numpy as np
+from scipy import sparse
+
+from people import analytics, models, network
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+#: Number of adjacency indexes each process keeps in memory
+MEMORY_CACHE_SIZE = 8
+
+#: Default number of hops from a person to include in their ego network
+DEFAULT_HOPS = 2
+
+#: Maximum number of hops from a person to include in their ego network
+MAX_HOPS = 5
+
+#: Maximum number of alternative paths to find between two people
+MAX_PATHS = 3
+
+#: Adjacency indexes in memory, most recently used last
+_indexes = collections.OrderedDict()
+
+
+class AdjacencyIndex(typing.NamedTuple):
+    """Adjacency index of the network matching a set of filters."""
+    #: Node and edge tables of the network, without positions
+    tables: network.Snapshot
+
+    #: Ids of nodes, as used in Cytoscape, in the order of rows of the adjacency matrix
+    nodes: typing.List[str]
+
+    #: Row of each node in the adjacency matrix
+    index: typing.Dict[str, int]
+
+    #: Symmetric binary adjacency matrix
+    adjacency: sparse.csr_matrix
+
+
+def build_index(all_forms: typing.Mapping[str, Form]) -> AdjacencyIndex:
+    """Build the adjacency index of the network matching a set of valid filter forms."""
+    tables = network.build_tables(all_forms)
+    nodes, edges = network.get_elements(tables)
+
+    adjacency = analytics.build_adjacency(len(nodes), analytics.index_elements(nodes, edges))
+
+    return AdjacencyIndex(
+        tables=tables,
+        nodes=nodes,
+        index={node: i for i, node in enumerate(nodes)},
+        adjacency=adjacency,
+    )
+
+
+def get_index(all_forms: typing.Mapping[str, Form]) -> AdjacencyIndex:
+    """Get the adjacency index of the network matching a set of valid filter forms.
+
+    Indexes are taken from memory, then from the cache, before being built.
+    """
+    key = f'{network.snapshot_key(all_forms)}.adjacency'
+
+    try:
+        _indexes.move_to_end(key)
+        return _indexes[key]
+
+    except KeyError:
+        pass
+
+    index = cache.get(key)
+    if index is None:
+        index = build_index(all_forms)
+        cache.set(key, index, timeout=network.SNAPSHOT_TIMEOUT)
+
+    _indexes[key] = index
+    while len(_indexes) > MEMORY_CACHE_SIZE:
+        _indexes.popitem(last=False)
+
+    return index
+
+
+def neighbourhood(adjacency: sparse.csr_matrix, start: int, hops: int) -> np.ndarray:
+    """Find the nodes within a number of hops of a node using breadth first search.
+
+    :param adjacency: Symmetric binary adjacency matrix
+    :param start: Row of the starting node in the adjacency matrix
+    :param hops: Maximum number of edges between the starting node and a node in the result
+    :return: Array of rows of nodes within range, including the starting node
+    """
+    reached = np.zeros(adjacency.shape[0], dtype=bool)
+    reached[start] = True
+    frontier = np.array([start])
+
+    for _ in range(hops):
+        neighbours = np.unique(adjacency[frontier].indices)
+        frontier = neighbours[~reached[neighbours]]
+        if not len(frontier):
+            break
+
+        reached[frontier] = True
+
+    return np.flatnonzero(reached)
+
+
+def build_ego_network(all_forms: typing.Mapping[str, Form],
+                      person_pk: int,
+                      hops: int = DEFAULT_HOPS) -> typing.Optional[network.Snapshot]:
+    """Build the network within a number of hops of a person, matching a set of valid filter forms.
+
+    The result is in the same format as a full network snapshot, with the degree of each node
+    counted in the full network.
+
+    :return: Ego network - or None if the person is not in the filtered network
+    """
+    index = get_index(all_forms)
+
+    start = index.index.get(f'person-{person_pk}')
+    if start is None:
+        return None
+
+    rows = neighbourhood(index.adjacency, start, hops)
+    snapshot = network.select_nodes(index.tables, {index.nodes[i] for i in rows})
+
+    degree = np.diff(index.adjacency.indptr)
+    network.add_layout(snapshot, {index.nodes[i]: int(degree[i]) for i in rows})
+
+    logger.info('Found %d nodes within %d hops of person %d', len(rows), hops, person_pk)
+
+    return snapshot
+
+
+def get_ego_network(all_forms: typing.Mapping[str, Form],
+                    person_pk: int,
+                    hops: int = DEFAULT_HOPS) -> typing.Optional[network.Snapshot]:
+    """Get the network within a number of hops of a person - from the cache if possible."""
+    key = f'{network.snapshot_key(all_forms)}.ego.{person_pk}.{hops}'
+
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_ego_network(all_forms, person_pk, hops)
+        if snapshot is not None:
+            cache.set(key, snapshot, timeout=network.SNAPSHOT_TIMEOUT)
+
+    return snapshot
+
+
+def build_costs(all_forms: typing.Mapping[str, Form],
+                index: AdjacencyIndex,
+                question: models.RelationshipQuestion) -> sparse.csr_matrix:
+    """Build a matrix of the cost of introductions along each edge of the network.
+
+    The cost of a relationship is one more than the position of its answer to a question in the
+    list of answers to that question - so answers listed first are considered the strongest.
+    Edges without an answer to the question cost the most.
+    Where there are relationships in both directions between two people the cheapest is used.
+
+    :param all_forms: Valid network filter forms
+    :param index: Adjacency index of the network matching the filter forms
+    :param question: Question by whose answers relationships should be weighted
+    """
+    choices = list(question.answers.values_list('pk', flat=True))
+    rank = {pk: i for i, pk in enumerate(choices)}
+    default_cost = len(choices) + 1
+
+    at_date = network.get_at_date(all_forms)
+    answers = models.RelationshipAnswerSet.objects.as_of(at_date).filter(
+        relationship__in=network.filter_relationships(all_forms['relationship'], at_date=at_date),
+        question_answers__question=question
+    ).values_list('relationship', 'question_answers')
+
+    relationship_costs = {}
+    for relationship, answer in answers:
+        cost = rank[answer] + 1
+        relationship_costs[relationship] = min(cost, relationship_costs.get(relationship, cost))
+
+    # Relationships come first in the list of edges
+    nodes, edges = network.get_elements(index.tables)
+    costs = [relationship_costs.get(pk, default_cost) for pk in index.tables['relationships']['id']]
+    costs.extend([default_cost] * (len(edges) - len(costs)))
+
+    edge_array = analytics.index_elements(nodes, edges)
+    costs = np.array(costs, dtype=float)
+
+    # Undirected - keep the cheapest edge between each pair of nodes
+    rows = np.concatenate([edge_array[:, 0], edge_array[:, 1]])
+    cols = np.concatenate([edge_array[:, 1], edge_array[:, 0]])
+    costs = np.concatenate([costs, costs])
+
+    pairs = rows * len(nodes) + cols
+    order = np.lexsort((costs, pairs))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = pairs[order][1:] != pairs[order][:-1]
+    order = order[first & (rows[order] != cols[order])]
+
+    return sparse.csr_matrix((costs[order], (rows[order], cols[order])),
+                             shape=(len(nodes), len(nodes)))
+
+
+def get_costs(all_forms: typing.Mapping[str, Form],
+              index: AdjacencyIndex,
+              question: models.RelationshipQuestion) -> sparse.csr_matrix:
+    """Get the matrix of introduction costs weighted by a question - from the cache if possible."""
+    key = f'{network.snapshot_key(all_forms)}.costs.{question.pk}'
+
+    costs = cache.get(key)
+    if costs is None:
+        costs = build_costs(all_forms, index, question)
+        cache.set(key, costs, timeout=network.SNAPSHOT_TIMEOUT)
+
+    return costs
+
+
+def join_path(parents: typing.Mapping[int, typing.Optional[int]],
+              children: typing.Mapping[int, typing.Optional[int]],
+              meeting: int) -> typing.List[int]:
+    """Join the halves of a path found by bidirectional search where they meet."""
+    path = []
+
+    node = meeting
+    while node is not None:
+        path.append(node)
+        node = parents[node]
+    path.reverse()
+
+    node = children[meeting]
+    while node is not None:
+        path.append(node)
+        node = children[node]
+
+    return path
+
+
+def bidirectional_bfs(adjacency: sparse.csr_matrix,
+                      start: int,
+                      end: int,
+                      excluded: typing.Container[int] = ()) -> typing.Optional[typing.List[int]]:
+    """Find a shortest path between two nodes by breadth first search from both ends.
+
+    :param adjacency: Symmetric binary adjacency matrix
+    :param start: Row of the node at the start of the path
+    :param end: Row of the node at the end of the path
+    :param excluded: Rows of nodes which may not be used in the path
+    :return: Rows of the nodes along the path - or None if there is no path
+    """
+    if start == end:
+        return [start]
+
+    indptr, indices = adjacency.indptr, adjacency.indices
+
+    # Node -> previous node on the path from the start / next node on the path to the end
+    parents = {start: None}
+    children = {end: None}
+    forward, backward = [start], [end]
+
+    while forward and backward:
+        # Expand the smaller frontier
+        expand_forward = len(forward) <= len(backward)
+        frontier = forward if expand_forward else backward
+        seen, other = (parents, children) if expand_forward else (children, parents)
+
+        next_frontier = []
+        for node in frontier:
+            for neighbour in indices[indptr[node]:indptr[node + 1]].tolist():
+                if neighbour in seen or neighbour in excluded:
+                    continue
+
+                seen[neighbour] = node
+                if neighbour in other:
+                    return join_path(parents, children, neighbour)
+
+                next_frontier.append(neighbour)
+
+        if expand_forward:
+            forward = next_frontier
+        else:
+            backward = next_frontier
+
+    return None
+
+
+def dijkstra(costs: sparse.csr_matrix,
+             start: int,
+             end: int,
+             excluded: typing.Container[int] = ()) -> typing.Optional[typing.List[int]]:
+    """Find a cheapest path between two nodes using Dijkstra's algorithm.
+
+    The search stops as soon as the end node is reached.
+
+    :param costs: Symmetric matrix of the cost of each edge
+    :param start: Row of the node at the start of the path
+    :param end: Row of the node at the end of the path
+    :param excluded: Rows of nodes which may not be used in the path
+    :return: Rows of the nodes along the path - or None if there is no path
+    """
+    indptr, indices, data = costs.indptr, costs.indices, costs.data
+
+    parents = {start: None}
+    distances = {start: 0.0}
+    queue = [(0.0, start)]
+    done = set()
+
+    while queue:
+        distance, node = heapq.heappop(queue)
+        if node == end:
+            return join_path(parents, {end: None}, end)
+
+        if node in done:
+            continue
+        done.add(node)
+
+        for neighbour, cost in zip(indices[indptr[node]:indptr[node + 1]].tolist(),
+                                   data[indptr[node]:indptr[node + 1]].tolist()):
+            if neighbour in excluded or neighbour in done:
+                continue
+
+            new_distance = distance + cost
+            if new_distance < distances.get(neighbour, np.inf):
+                distances[neighbour] = new_distance
+                parents[neighbour] = node
+                heapq.heappush(queue, (new_distance, neighbour))
+
+    return None
+
+
+#: Nodes along a path, each with an 'id', 'name' and 'kind'
+Path = typing.List[typing.Dict[str, str]]
+
+
+def find_paths(all_forms: typing.Mapping[str, Form],
+               source_pk: int,
+               target_pk: int,
+               question: typing.Optional[models.RelationshipQuestion] = None,
+               max_paths: int = MAX_PATHS) -> typing.Optional[typing.List[Path]]:
+    """Find chains of contacts between two people in the network matching a set of valid filter
+    forms.
+
+    Each path after the first avoids the intermediate nodes of all previous paths, so offers
+    different introductions.
+
+    :param all_forms: Valid network filter forms
+    :param source_pk: Primary key of the person at the start of the paths
+    :param target_pk: Primary key of the person at the end of the paths
+    :param question: Relationship question by whose answers paths should be weighted - if not
+        given the paths with fewest steps are found
+    :param max_paths: Maximum number of paths to find
+    :return: Paths as lists of nodes with 'id', 'name' and 'kind' - or None if either person is
+        not in the network
+    """
+    index = get_index(all_forms)
+
+    start = index.index.get(f'person-{source_pk}')
+    end = index.index.get(f'person-{target_pk}')
+    if start is None or end is None:
+        return None
+
+    if question is None:
+        search = functools.partial(bidirectional_bfs, index.adjacency)
+    else:
+        search = functools.partial(dijkstra, get_costs(all_forms, index, question))
+
+    names = index.tables['people']['name'] + index.tables['organisations']['name']
+
+    paths = []
+    excluded = set()
+    while len(paths) < max_paths:
+        path = search(start, end, excluded)
+        if path is None:
+            break
+
+        paths.append([{
+            'id': index.nodes[node],
+            'name': names[node],
+            'kind': index.nodes[node].rsplit('-', 1)[0],
+        } for node in path])
+
+        # A direct relationship has no alternatives
+        if len(path) <= 2:
+            break
+
+        excluded.update(path[1:-1])
+
+    return paths
@@ -0,0 +1,202 @@
+"""
+Force-directed layout of the relationship network.
+
+Layouts are computed on the server using a vectorised version of the Fruchterman-Reingold
+algorithm so that browsers only need to place nodes at the positions provided.
+
+The positions of the most recently laid out network are remembered, so that nodes it shares
+with the next network - e.g. when it is redrawn with different filters or after a change - stay
+in roughly the same place.
+"""
+
+import logging
+import typing
+
+from django.core.cache import cache
+import numpy as np
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+#: Cache key under which the positions of the most recently laid out network are stored
+POSITIONS_CACHE_KEY = 'people.layout.positions'
+
+#: Ideal distance between connected nodes - in Cytoscape pixels
+IDEAL_EDGE_LENGTH = 400.0
+
+#: Number of iterations to run when all nodes are new
+MAX_ITERATIONS = 50
+
+#: Number of iterations to run when all nodes have a previous position
+MIN_ITERATIONS = 10
+
+#: Strength of pull towards the centre - stops disconnected components drifting apart
+GRAVITY = 0.05
+
+#: Fraction of the temperature by which previously positioned nodes may move - keeps them in place
+KNOWN_NODE_MOBILITY = 0.1
+
+#: Maximum number of node pairs for which repulsion is calculated at once - limits memory use
+MAX_CHUNK_PAIRS = 2 ** 21
+
+Positions = typing.Dict[str, typing.List[float]]
+
+
+def fruchterman_reingold(pos: np.ndarray,
+                         edges: np.ndarray,
+                         iterations: int = MAX_ITERATIONS,
+                         temperature: typing.Optional[float] = None,
+                         k: float = IDEAL_EDGE_LENGTH,
+                         mobility: typing.Optional[np.ndarray] = None) -> np.ndarray:
+    """Refine node positions using the Fruchterman-Reingold force-directed algorithm.
+
+    :param pos: Array of shape (n, 2) of initial node positions
+    :param edges: Integer array of shape (m, 2) of node indices at each end of an edge
+    :param iterations: Number of iterations to run
+    :param temperature: Maximum distance a node may move in the first iteration - decreases linearly
+    :param k: Ideal distance between connected nodes
+    :param mobility: Array of shape (n, ) of multipliers for the temperature of each node
+    :return: Array of shape (n, 2) of final node positions
+    """
+    # Single precision is plenty for screen coordinates and halves memory traffic
+    pos = np.array(pos, dtype=np.float32)
+    n_nodes = pos.shape[0]
+    if n_nodes < 2 or iterations < 1:
+        return pos
+
+    if mobility is None:
+        mobility = np.ones(n_nodes)
+
+    if temperature is None:
+        temperature = k * np.sqrt(n_nodes)
+
+    source, target = edges[:, 0], edges[:, 1]
+    chunk_size = max(1, MAX_CHUNK_PAIRS // n_nodes)
+    cooling = temperature / iterations
+
+    for _ in range(iterations):
+        disp = np.zeros_like(pos)
+        x, y = pos[:, 0], pos[:, 1]
+
+        # Repulsion between all pairs of nodes: k^2 / d along the line between them
+        for start in range(0, n_nodes, chunk_size):
+            end = start + chunk_size
+            dx = np.subtract.outer(x[start:end], x)
+            dy = np.subtract.outer(y[start:end], y)
+
+            factor = dx * dx + dy * dy
+            np.maximum(factor, 0.01, out=factor)
+            np.divide(k * k, factor, out=factor)
+
+            disp[start:end, 0] += (dx * factor).sum(axis=1)
+            disp[start:end, 1] += (dy * factor).sum(axis=1)
+
+        # Attraction between connected nodes: d^2 / k along the edge
+        delta = pos[source] - pos[target]
+        dist = np.sqrt((delta ** 2).sum(axis=-1))
+        force = delta * (dist / k)[:, np.newaxis]
+        np.subtract.at(disp, source, force)
+        np.add.at(disp, target, force)
+
+        disp -= GRAVITY * pos
+
+        # Move each node along its displacement, but no further than the current temperature
+        length = np.maximum(np.sqrt((disp ** 2).sum(axis=-1)), 0.01)
+        pos += disp * (np.minimum(length, temperature * mobility) / length)[:, np.newaxis]
+
+        temperature = max(temperature - cooling, 1.0)
+
+    return pos
+
+
+def initial_positions(nodes: typing.Sequence[str],
+                      edges: np.ndarray,
+                      previous: Positions,
+                      rng: np.random.Generator,
+                      k: float = IDEAL_EDGE_LENGTH) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """Get starting positions for a layout.
+
+    Nodes which have been laid out before start where they were last time.
+    New nodes start near the average position of their positioned neighbours, or at random.
+
+    :return: Array of shape (n, 2) of positions and boolean array of which nodes had a previous
+        position
+    """
+    n_nodes = len(nodes)
+    spread = k * np.sqrt(max(n_nodes, 1))
+
+    pos = rng.uniform(-spread / 2, spread / 2, size=(n_nodes, 2))
+    known = np.zeros(n_nodes, dtype=bool)
+
+    for i, node in enumerate(nodes):
+        if node in previous:
+            pos[i] = previous[node]
+            known[i] = True
+
+    if known.any() and not known.all() and len(edges):
+        # Sum positions of known neighbours for each unknown node
+        both_ways = np.concatenate([edges, edges[:, ::-1]])
+        useful = known[both_ways[:, 1]] & ~known[both_ways[:, 0]]
+        both_ways = both_ways[useful]
+
+        neighbour_sum = np.zeros_like(pos)
+        np.add.at(neighbour_sum, both_ways[:, 0], pos[both_ways[:, 1]])
+        neighbour_count = np.bincount(both_ways[:, 0], minlength=n_nodes)
+
+        has_neighbours = neighbour_count > 0
+        pos[has_neighbours] = (
+            neighbour_sum[has_neighbours] / neighbour_count[has_neighbours, np.newaxis]
+            + rng.normal(scale=k / 4, size=(has_neighbours.sum(), 2))
+        )
+
+    return pos, known
+
+
+def compute_layout(nodes: typing.Sequence[str],
+                   edges: typing.Iterable[typing.Tuple[str, str]],
+                   cache_key: str = POSITIONS_CACHE_KEY,
+                   persist: bool = True) -> Positions:
+    """Compute positions for a network, starting from each node's position in the previous one.
+
+    :param nodes: Ids of nodes in the network, as used in Cytoscape
+    :param edges: Pairs of node ids - edges referring to nodes which are not present are ignored
+    :param cache_key: Cache key of the previous positions - networks of different kinds of node
+        should be kept apart
+    :param persist: Should these positions replace the previous positions?  Previews of part of
+        a network should not replace the positions of the whole network.
+    :return: Mapping of node id to [x, y] position
+    """
+    index = {node: i for i, node in enumerate(nodes)}
+    edge_array = np.array(
+        [(index[source], index[target]) for source, target in edges
+         if source in index and target in index and source != target],
+        dtype=int
+    ).reshape(-1, 2)
+
+    previous = cache.get(cache_key, {})
+
+    # Fixed seed so that the same network produces the same layout
+    rng = np.random.default_rng(0)
+    pos, known = initial_positions(nodes, edge_array, previous, rng)
+
+    # Networks which have mostly been laid out before only need to settle new nodes
+    new_fraction = 1 - known.mean() if len(nodes) else 0
+    iterations = int(MIN_ITERATIONS + (MAX_ITERATIONS - MIN_ITERATIONS) * new_fraction)
+    temperature = IDEAL_EDGE_LENGTH * max(np.sqrt(len(nodes)) * new_fraction, 1.0)
+
+    mobility = np.where(known, KNOWN_NODE_MOBILITY, 1.0)
+
+    pos = fruchterman_reingold(pos, edge_array,
+                               iterations=iterations,
+                               temperature=temperature,
+                               mobility=mobility)
+
+    positions = {node: [round(x, 1), round(y, 1)] for node, (x, y) in zip(nodes, pos.tolist())}
+    logger.info('Computed layout of %d nodes in %d iterations', len(nodes), iterations)
+
+    # Replaced rather than merged, so positions of deleted or filtered out nodes are not kept.
+    # When several layouts are built at once the last to finish is remembered - each is a
+    # complete layout, so the next one still starts from consistent positions.
+    if persist:
+        cache.set(cache_key, positions, timeout=None)
+
+    return positions
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from people import models
+
+#: Models with a `current_answer_set` maintained from their answer sets
+OWNER_MODELS = [
+    models.Person,
+    models.Organisation,
+    models.Relationship,
+    models.OrganisationRelationship,
+]
+
+
+class Command(BaseCommand):
+    help = 'Point people, organisations and relationships at their current answer sets'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for model in OWNER_MODELS:
+                n_updated = model.objects.update_current_answers()
+                self.stdout.write(f'Updated {n_updated} {model._meta.verbose_name_plural}')
@@ -0,0 +1,81 @@
+# Generated by Django 2.2.10 on 2026-10-16 22:45
+
+import datetime
+from django.db import migrations, models
+from django.utils.timezone import utc
+
+
+def migrate_forward(apps, schema_editor):
+    """Copy `replaced_timestamp` into `valid_to` for answer sets which have been replaced."""
+    for model_name in (
+        'OrganisationAnswerSet',
+        'OrganisationRelationshipAnswerSet',
+        'PersonAnswerSet',
+        'RelationshipAnswerSet',
+    ):
+        model = apps.get_model('people', model_name)
+        model.objects.filter(replaced_timestamp__isnull=False).update(
+            valid_to=models.F('replaced_timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0054_add_option_for_auto_negative_response'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organisationanswerset',
+            name='valid_to',
+            field=models.DateTimeField(default=datetime.datetime(9999, 12, 31, 0, 0, tzinfo=utc), editable=False),
+        ),
+        migrations.AddField(
+            model_name='organisationrelationshipanswerset',
+            name='valid_to',
+            field=models.DateTimeField(default=datetime.datetime(9999, 12, 31, 0, 0, tzinfo=utc), editable=False),
+        ),
+        migrations.AddField(
+            model_name='personanswerset',
+            name='valid_to',
+            field=models.DateTimeField(default=datetime.datetime(9999, 12, 31, 0, 0, tzinfo=utc), editable=False),
+        ),
+        migrations.AddField(
+            model_name='relationshipanswerset',
+            name='valid_to',
+            field=models.DateTimeField(default=datetime.datetime(9999, 12, 31, 0, 0, tzinfo=utc), editable=False),
+        ),
+        migrations.RunPython(migrate_forward, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='organisationanswerset',
+            index=models.Index(fields=['organisation', 'valid_to', 'timestamp'], name='oas_owner_validity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='organisationanswerset',
+            index=models.Index(fields=['valid_to', 'timestamp', 'organisation'], name='oas_validity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='organisationrelationshipanswerset',
+            index=models.Index(fields=['relationship', 'valid_to', 'timestamp'], name='oras_owner_validity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='organisationrelationshipanswerset',
+            index=models.Index(fields=['valid_to', 'timestamp', 'relationship'], name='oras_validity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='personanswerset',
+            index=models.Index(fields=['person', 'valid_to', 'timestamp'], name='pas_owner_validity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='personanswerset',
+            index=models.Index(fields=['valid_to', 'timestamp', 'person'], name='pas_validity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relationshipanswerset',
+            index=models.Index(fields=['relationship', 'valid_to', 'timestamp'], name='ras_owner_validity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relationshipanswerset',
+            index=models.Index(fields=['valid_to', 'timestamp', 'relationship'], name='ras_validity_idx'),
+        ),
+    ]
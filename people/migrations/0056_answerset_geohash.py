@@ -0,0 +1,76 @@
+# Generated by Django 2.2.28 on 2026-10-16 23:07
+
+from django.db import migrations, models
+
+#: Characters used to encode geohashes
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+#: Number of characters in geohashes stored by this migration
+PRECISION = 9
+
+
+def encode_geohash(lat, lng):
+    """Get the geohash of a location - a copy of `people.geohash.encode` when this was written."""
+    lat_bits = 5 * PRECISION // 2
+    lng_bits = 5 * PRECISION - lat_bits
+
+    def cell_index(value, minimum, maximum, n_bits):
+        n_cells = 2 ** n_bits
+        return min(max(int((value - minimum) / (maximum - minimum) * n_cells), 0), n_cells - 1)
+
+    lat_index = cell_index(lat, -90, 90, lat_bits)
+    lng_index = cell_index(lng, -180, 180, lng_bits)
+
+    # Interleave the bits of the cell indices - longitude first
+    value = 0
+    for i in range(lat_bits + lng_bits):
+        if i % 2 == 0:
+            bit = lng_index >> (lng_bits - 1 - i // 2)
+        else:
+            bit = lat_index >> (lat_bits - 1 - i // 2)
+
+        value = (value << 1) | (bit & 1)
+
+    return ''.join(BASE32[(value >> (5 * (PRECISION - 1 - i))) & 31] for i in range(PRECISION))
+
+
+def migrate_forward(apps, schema_editor):
+    """Calculate the geohash of every answer set with a location."""
+    for model_name in (
+        'OrganisationAnswerSet',
+        'PersonAnswerSet',
+    ):
+        model = apps.get_model('people', model_name)
+        answer_sets = model.objects.filter(latitude__isnull=False, longitude__isnull=False)
+
+        for pk, latitude, longitude in answer_sets.values_list('pk', 'latitude', 'longitude'):
+            model.objects.filter(pk=pk).update(geohash=encode_geohash(latitude, longitude))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0055_answerset_valid_to'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organisationanswerset',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=9),
+        ),
+        migrations.AddField(
+            model_name='personanswerset',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=9),
+        ),
+        migrations.RunPython(migrate_forward, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='organisationanswerset',
+            index=models.Index(fields=['valid_to', 'geohash'], name='oas_location_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='personanswerset',
+            index=models.Index(fields=['valid_to', 'geohash'], name='pas_location_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 2.2.28 on 2026-10-16 23:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Coalesce, NullIf
+
+
+def migrate_forward(apps, schema_editor):
+    """Point each owner at its latest answer set which has not been replaced."""
+    for owner_model_name, answer_set_model_name, owner_field in (
+        ('Organisation', 'OrganisationAnswerSet', 'organisation'),
+        ('OrganisationRelationship', 'OrganisationRelationshipAnswerSet', 'relationship'),
+        ('Person', 'PersonAnswerSet', 'person'),
+        ('Relationship', 'RelationshipAnswerSet', 'relationship'),
+    ):
+        owner_model = apps.get_model('people', owner_model_name)
+        answer_set_model = apps.get_model('people', answer_set_model_name)
+        current = answer_set_model.objects.filter(**{
+            owner_field: models.OuterRef('pk'),
+            'replaced_timestamp__isnull': True,
+        }).order_by('-timestamp')
+
+        fields = {'current_answer_set': models.Subquery(current.values('pk')[:1])}
+        if owner_model_name == 'Organisation':
+            fields['display_name'] = Coalesce(
+                NullIf(models.Subquery(current.values('name')[:1]), models.Value('')),
+                models.F('name'))
+
+        owner_model.objects.update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0056_answerset_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organisation',
+            name='current_answer_set',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='people.OrganisationAnswerSet'),
+        ),
+        migrations.AddField(
+            model_name='organisation',
+            name='display_name',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='organisationrelationship',
+            name='current_answer_set',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='people.OrganisationRelationshipAnswerSet'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='current_answer_set',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='people.PersonAnswerSet'),
+        ),
+        migrations.AddField(
+            model_name='relationship',
+            name='current_answer_set',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='people.RelationshipAnswerSet'),
+        ),
+        migrations.RunPython(migrate_forward, migrations.RunPython.noop),
+    ]
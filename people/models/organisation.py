@@ -1,11 +1,14 @@
 import logging
+import typing
 
 from django.db import models
+from django.db.models.functions import Coalesce, NullIf
 from django.urls import reverse
 
 from django_countries.fields import CountryField
 
-from .question import AnswerSet, Question, QuestionChoice
+from .question import (AnswerSetOwner, AnswerSetOwnerQuerySet, LocatedAnswerSet, Question,
+                       QuestionChoice)
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
@@ -37,36 +40,77 @@ class OrganisationQuestionChoice(QuestionChoice):
                                  null=False)
 
 
-class Organisation(models.Model):
+class OrganisationQuerySet(AnswerSetOwnerQuerySet):
+    """QuerySet of :class:`Organisation`s - which also maintains their display names."""
+    def get_current_answers_fields(self) -> typing.Dict[str, models.Expression]:
+        fields = super().get_current_answers_fields()
+
+        # Prefer name as in latest OrganisationAnswerSet
+        current_name = models.Subquery(self.current_answer_sets().values('name')[:1])
+        fields['display_name'] = Coalesce(NullIf(current_name, models.Value('')),
+                                          models.F('name'))
+
+        return fields
+
+
+class Organisation(AnswerSetOwner):
     """Organisation to which a :class:`Person` belongs."""
     class Meta:
         ordering = ['name']
 
     name = models.CharField(max_length=255, blank=False, null=False)
 
+    #: Latest answer set which has not been replaced - maintained when answer sets are saved
+    current_answer_set = models.ForeignKey('OrganisationAnswerSet',
+                                           related_name='+',
+                                           on_delete=models.SET_NULL,
+                                           blank=True,
+                                           null=True,
+                                           editable=False)
+
+    #: Name as in the current answer set if it has one, else `name` - maintained with
+    #: `current_answer_set`
+    display_name = models.CharField(max_length=255, blank=True, null=False, editable=False)
+
+    objects = OrganisationQuerySet.as_manager()
+
     def __str__(self) -> str:
-        # Prefer name as in latest OrganisationAnswerSet
-        try:
-            name = self.current_answers.name
+        return self.display_name or self.name
 
-        except AttributeError:
-            name = ''
+    def save(self, *args, **kwargs) -> None:
+        # Prefer name as in latest OrganisationAnswerSet
+        answers = self.current_answer_set
+        self.display_name = (answers and answers.name) or self.name
 
-        return name or self.name
+        update_fields = kwargs.get('update_fields', None)
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'display_name'}
 
-    @property
-    def current_answers(self) -> 'OrganisationAnswerSet':
-        return self.answer_sets.last()
+        super().save(*args, **kwargs)
 
     def get_absolute_url(self):
         return reverse('people:organisation.detail', kwargs={'pk': self.pk})
 
 
-class OrganisationAnswerSet(AnswerSet):
+class OrganisationAnswerSet(LocatedAnswerSet):
     """The answers to the organisation questions at a particular point in time."""
+    class Meta(LocatedAnswerSet.Meta):
+        indexes = [
+            # For selecting the valid answer sets of a single organisation
+            models.Index(fields=['organisation', 'valid_to', 'timestamp'],
+                         name='oas_owner_validity_idx'),
+            # For selecting all answer sets valid at a particular time
+            models.Index(fields=['valid_to', 'timestamp', 'organisation'],
+                         name='oas_validity_idx'),
+            # For selecting current answer sets within a bounding box
+            models.Index(fields=['valid_to', 'geohash'],
+                         name='oas_location_idx'),
+        ]
 
     question_model = OrganisationQuestion
 
+    owner_field = 'organisation'
+
     #: Organisation to which this answer set belongs
     organisation = models.ForeignKey(Organisation,
                                      on_delete=models.CASCADE,
@@ -119,6 +163,7 @@ class OrganisationAnswerSet(AnswerSet):
             'id',
             'timestamp',
             'replaced_timestamp',
+            'valid_to',
             'organisation_id',
             'question_answers',
         }
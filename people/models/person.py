@@ -12,7 +12,7 @@ from django_settings_export import settings_export
 from post_office import mail
 
 from .organisation import Organisation
-from .question import AnswerSet, Question, QuestionChoice
+from .question import AnswerSetOwner, LocatedAnswerSet, Question, QuestionChoice
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
@@ -79,7 +79,7 @@ class PersonQuestionChoice(QuestionChoice):
                                  null=False)
 
 
-class Person(models.Model):
+class Person(AnswerSetOwner):
     """
     A person may be a member of the BRECcIA core team or an external stakeholder.
     """
@@ -114,15 +114,19 @@ class Person(models.Model):
         through='OrganisationRelationship',
         through_fields=('source', 'target'))
 
+    #: Latest answer set which has not been replaced - maintained when answer sets are saved
+    current_answer_set = models.ForeignKey('PersonAnswerSet',
+                                           related_name='+',
+                                           on_delete=models.SET_NULL,
+                                           blank=True,
+                                           null=True,
+                                           editable=False)
+
     @property
     def relationships(self):
         return self.relationships_as_source.all().union(
             self.relationships_as_target.all())
 
-    @property
-    def current_answers(self) -> 'PersonAnswerSet':
-        return self.answer_sets.last()
-
     @property
     def organisation(self) -> Organisation:
         return self.current_answers.organisation
@@ -138,10 +142,25 @@ class Person(models.Model):
         return self.name
 
 
-class PersonAnswerSet(AnswerSet):
+class PersonAnswerSet(LocatedAnswerSet):
     """The answers to the person questions at a particular point in time."""
+    class Meta(LocatedAnswerSet.Meta):
+        indexes = [
+            # For selecting the valid answer sets of a single person
+            models.Index(fields=['person', 'valid_to', 'timestamp'],
+                         name='pas_owner_validity_idx'),
+            # For selecting all answer sets valid at a particular time
+            models.Index(fields=['valid_to', 'timestamp', 'person'],
+                         name='pas_validity_idx'),
+            # For selecting current answer sets within a bounding box
+            models.Index(fields=['valid_to', 'geohash'],
+                         name='pas_location_idx'),
+        ]
+
     question_model = PersonQuestion
 
+    owner_field = 'person'
+
     #: Person to which this answer set belongs
     person = models.ForeignKey(Person,
                                on_delete=models.CASCADE,
@@ -210,6 +229,7 @@ class PersonAnswerSet(AnswerSet):
             'id',
             'timestamp',
             'replaced_timestamp',
+            'valid_to',
             'person_id',
             'question_answers',
         }
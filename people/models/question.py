@@ -1,15 +1,26 @@
 """Base models for configurable questions and response sets."""
 import abc
+import datetime
 import typing
 
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.text import slugify
 
+from people import geohash
+
 __all__ = [
     'Question',
     'QuestionChoice',
 ]
 
+#: Value of `AnswerSet.valid_to` for answer sets which have not been replaced
+#: Using a sentinel rather than NULL allows as-of queries to use a single range condition
+VALID_TO_CURRENT = datetime.datetime(9999, 12, 31, tzinfo=datetime.timezone.utc)
+
+#: Attribute of an owner to which answer sets valid at a particular date are loaded
+VALID_ANSWER_SETS_ATTR = '_valid_answer_sets'
+
 
 class Question(models.Model):
     """Questions from which a survey form can be created."""
@@ -125,6 +136,128 @@ class QuestionChoice(models.Model):
         return self.text
 
 
+def end_of_day(at_date: typing.Optional[datetime.date] = None) -> datetime.datetime:
+    """Get the time at the end of a date, for comparison with answer set timestamps.
+
+    :param at_date: Date - defaults to today.  A datetime is returned unchanged.
+    """
+    if isinstance(at_date, datetime.datetime):
+        return at_date
+
+    # Filter on timestamp__date doesn't seem to work on MySQL
+    # To compare datetimes we need at_date to be midnight at
+    # the *end* of the day in question - so add one day
+    if not at_date:
+        at_date = timezone.now().date()
+    at_date += timezone.timedelta(days=1)
+
+    return timezone.make_aware(datetime.datetime.combine(at_date, datetime.time.min))
+
+
+class AnswerSetQuerySet(models.QuerySet):
+    """QuerySet of :class:`AnswerSet`s allowing selection by time of validity."""
+    @staticmethod
+    def valid_at(at_date: typing.Optional[datetime.date] = None) -> models.Q:
+        """Build a filter selecting answer sets which were valid at a particular time.
+
+        :param at_date: Date at the end of which answer sets should be valid - defaults to today.
+            May also be a datetime, which is used as is.
+        """
+        at_time = end_of_day(at_date)
+        return models.Q(timestamp__lte=at_time, valid_to__gte=at_time)
+
+    def as_of(self, at_date: typing.Optional[datetime.date] = None) -> 'AnswerSetQuerySet':
+        """Filter to answer sets which were valid at a particular time.
+
+        :param at_date: Date at the end of which answer sets should be valid - defaults to today.
+            May also be a datetime, which is used as is.
+        """
+        return self.filter(self.valid_at(at_date))
+
+    def as_of_any(self, *at_dates: datetime.date) -> 'AnswerSetQuerySet':
+        """Filter to answer sets which were valid at any of several times."""
+        condition = models.Q()
+        for at_date in at_dates:
+            condition |= self.valid_at(at_date)
+
+        return self.filter(condition)
+
+
+class AnswerSetOwnerQuerySet(models.QuerySet):
+    """QuerySet of models to which :class:`AnswerSet`s belong.
+
+    These models have a `current_answer_set` foreign key to their latest answer set which has not
+    been replaced - maintained as answer sets are saved, so that it may be read without a query.
+    """
+    def current_answer_sets(self) -> AnswerSetQuerySet:
+        """Build a subquery selecting the current answer set of each owner, latest first."""
+        answer_set_model = self.model._meta.get_field('current_answer_set').related_model
+
+        return answer_set_model.objects.filter(**{
+            answer_set_model.owner_field: models.OuterRef('pk'),
+            'valid_to': VALID_TO_CURRENT,
+        }).order_by('-timestamp')
+
+    def get_current_answers_fields(self) -> typing.Dict[str, models.Expression]:
+        """Get expressions for the fields of each owner maintained from its current answer set."""
+        return {
+            'current_answer_set': models.Subquery(self.current_answer_sets().values('pk')[:1]),
+        }
+
+    def update_current_answers(self) -> int:
+        """Update the fields maintained from the current answer set of each owner in one query.
+
+        :return: Number of owners updated
+        """
+        return self.update(**self.get_current_answers_fields())
+
+    def with_current_answers(
+            self,
+            as_of: typing.Optional[datetime.date] = None) -> 'AnswerSetOwnerQuerySet':
+        """Load the answer set of each owner, with its answers, as `current_answers`.
+
+        Avoids a query for the answers of each owner when listing many of them.
+
+        :param as_of: Date at the end of which answer sets should be valid - defaults to the current
+            answer sets, which are loaded with the owners.
+        """
+        if as_of is None:
+            return self.select_related('current_answer_set').prefetch_related(
+                'current_answer_set__question_answers')
+
+        answer_set_model = self.model._meta.get_field('current_answer_set').related_model
+
+        return self.prefetch_related(
+            models.Prefetch('answer_sets',
+                            queryset=answer_set_model.objects.as_of(as_of).prefetch_related(
+                                'question_answers'),
+                            to_attr=VALID_ANSWER_SETS_ATTR))
+
+
+class AnswerSetOwner(models.Model):
+    """A model to which :class:`AnswerSet`s belong.
+
+    Concrete subclasses must have a `current_answer_set` foreign key - see
+    :class:`AnswerSetOwnerQuerySet`.
+    """
+    class Meta:
+        abstract = True
+
+    objects = AnswerSetOwnerQuerySet.as_manager()
+
+    @property
+    def current_answers(self) -> typing.Optional['AnswerSet']:
+        """Current answer set - or the one valid at the date given to `with_current_answers`."""
+        try:
+            valid_answer_sets = getattr(self, VALID_ANSWER_SETS_ATTR)
+
+        except AttributeError:
+            return self.current_answer_set
+
+        # Should only be one valid answer set - but if not take the latest
+        return valid_answer_sets[-1] if valid_answer_sets else None
+
+
 class AnswerSet(models.Model):
     """The answers to a set of questions at a particular point in time."""
     class Meta:
@@ -134,12 +267,18 @@ class AnswerSet(models.Model):
         ]
         get_latest_by = 'timestamp'
 
+    objects = AnswerSetQuerySet.as_manager()
+
     @classmethod
     @abc.abstractproperty
     def question_model(cls) -> models.Model:
         """Model representing questions to be answered in this AnswerSet."""
         raise NotImplementedError
 
+    #: Name of the field referring to the owner of this answer set - e.g. `person`
+    #: Must be set on each concrete subclass
+    owner_field = None
+
     #: Entity to which this answer set belongs
     #: This foreign key must be added to each concrete subclass
     # person = models.ForeignKey(Person,
@@ -165,10 +304,46 @@ class AnswerSet(models.Model):
                                               null=True,
                                               editable=False)
 
+    #: Until when were these answers valid? - `replaced_timestamp` or `VALID_TO_CURRENT` if not
+    #: replaced.  Maintained on save to allow indexed as-of queries
+    valid_to = models.DateTimeField(default=VALID_TO_CURRENT,
+                                    blank=False,
+                                    null=False,
+                                    editable=False)
+
     @property
     def is_current(self) -> bool:
         return self.replaced_timestamp is None
 
+    def save(self, *args, **kwargs) -> None:
+        self.valid_to = self.replaced_timestamp or VALID_TO_CURRENT
+
+        update_fields = kwargs.get('update_fields', None)
+        if update_fields is not None and 'replaced_timestamp' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'valid_to'}
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.update_owner()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.update_owner()
+
+        return result
+
+    def update_owner(self) -> None:
+        """Update the fields of the owner of this answer set which follow its current answers."""
+        owner_field = self._meta.get_field(self.owner_field)
+        owners = owner_field.related_model.objects.filter(pk=getattr(self, owner_field.attname))
+        owners.update_current_answers()
+
+        # Don't leave an owner which has already been loaded out of date
+        if owner_field.is_cached(self):
+            getattr(self, self.owner_field).refresh_from_db(
+                fields=list(owners.get_current_answers_fields()))
+
     def build_question_answers(self,
                                show_all: bool = False,
                                use_slugs: bool = False) -> typing.Dict[str, str]:
@@ -223,3 +398,27 @@ class AnswerSet(models.Model):
                 answers[field_name] = answer.pk
 
         return answers
+
+
+class LocatedAnswerSet(AnswerSet):
+    """An :class:`AnswerSet` including a location, indexed for spatial queries.
+
+    Concrete subclasses must have `latitude` and `longitude` fields.
+    """
+    class Meta(AnswerSet.Meta):
+        abstract = True
+
+    #: Geohash of the location - maintained on save to allow indexed bounding box queries
+    geohash = models.CharField(max_length=geohash.PRECISION,
+                               blank=True,
+                               null=False,
+                               editable=False)
+
+    def save(self, *args, **kwargs) -> None:
+        self.geohash = geohash.encode(self.latitude, self.longitude)
+
+        update_fields = kwargs.get('update_fields', None)
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+
+        super().save(*args, **kwargs)
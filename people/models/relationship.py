@@ -1,12 +1,10 @@
 """Models describing relationships between people."""
 
-import typing
-
 from django.db import models
 from django.urls import reverse
 
 from .person import Organisation, Person
-from .question import AnswerSet, Question, QuestionChoice
+from .question import AnswerSet, AnswerSetOwner, Question, QuestionChoice
 
 __all__ = [
     'RelationshipQuestion',
@@ -35,7 +33,7 @@ class RelationshipQuestionChoice(QuestionChoice):
                                  null=False)
 
 
-class Relationship(models.Model):
+class Relationship(AnswerSetOwner):
     """A directional relationship between two people allowing linked questions."""
     class Meta:
         constraints = [
@@ -57,18 +55,14 @@ class Relationship(models.Model):
                                blank=False,
                                null=False)
 
-    @property
-    def current_answers(self) -> typing.Optional['RelationshipAnswerSet']:
-        try:
-            answer_set = self.answer_sets.latest()
-            if answer_set.is_current:
-                return answer_set
-
-        except RelationshipAnswerSet.DoesNotExist:
-            # No AnswerSet created yet
-            pass
-
-        return None
+    #: Latest answer set which has not been replaced - maintained when answer sets are saved and
+    #: when the relationship is ended
+    current_answer_set = models.ForeignKey('RelationshipAnswerSet',
+                                           related_name='+',
+                                           on_delete=models.SET_NULL,
+                                           blank=True,
+                                           null=True,
+                                           editable=False)
 
     @property
     def is_current(self) -> bool:
@@ -92,9 +86,20 @@ class Relationship(models.Model):
 
 class RelationshipAnswerSet(AnswerSet):
     """The answers to the relationship questions at a particular point in time."""
+    class Meta(AnswerSet.Meta):
+        indexes = [
+            # For selecting the valid answer sets of a single relationship
+            models.Index(fields=['relationship', 'valid_to', 'timestamp'],
+                         name='ras_owner_validity_idx'),
+            # For selecting all answer sets valid at a particular time
+            models.Index(fields=['valid_to', 'timestamp', 'relationship'],
+                         name='ras_validity_idx'),
+        ]
 
     question_model = RelationshipQuestion
 
+    owner_field = 'relationship'
+
     #: Relationship to which this answer set belongs
     relationship = models.ForeignKey(Relationship,
                                      on_delete=models.CASCADE,
@@ -124,7 +129,7 @@ class OrganisationRelationshipQuestionChoice(QuestionChoice):
                                  null=False)
 
 
-class OrganisationRelationship(models.Model):
+class OrganisationRelationship(AnswerSetOwner):
     """A directional relationship between a person and an organisation with linked questions."""
     class Meta:
         constraints = [
@@ -148,18 +153,14 @@ class OrganisationRelationship(models.Model):
         blank=False,
         null=False)
 
-    @property
-    def current_answers(self) -> typing.Optional['OrganisationRelationshipAnswerSet']:
-        try:
-            answer_set = self.answer_sets.latest()
-            if answer_set.is_current:
-                return answer_set
-
-        except OrganisationRelationshipAnswerSet.DoesNotExist:
-            # No AnswerSet created yet
-            pass
-
-        return None
+    #: Latest answer set which has not been replaced - maintained when answer sets are saved and
+    #: when the relationship is ended
+    current_answer_set = models.ForeignKey('OrganisationRelationshipAnswerSet',
+                                           related_name='+',
+                                           on_delete=models.SET_NULL,
+                                           blank=True,
+                                           null=True,
+                                           editable=False)
 
     @property
     def is_current(self) -> bool:
@@ -175,9 +176,20 @@ class OrganisationRelationship(models.Model):
 
 class OrganisationRelationshipAnswerSet(AnswerSet):
     """The answers to the organisation relationship questions at a particular point in time."""
+    class Meta(AnswerSet.Meta):
+        indexes = [
+            # For selecting the valid answer sets of a single relationship
+            models.Index(fields=['relationship', 'valid_to', 'timestamp'],
+                         name='oras_owner_validity_idx'),
+            # For selecting all answer sets valid at a particular time
+            models.Index(fields=['valid_to', 'timestamp', 'relationship'],
+                         name='oras_validity_idx'),
+        ]
 
     question_model = OrganisationRelationshipQuestion
 
+    owner_field = 'relationship'
+
     #: OrganisationRelationship to which this answer set belongs
     relationship = models.ForeignKey(OrganisationRelationship,
                                      on_delete=models.CASCADE,
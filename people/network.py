@@ -0,0 +1,541 @@
+"""
+Build and cache snapshots of the network of :class:`Person`s and :class:`Relationship`s.
+
+Snapshots are cached against the normalised network filters and a data version which is
+replaced whenever a model contributing to the network is written.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import time
+import typing
+
+from django.core.cache import cache
+from django.db.models import Model, QuerySet
+from django.forms import Form
+from django.utils import timezone
+
+from people import layout, models
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+#: Cache key under which the current network data version is stored
+VERSION_CACHE_KEY = 'people.network.version'
+
+#: Prefix for cache keys of network snapshots - change this if the format of snapshots changes
+SNAPSHOT_CACHE_PREFIX = 'people.network.snapshot.v2'
+
+#: How long should a network snapshot be kept in the cache?  Seconds
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+#: Models from which the network is built - writes to these invalidate snapshots
+SOURCE_MODELS = [
+    models.Person,
+    models.PersonAnswerSet,
+    models.Organisation,
+    models.OrganisationAnswerSet,
+    models.Relationship,
+    models.RelationshipAnswerSet,
+    models.OrganisationRelationship,
+    models.OrganisationRelationshipAnswerSet,
+]
+
+
+def filter_answer_sets(answerset_queryset: QuerySet, form: Form) -> QuerySet:
+    """Filter answer sets to those containing the answers selected in a filter form."""
+    for field, values in form.cleaned_data.items():
+        if field.startswith(f'{form.question_prefix}question_') and values:
+            answerset_queryset = answerset_queryset.filter(question_answers__in=values)
+
+    return answerset_queryset
+
+
+def filter_by_form_answers(queryset: QuerySet, answerset_queryset: QuerySet, relationship_key: str):
+    """Build a filter to select based on form responses."""
+    def inner(form, at_date=None):
+        # Filter to answersets valid at required time
+        answerset_set = answerset_queryset.prefetch_related('question_answers').as_of(at_date)
+
+        # Filter to answersets containing required answers
+        answerset_set = filter_answer_sets(answerset_set, form)
+
+        return queryset.filter(pk__in=answerset_set.values_list(relationship_key, flat=True))
+
+    return inner
+
+
+filter_relationships = filter_by_form_answers(
+    models.Relationship.objects, models.RelationshipAnswerSet.objects, 'relationship'
+)
+
+filter_organisations = filter_by_form_answers(
+    models.Organisation.objects, models.OrganisationAnswerSet.objects, 'organisation'
+)
+
+filter_people = filter_by_form_answers(
+    models.Person.objects, models.PersonAnswerSet.objects, 'person'
+)
+
+
+def get_data_version() -> float:
+    """Get the version of the data from which network snapshots are built.
+
+    If the version has been lost from the cache a new one is created - this invalidates
+    all existing snapshots rather than risking serving stale data.
+    """
+    return cache.get_or_set(VERSION_CACHE_KEY, time.time, timeout=None)
+
+
+def invalidate_snapshots(*args, **kwargs) -> None:
+    """Invalidate all cached network snapshots.
+
+    May be used directly as a signal receiver.
+    """
+    cache.set(VERSION_CACHE_KEY, time.time(), timeout=None)
+
+
+def normalise_value(value: typing.Any) -> typing.Any:
+    """Convert a cleaned form value into a JSON serializable value independent of ordering."""
+    if isinstance(value, QuerySet):
+        return sorted(obj.pk for obj in value)
+
+    if isinstance(value, Model):
+        return value.pk
+
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+
+    return value
+
+
+def get_at_date(all_forms: typing.Mapping[str, Form]) -> datetime.date:
+    """Get the date at which the network should be shown - defaults to today."""
+    return all_forms['date'].cleaned_data['date'] or timezone.now().date()
+
+
+def snapshot_key(all_forms: typing.Mapping[str, Form]) -> str:
+    """Get the cache key for the network snapshot matching a set of valid filter forms."""
+    filters = {
+        f'{name}.{field}': normalise_value(value)
+        for name, form in all_forms.items()
+        for field, value in form.cleaned_data.items()
+        if value
+    }
+
+    # An empty date means today - which changes
+    filters['date.date'] = get_at_date(all_forms).isoformat()
+
+    key_data = json.dumps([get_data_version(), filters], sort_keys=True)
+    return f'{SNAPSHOT_CACHE_PREFIX}.{hashlib.sha1(key_data.encode()).hexdigest()}'
+
+
+#: Serialized network of people and organisations in a compact columnar format
+#:
+#: Node tables contain parallel lists of 'id' (primary key), 'name', 'x', 'y' and 'degree'.
+#: Edge tables contain parallel lists of 'id' (primary key), 'source' and 'target' where the source
+#: and target are row indices into the relevant node tables.
+Snapshot = typing.Dict[str, typing.Dict[str, typing.List]]
+
+
+def node_table(queryset: QuerySet) -> typing.Dict[str, typing.List]:
+    """Build a table of nodes from a :class:`Person` or :class:`Organisation` queryset."""
+    rows = list(queryset.values_list('pk', 'name'))
+
+    return {
+        'id': [pk for pk, name in rows],
+        'name': [name for pk, name in rows],
+    }
+
+
+def edge_table(rows: typing.Iterable[typing.Tuple[int, int, int]],
+               source_table: typing.Mapping[str, typing.List],
+               target_table: typing.Mapping[str, typing.List]) -> typing.Dict[str, typing.List]:
+    """Build a table of edges referring to rows of node tables by index.
+
+    Edges to nodes which are not in the node tables are dropped.
+
+    :param rows: Tuples of edge primary key, source primary key and target primary key
+    :param source_table: Node table containing the source of each edge
+    :param target_table: Node table containing the target of each edge
+    """
+    source_index = {pk: i for i, pk in enumerate(source_table['id'])}
+    target_index = {pk: i for i, pk in enumerate(target_table['id'])}
+
+    table = {'id': [], 'source': [], 'target': []}
+    for pk, source, target in rows:
+        if source in source_index and target in target_index:
+            table['id'].append(pk)
+            table['source'].append(source_index[source])
+            table['target'].append(target_index[target])
+
+    return table
+
+
+def build_snapshot(all_forms: typing.Mapping[str, Form]) -> Snapshot:
+    """Build the serialized network matching a set of valid filter forms."""
+    snapshot = build_tables(all_forms)
+    add_layout(snapshot)
+
+    return snapshot
+
+
+def build_tables(all_forms: typing.Mapping[str, Form]) -> Snapshot:
+    """Build the node and edge tables of the network matching a set of valid filter forms.
+
+    Nodes do not yet have positions - see :func:`add_layout`.
+    """
+    date = get_at_date(all_forms)
+
+    people = filter_people(all_forms['person'], at_date=date)
+
+    snapshot = {
+        'people': node_table(people),
+        'organisations': node_table(filter_organisations(all_forms['organisation'], at_date=date)),
+    }
+
+    snapshot['relationships'] = edge_table(
+        filter_relationships(all_forms['relationship'], at_date=date).values_list(
+            'pk', 'source', 'target'
+        ), snapshot['people'], snapshot['people']
+    )
+
+    snapshot['organisation_relationships'] = edge_table(
+        models.OrganisationRelationship.objects.values_list('pk', 'source', 'target'),
+        snapshot['people'], snapshot['organisations']
+    )
+
+    snapshot['memberships'] = edge_table(
+        build_memberships(people, date), snapshot['people'], snapshot['organisations']
+    )
+
+    return snapshot
+
+
+def add_layout(snapshot: Snapshot,
+               degree: typing.Optional[typing.Mapping[str, int]] = None,
+               persist: bool = True) -> None:
+    """Lay out a snapshot, adding 'x', 'y' and 'degree' columns to its node tables.
+
+    :param snapshot: Snapshot containing node and edge tables
+    :param degree: Degree of each node by id - defaults to the degree within the snapshot
+    :param persist: Should the positions be used as the starting point of later layouts?
+    """
+    nodes, edges = get_elements(snapshot)
+    positions = layout.compute_layout(nodes, edges, persist=persist)
+    if degree is None:
+        degree = count_degree(nodes, edges)
+
+    for prefix, table in [('person', snapshot['people']),
+                          ('organisation', snapshot['organisations'])]:
+        node_ids = [f'{prefix}-{pk}' for pk in table['id']]
+        table['x'] = [positions[node][0] for node in node_ids]
+        table['y'] = [positions[node][1] for node in node_ids]
+        table['degree'] = [degree.get(node, 0) for node in node_ids]
+
+
+Elements = typing.Tuple[typing.List[str], typing.List[typing.Tuple[str, str]]]
+
+
+def get_elements(snapshot: Snapshot) -> Elements:
+    """Get the ids of the nodes and the pairs of node ids joined by edges in a network snapshot.
+
+    Ids match those used for elements in the Cytoscape network.
+    """
+    people = [f'person-{pk}' for pk in snapshot['people']['id']]
+    organisations = [f'organisation-{pk}' for pk in snapshot['organisations']['id']]
+
+    edges = [
+        (people[source], people[target]) for source, target in
+        zip(snapshot['relationships']['source'], snapshot['relationships']['target'])
+    ]
+    for name in ['organisation_relationships', 'memberships']:
+        edges.extend(
+            (people[source], organisations[target])
+            for source, target in zip(snapshot[name]['source'], snapshot[name]['target'])
+        )
+
+    return people + organisations, edges
+
+
+def select_nodes(snapshot: Snapshot, nodes: typing.Collection[str]) -> Snapshot:
+    """Select part of a network, keeping only the given nodes and the edges between them.
+
+    Only node ids and names are kept - the result may be laid out with :func:`add_layout`.
+
+    :param snapshot: Snapshot containing node and edge tables
+    :param nodes: Ids of nodes to keep, as used in Cytoscape
+    """
+    selected = {}
+    index = {}
+
+    for name, prefix in [('people', 'person'), ('organisations', 'organisation')]:
+        table = snapshot[name]
+        rows = [i for i, pk in enumerate(table['id']) if f'{prefix}-{pk}' in nodes]
+
+        selected[name] = {column: [table[column][i] for i in rows] for column in ['id', 'name']}
+        index[name] = {row: i for i, row in enumerate(rows)}
+
+    for name, source_table, target_table in [
+        ('relationships', 'people', 'people'),
+        ('organisation_relationships', 'people', 'organisations'),
+        ('memberships', 'people', 'organisations'),
+    ]:
+        table = snapshot[name]
+        source_index, target_index = index[source_table], index[target_table]
+        selected[name] = {'id': [], 'source': [], 'target': []}
+
+        for pk, source, target in zip(table['id'], table['source'], table['target']):
+            if source in source_index and target in target_index:
+                selected[name]['id'].append(pk)
+                selected[name]['source'].append(source_index[source])
+                selected[name]['target'].append(target_index[target])
+
+    return selected
+
+
+def count_degree(nodes: typing.Sequence[str],
+                 edges: typing.Iterable[typing.Tuple[str, str]]) -> typing.Dict[str, int]:
+    """Count the edges connected to each node, ignoring edges to nodes which are not present."""
+    degree = dict.fromkeys(nodes, 0)
+
+    for source, target in edges:
+        if source in degree and target in degree:
+            degree[source] += 1
+            degree[target] += 1
+
+    return degree
+
+
+def build_memberships(people: QuerySet,
+                      at_date: datetime.date) -> typing.List[typing.Tuple[int, int, int]]:
+    """Build organisation membership edges for a set of people using a single query.
+
+    Membership edges are identified by the primary key of the person.
+
+    :param people: People for whom membership edges should be built
+    :param at_date: Date at which organisation membership should be determined
+    :return: Tuples of edge primary key, person primary key and organisation primary key
+    """
+    answer_sets = models.PersonAnswerSet.objects.as_of(at_date).filter(
+        person__in=people, organisation__isnull=False
+    ).order_by('person_id', 'timestamp').values_list('person_id', 'organisation_id')
+
+    # Should only be one valid answer set per person - but if not take the latest
+    memberships = dict(answer_sets)
+
+    return [(person_id, person_id, organisation_id)
+            for person_id, organisation_id in memberships.items()]
+
+
+def get_snapshot(all_forms: typing.Mapping[str, Form],
+                 key: typing.Optional[str] = None) -> Snapshot:
+    """Get the serialized network matching a set of valid filter forms - from the cache if possible.
+
+    :param all_forms: Valid network filter forms
+    :param key: Cache key for this snapshot if already known
+    """
+    if key is None:
+        key = snapshot_key(all_forms)
+
+    snapshot = cache.get(key)
+    if snapshot is None:
+        logger.debug('Network snapshot cache miss: %s', key)
+        snapshot = build_snapshot(all_forms)
+        cache.set(key, snapshot, timeout=SNAPSHOT_TIMEOUT)
+
+    return snapshot
+
+
+RowsByOwner = typing.Dict[int, typing.Dict[str, typing.Any]]
+
+
+def valid_rows(answer_sets: QuerySet,
+               owner_field: str,
+               from_date: datetime.date,
+               to_date: datetime.date,
+               fields: typing.Sequence[str] = ()) -> typing.Tuple[RowsByOwner, RowsByOwner]:
+    """Find the answer set of each owner valid at each of two dates using a single query.
+
+    :param answer_sets: Answer sets to consider
+    :param owner_field: Name of the field referring to the owner of each answer set
+    :param from_date: Earlier date
+    :param to_date: Later date
+    :param fields: Additional fields to get from each answer set
+    :return: Dictionaries of owner pk to answer set values, for answer sets valid at each date
+    """
+    from_time = models.question.end_of_day(from_date)
+    to_time = models.question.end_of_day(to_date)
+
+    rows = answer_sets.as_of_any(from_date, to_date).order_by('timestamp').values(
+        'pk', owner_field, 'timestamp', 'valid_to', *fields
+    ).distinct()
+
+    valid_from, valid_to = {}, {}
+    for row in rows:
+        if row['timestamp'] <= from_time <= row['valid_to']:
+            valid_from[row[owner_field]] = row
+
+        if row['timestamp'] <= to_time <= row['valid_to']:
+            valid_to[row[owner_field]] = row
+
+    return valid_from, valid_to
+
+
+def compare_rows(valid_from: RowsByOwner,
+                 valid_to: RowsByOwner,
+                 describe: typing.Callable[[int, typing.Dict], typing.Dict[str, typing.Any]],
+                 changed: typing.Callable[[typing.Dict, typing.Dict], bool],
+                 diff: typing.Dict[str, typing.List]) -> None:
+    """Add elements which differ between two dates to a network diff.
+
+    :param valid_from: Owner pk to answer set values at the earlier date
+    :param valid_to: Owner pk to answer set values at the later date
+    :param describe: Function returning the description of an element from an owner pk and its
+        values
+    :param changed: Function deciding whether values at the two dates represent a change
+    :param diff: Network diff with 'added', 'removed' and 'changed' lists to which elements are
+        added
+    """
+    for pk, row in valid_to.items():
+        if pk not in valid_from:
+            diff['added'].append(describe(pk, row))
+
+        elif changed(valid_from[pk], row):
+            diff['changed'].append(describe(pk, row))
+
+    for pk, row in valid_from.items():
+        if pk not in valid_to:
+            diff['removed'].append(describe(pk, row))
+
+
+def build_diff(all_forms: typing.Mapping[str, Form],
+               from_date: datetime.date) -> typing.Dict[str, typing.Any]:
+    """Find the nodes and edges which differ between the network at an earlier date and the network
+    matching a set of valid filter forms.
+
+    Answer set validity intervals are read once per type of answer set.
+    Elements are 'changed' if they are present at both dates, but with different answers.
+    Edges are only present if the nodes at both ends are present, as in the displayed network.
+
+    :return: Lists of elements 'added', 'removed' and 'changed' - removed elements are described
+        fully so that they can be displayed.
+    """
+    to_date = get_at_date(all_forms)
+    diff = {
+        'from': from_date.isoformat(),
+        'to': to_date.isoformat(),
+        'added': [],
+        'removed': [],
+        'changed': [],
+    }
+
+    def answers_changed(before, after):
+        return before['pk'] != after['pk']
+
+    people_from, people_to = valid_rows(
+        filter_answer_sets(models.PersonAnswerSet.objects, all_forms['person']), 'person',
+        from_date, to_date, fields=['person__name', 'organisation']
+    )
+    compare_rows(people_from, people_to, lambda pk, row: {
+        'group': 'nodes',
+        'id': f'person-{pk}',
+        'name': row['person__name'],
+        'kind': 'person',
+    }, answers_changed, diff)
+
+    organisations_from, organisations_to = valid_rows(
+        filter_answer_sets(models.OrganisationAnswerSet.objects, all_forms['organisation']),
+        'organisation', from_date, to_date, fields=['organisation__name']
+    )
+    compare_rows(organisations_from, organisations_to, lambda pk, row: {
+        'group': 'nodes',
+        'id': f'organisation-{pk}',
+        'name': row['organisation__name'],
+        'kind': 'organisation',
+    }, answers_changed, diff)
+
+    # Edges are only shown if the nodes at both ends are shown
+    def shown(rows, sources, targets, source_field='relationship__source',
+              target_field='relationship__target'):
+        return {
+            pk: row for pk, row in rows.items()
+            if row[source_field] in sources and row[target_field] in targets
+        }
+
+    relationships_from, relationships_to = valid_rows(
+        filter_answer_sets(models.RelationshipAnswerSet.objects, all_forms['relationship']),
+        'relationship', from_date, to_date,
+        fields=['relationship__source', 'relationship__target']
+    )
+    compare_rows(shown(relationships_from, people_from, people_from),
+                 shown(relationships_to, people_to, people_to), lambda pk, row: {
+        'group': 'edges',
+        'id': f'relationship-{pk}',
+        'source': f'person-{row["relationship__source"]}',
+        'target': f'person-{row["relationship__target"]}',
+        'kind': 'person',
+    }, answers_changed, diff)
+
+    # Organisation relationships are shown regardless of their answers at a date
+    organisation_relationships = {
+        pk: {'relationship__source': source, 'relationship__target': target}
+        for pk, source, target in models.OrganisationRelationship.objects.values_list(
+            'pk', 'source', 'target'
+        )
+    }
+    answers_from, answers_to = valid_rows(
+        models.OrganisationRelationshipAnswerSet.objects, 'relationship', from_date, to_date
+    )
+
+    def with_answers(answers):
+        return {
+            pk: dict(row, pk=answers.get(pk, {}).get('pk'))
+            for pk, row in organisation_relationships.items()
+        }
+
+    compare_rows(shown(with_answers(answers_from), people_from, organisations_from),
+                 shown(with_answers(answers_to), people_to, organisations_to), lambda pk, row: {
+        'group': 'edges',
+        'id': f'organisation-relationship-{pk}',
+        'source': f'person-{row["relationship__source"]}',
+        'target': f'organisation-{row["relationship__target"]}',
+        'kind': 'organisation',
+    }, answers_changed, diff)
+
+    # Organisation membership comes from the person answer sets we already have
+    def membership(rows, organisations):
+        return shown({pk: row for pk, row in rows.items() if row['organisation'] is not None},
+                     rows, organisations, source_field='person', target_field='organisation')
+
+    compare_rows(membership(people_from, organisations_from),
+                 membership(people_to, organisations_to), lambda pk, row: {
+        'group': 'edges',
+        'id': f'organisation-relationship-membership-{pk}',
+        'source': f'person-{pk}',
+        'target': f'organisation-{row["organisation"]}',
+        'kind': 'organisation',
+    }, lambda before, after: before['organisation'] != after['organisation'], diff)
+
+    # Removed nodes are not in the current layout - put them where they were last seen, if they
+    # were in the most recently laid out network
+    positions = cache.get(layout.POSITIONS_CACHE_KEY, {})
+    for element in diff['removed']:
+        if element['id'] in positions:
+            element['position'] = positions[element['id']]
+
+    return diff
+
+
+def get_diff(all_forms: typing.Mapping[str, Form],
+             from_date: datetime.date) -> typing.Dict[str, typing.Any]:
+    """Get the network diff from an earlier date - from the cache if possible."""
+    key = f'{snapshot_key(all_forms)}.diff.{from_date.isoformat()}'
+
+    diff = cache.get(key)
+    if diff is None:
+        diff = build_diff(all_forms, from_date)
+        cache.set(key, diff, timeout=SNAPSHOT_TIMEOUT)
+
+    return diff
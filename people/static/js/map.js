@@ -14,6 +14,16 @@ let selected_marker = null;
 let selected_marker_info = null;
 let markers = [];
 
+// Marker types which have been hidden by the user
+let hidden_types = new Set();
+// Zoom level for which clusters are currently shown
+let loaded_zoom = null;
+
+// Zoom level from which markers within the visible area are loaded instead of clusters
+const features_min_zoom = 10;
+// Locations for which markers have been loaded while zoomed in
+let loaded_locations = new Set();
+
 function createMarker(map, marker_data) {
     // Get the lat-long position from the data
     let lat_lng;
@@ -69,6 +79,15 @@ function initMap() {
     map = new google.maps.Map(
         document.getElementById('map'));
 
+    // Maps of many markers load them in clusters from the server
+    if (!document.getElementById('map-markers')) {
+        map.setCenter({lat: 0, lng: 0});
+        map.setZoom(2);
+        map.addListener('idle', loadMarkers);
+
+        return map
+    }
+
     const bounds = new google.maps.LatLngBounds()
     const markers_data = JSON.parse(
         document.getElementById('map-markers').textContent)
@@ -105,6 +124,206 @@ function initMap() {
     return map
 }
 
+/**
+ * Load clusters for the whole map, or markers within the visible area if zoomed in.
+ */
+function loadMarkers() {
+    if (map.getZoom() >= features_min_zoom) {
+        loadFeatures();
+    } else {
+        loadClusters();
+    }
+}
+
+function clearMarkers() {
+    for (const marker of markers) {
+        marker.setMap(null);
+    }
+    markers = [];
+    loaded_locations.clear();
+}
+
+/**
+ * Add markers within the visible area which have not already been loaded.
+ */
+function loadFeatures() {
+    const url = document.getElementById('map').dataset.featuresUrl + '?bbox=' + map.getBounds().toUrlValue();
+
+    fetch(url, {credentials: 'same-origin'})
+        .then(response => response.json())
+        .then(data => {
+            // Ignore if the map has been zoomed out while loading
+            if (map.getZoom() < features_min_zoom) {
+                return;
+            }
+
+            // Replace clusters shown before zooming in
+            if (loaded_zoom !== null) {
+                clearMarkers();
+                loaded_zoom = null;
+            }
+
+            // Markers at the same location are grouped so they can be listed
+            const locations = new Map();
+            for (const feature of data.features) {
+                const [lng, lat] = feature.geometry.coordinates;
+                const location = lat + ',' + lng;
+
+                if (!loaded_locations.has(location)) {
+                    if (!locations.has(location)) {
+                        locations.set(location, []);
+                    }
+                    locations.get(location).push(Object.assign({lat: lat, lng: lng}, feature.properties));
+                }
+            }
+
+            for (const [location, members] of locations) {
+                loaded_locations.add(location);
+
+                if (members.length === 1) {
+                    markers.push(createMarker(map, members[0]));
+                    continue;
+                }
+
+                const counts = {};
+                for (const member of members) {
+                    counts[member.type] = (counts[member.type] || 0) + 1;
+                }
+
+                markers.push(createClusterMarker(map, {
+                    lat: members[0].lat,
+                    lng: members[0].lng,
+                    count: members.length,
+                    counts: counts,
+                    members: members
+                }));
+            }
+
+            updateMarkerVisibility();
+        });
+}
+
+/**
+ * Replace the markers on the map with clusters for the current zoom level.
+ */
+function loadClusters() {
+    const zoom = map.getZoom();
+    if (zoom === loaded_zoom) {
+        return;
+    }
+    loaded_zoom = zoom;
+
+    const url = document.getElementById('map').dataset.url + '?zoom=' + zoom;
+
+    fetch(url, {credentials: 'same-origin'})
+        .then(response => response.json())
+        .then(data => {
+            // Ignore if the map has been zoomed again while loading
+            if (map.getZoom() !== zoom) {
+                return;
+            }
+
+            clearMarkers();
+
+            for (const cluster of data.clusters) {
+                markers.push(createClusterMarker(map, cluster));
+            }
+
+            updateMarkerVisibility();
+        });
+}
+
+function createClusterMarker(map, cluster) {
+    if (cluster.count === 1) {
+        return createMarker(map, cluster.members[0]);
+    }
+
+    const marker = new google.maps.Marker({
+        position: new google.maps.LatLng(cluster.lat, cluster.lng),
+        map: map,
+        icon: {
+            path: google.maps.SymbolPath.CIRCLE,
+            strokeColor: marker_edge_colour,
+            strokeWeight: marker_edge_width,
+            strokeOpacity: marker_edge_alpha,
+            fillColor: cluster.counts.Person ? '#0099cc' : '#669933',
+            fillOpacity: marker_fill_alpha,
+            scale: marker_scale + 3 * Math.log2(cluster.count)
+        },
+        label: {
+            text: cluster.count.toString(),
+            color: 'white'
+        }
+    });
+
+    marker.cluster = cluster;
+
+    if (cluster.members) {
+        // Markers at the same location can't be separated by zooming - so list them
+        marker.info = new google.maps.InfoWindow();
+
+        google.maps.event.addListener(marker, 'click', function () {
+            if (selected_marker_info) {
+                selected_marker_info.close();
+            }
+
+            const items = this.cluster.members.filter(member => !hidden_types.has(member.type)).map(
+                member => "<li><a href=" + member.url + ">" + member.name.replace('&apos;', "'") + "</a></li>"
+            );
+
+            this.info.setContent("<div id='content'><ul>" + items.join('') + "</ul></div>");
+            selected_marker_info = this.info;
+            this.info.open(map, this);
+        });
+
+    } else {
+        google.maps.event.addListener(marker, 'click', function () {
+            const bounds = this.cluster.bounds;
+            map.fitBounds(new google.maps.LatLngBounds(
+                {lat: bounds.south, lng: bounds.west},
+                {lat: bounds.north, lng: bounds.east}
+            ));
+        });
+    }
+
+    return marker;
+}
+
+/**
+ * Show or hide all markers of a type.
+ */
+function toggleMarkerType(type) {
+    if (hidden_types.has(type)) {
+        hidden_types.delete(type);
+    } else {
+        hidden_types.add(type);
+    }
+
+    updateMarkerVisibility();
+}
+
+/**
+ * Hide markers of hidden types and update the size of clusters containing them.
+ */
+function updateMarkerVisibility() {
+    for (const marker of markers) {
+        if (!marker.cluster) {
+            marker.setVisible(!hidden_types.has(marker.type));
+            continue;
+        }
+
+        let count = 0;
+        for (const [type, type_count] of Object.entries(marker.cluster.counts)) {
+            if (!hidden_types.has(type)) {
+                count += type_count;
+            }
+        }
+
+        marker.setVisible(count > 0);
+        marker.setLabel({text: count.toString(), color: 'white'});
+    }
+}
+
 /**
  * Zoom to set level if map is zoomed in more than this.
  */
@@ -9,8 +9,18 @@ var organisation_edges;
 var anonymise_people = false;
 var anonymise_organisations = false;
 
+// Number of most central nodes to list with the network metrics
+var n_central_nodes = 10;
+
+// Colours used to highlight differences from the comparison date
+var diff_colours = {
+    added: '#28a745',
+    changed: '#ffc107',
+    removed: '#dc3545'
+};
+
 function nodeSize (ele) {
-    return 100 + 20 * ele.connectedEdges().length;
+    return 100 + 20 * ele.data('degree');
 }
 
 var network_style = [
@@ -34,7 +44,7 @@ var network_style = [
                 return 0.8 * nodeSize(ele);
             },
             fontSize: function (ele) {
-                return (16 + ele.connectedEdges().length).toString() + 'rem';
+                return (16 + ele.data('degree')).toString() + 'rem';
             },
             backgroundColor: 'data(nodeColor)',
             shape: 'data(nodeShape)',
@@ -48,7 +58,7 @@ var network_style = [
                 return 0.8 * nodeSize(ele);
             },
             fontSize: function (ele) {
-                return (50 + ele.connectedEdges().length).toString() + 'rem';
+                return (50 + ele.data('degree')).toString() + 'rem';
             },
             zIndex: 100,
         }
@@ -62,6 +72,70 @@ var network_style = [
             lineColor: 'data(lineColor)',
             opacity: 0.9
         }
+    },
+    {
+        selector: 'node[kind = "cluster"]',
+        style: {
+            borderWidth: 8,
+            borderColor: '#0099cc',
+            borderStyle: 'double'
+        }
+    },
+    {
+        selector: 'edge[weight]',
+        style: {
+            label: 'data(weight)',
+            fontSize: '24rem',
+            width: function (ele) {
+                return 4 + 4 * Math.sqrt(ele.data('weight'));
+            }
+        }
+    },
+    {
+        selector: 'node.added',
+        style: {
+            borderWidth: 12,
+            borderColor: diff_colours.added
+        }
+    },
+    {
+        selector: 'node.changed',
+        style: {
+            borderWidth: 12,
+            borderColor: diff_colours.changed
+        }
+    },
+    {
+        selector: 'node.removed',
+        style: {
+            borderWidth: 12,
+            borderStyle: 'dashed',
+            borderColor: diff_colours.removed,
+            opacity: 0.3
+        }
+    },
+    {
+        selector: 'edge.added',
+        style: {
+            width: 8,
+            lineColor: diff_colours.added
+        }
+    },
+    {
+        selector: 'edge.changed',
+        style: {
+            width: 8,
+            lineColor: diff_colours.changed
+        }
+    },
+    {
+        selector: 'edge.removed',
+        style: {
+            width: 8,
+            lineStyle: 'dashed',
+            lineColor: diff_colours.removed,
+            opacity: 0.3
+        }
     }
 ]
 
@@ -104,13 +178,21 @@ function toggle_anonymise_organisations() {
 }
 
 /**
- * Populate a Cytoscape network from :class:`Person` and :class:`Relationship` JSON embedded in page.
+ * Initialise Cytoscape and request the :class:`Person` and :class:`Relationship` network from the server.
+ *
+ * The network is filtered using the same parameters as the filter form on the page.
  */
 function get_network() {
+    var container = document.getElementById('cy');
+
+    if (cy) {
+        cy.destroy();
+    }
+
     // Initialise Cytoscape graph
     // See https://js.cytoscape.org/ for documentation
     cy = cytoscape({
-        container: document.getElementById('cy'),
+        container: container,
         style: network_style,
         wheelSensitivity: 0.2
     });
@@ -118,104 +200,255 @@ function get_network() {
     // Add pan + zoom widget with cytoscape-panzoom
     cy.panzoom();
 
-    // Load people and add to graph
-    var person_set = JSON.parse(document.getElementById('person-set-data').textContent);
+    var params = $('#network-filter-form').serializeArray().filter(function (param) {
+        return param.name !== 'csrfmiddlewaretoken';
+    });
+
+    var ego = $('#id_ego').val();
+
+    if (ego) {
+        // Ego network URL is for person 0 - replace with the selected person
+        var url = container.dataset.egoUrl.replace(/0$/, ego);
+
+        $.getJSON(url, $.param(params)).done(function (data) {
+            draw_network(data);
+            cy.getElementById('person-' + ego).select();
+        });
+        return;
+    }
+
+    var aggregate = $('#id_aggregate').val();
+
+    if (aggregate === 'top') {
+        $.getJSON(container.dataset.aggregateUrl, $.param(params)).done(draw_network);
+        return;
+    }
+
+    if (aggregate) {
+        $.getJSON(container.dataset.aggregateUrl, $.param(params)).done(draw_aggregate);
+        return;
+    }
+
+    $.getJSON(container.dataset.url, $.param(params)).done(function (data) {
+        draw_network(data);
+        get_metrics($.param(params));
+
+        if ($('#id_compare_date').val()) {
+            get_diff(container.dataset.diffUrl, $.param(params));
+        }
+    });
+}
+
+/**
+ * Request changes to the network since the comparison date from the server and highlight them.
+ *
+ * Elements which have been removed since the comparison date are shown faded.
+ */
+function get_diff(url, params) {
+    $.getJSON(url, params).done(function (diff) {
+        for (var status of ['added', 'changed']) {
+            for (var element of diff[status]) {
+                cy.getElementById(element.id).addClass(status);
+            }
+        }
+
+        // Add nodes before edges so that removed edges can connect to removed nodes
+        var removed = diff.removed.filter(function (element) {
+            return cy.getElementById(element.id).empty();
+        }).sort(function (a, b) {
+            return (a.group === 'edges') - (b.group === 'edges');
+        });
+
+        for (var element of removed) {
+            try {
+                cy.add({
+                    group: element.group,
+                    data: Object.assign({
+                        degree: 0,
+                        nodeColor: 'grey',
+                        nodeShape: element.kind === 'organisation' ? 'rectangle' : 'ellipse',
+                        lineColor: 'grey',
+                        lineArrowShape: 'triangle'
+                    }, element),
+                    position: element.position ? {x: element.position[0], y: element.position[1]} : undefined,
+                    classes: 'removed'
+                });
+            } catch (exc) {
+                // Exception thrown if a node in the relationship is not shown
+            }
+        }
+    });
+}
+
+/**
+ * Request metrics for the network from the server and display them.
+ */
+function get_metrics(params) {
+    var container = document.getElementById('network-metrics');
+
+    $.getJSON(container.dataset.url, params).done(function (metrics) {
+        var suffix = metrics.approximate ? ' (approximate)' : '';
+        $('#metric-components').text(metrics.components);
+        $('#metric-bridges').text(metrics.bridges.length);
+        $('#metric-articulation-points').text(metrics.articulation_points.length);
+
+        var central = Object.keys(metrics.nodes).sort(function (a, b) {
+            return metrics.nodes[b].betweenness - metrics.nodes[a].betweenness;
+        }).slice(0, n_central_nodes);
+
+        var list = $('#metric-central').empty();
+        for (var id of central) {
+            list.append($('<li>').text(
+                cy.getElementById(id).data('name') + ' - betweenness ' + metrics.nodes[id].betweenness + suffix
+            ));
+        }
+    });
+}
 
-    for (var person of person_set) {
-        cy.add({
+/**
+ * Add a table of nodes from the compact network format to the graph.
+ *
+ * Node tables contain parallel arrays of primary keys, names, positions and degrees.
+ */
+function add_nodes(table, kind, nodeColor, nodeShape) {
+    var nodes = [];
+
+    for (var i = 0; i < table.id.length; i++) {
+        nodes.push({
             group: 'nodes',
             data: {
-                id: 'person-' + person.pk.toString(),
-                name: person.name,
-                kind: 'person',
-                nodeColor: '#0099cc',
-                nodeShape: 'ellipse'
-            }
-        })
+                id: kind + '-' + table.id[i].toString(),
+                name: table.name[i],
+                degree: table.degree[i],
+                kind: kind,
+                nodeColor: nodeColor,
+                nodeShape: nodeShape
+            },
+            position: {x: table.x[i], y: table.y[i]}
+        });
     }
 
-    // Load organisations and add to graph
-    var organisation_set = JSON.parse(document.getElementById('organisation-set-data').textContent);
+    return cy.add(nodes);
+}
 
-    for (var item of organisation_set) {
-        cy.add({
-            group: 'nodes',
+/**
+ * Add a table of edges from the compact network format to the graph.
+ *
+ * Edge tables contain parallel arrays of primary keys and indices into the source and target node tables.
+ */
+function add_edges(table, prefix, sources, targets, kind, lineColor) {
+    var edges = [];
+
+    for (var i = 0; i < table.id.length; i++) {
+        edges.push({
+            group: 'edges',
             data: {
-                id: 'organisation-' + item.pk.toString(),
-                name: item.name,
-                kind: 'organisation',
-                nodeColor: '#669933',
-                nodeShape: 'rectangle'
+                id: prefix + table.id[i].toString(),
+                source: sources[table.source[i]].id(),
+                target: targets[table.target[i]].id(),
+                kind: kind,
+                lineColor: lineColor,
+                lineArrowShape: 'triangle'
             }
-        })
+        });
     }
-    organisation_nodes = cy.nodes('[kind = "organisation"]');
 
-    // Load relationships and add to graph
-    var relationship_set = JSON.parse(document.getElementById('relationship-set-data').textContent);
-
-    for (var relationship of relationship_set) {
-        try {
-            cy.add({
-                group: 'edges',
-                data: {
-                    id: 'relationship-' + relationship.pk.toString(),
-                    source: 'person-' + relationship.source.pk.toString(),
-                    target: 'person-' + relationship.target.pk.toString(),
-                    kind: 'person',
-                    lineColor: {
-                        'organisation-membership': '#669933'
-                    }[relationship.kind] || 'grey',
-                    lineArrowShape: 'triangle'
-                }
-            })
-        } catch (exc) {
-            // Exception thrown if a node in the relationship does not exist
-            // This is probably because it's been filtered out
-        }
+    return cy.add(edges);
+}
+
+/**
+ * Populate the Cytoscape network from the compact :class:`Person` and :class:`Relationship` JSON.
+ *
+ * Nodes are placed at positions computed on the server.
+ */
+function draw_network(data) {
+    cy.startBatch();
+
+    var people = add_nodes(data.people, 'person', '#0099cc', 'ellipse');
+    organisation_nodes = add_nodes(data.organisations, 'organisation', '#669933', 'rectangle');
+
+    add_edges(data.relationships, 'relationship-', people, people, 'person', 'grey');
+
+    organisation_edges = add_edges(
+        data.organisation_relationships, 'organisation-relationship-',
+        people, organisation_nodes, 'organisation', 'black'
+    ).union(add_edges(
+        data.memberships, 'organisation-relationship-membership-',
+        people, organisation_nodes, 'organisation', '#669933'
+    ));
+
+    cy.endBatch();
+    cy.fit();
+
+    setTimeout(function () {
+        document.getElementById('cy').style.height = '100%';
+    }, 1000)
+}
+
+/**
+ * Populate the Cytoscape network from aggregated network JSON.
+ *
+ * Clusters may be expanded, one at a time, by clicking on them.
+ */
+function draw_aggregate(data) {
+    var nodes = data.nodes;
+    var elements = [];
+
+    for (var i = 0; i < nodes.id.length; i++) {
+        elements.push({
+            group: 'nodes',
+            data: {
+                id: nodes.id[i],
+                name: nodes.kind[i] === 'cluster' ? nodes.name[i] + ' (' + nodes.size[i] + ')' : nodes.name[i],
+                degree: Math.round(10 * Math.sqrt(nodes.size[i])),
+                kind: nodes.kind[i],
+                nodeColor: nodes.kind[i] === 'organisation' ? '#669933' : '#0099cc',
+                nodeShape: nodes.kind[i] === 'organisation' ? 'rectangle' : 'ellipse'
+            },
+            position: {x: nodes.x[i], y: nodes.y[i]}
+        });
     }
 
-    // Load organisation relationships and add to graph
-    relationship_set = JSON.parse(document.getElementById('organisation-relationship-set-data').textContent);
-
-    for (var relationship of relationship_set) {
-        try {
-            cy.add({
-                group: 'edges',
-                data: {
-                    id: 'organisation-relationship-' + relationship.pk.toString(),
-                    source: 'person-' + relationship.source.pk.toString(),
-                    target: 'organisation-' + relationship.target.pk.toString(),
-                    kind: 'organisation',
-                    lineColor: {
-                        'organisation-membership': '#669933'
-                    }[relationship.kind] || 'black',
-                    lineArrowShape: 'triangle'
-                }
-            })
-        } catch (exc) {
-            // Exception thrown if a node in the relationship does not exist
-            // This is probably because it's been filtered out
-        }
+    var edges = data.edges;
+
+    for (var i = 0; i < edges.source.length; i++) {
+        var target_kind = nodes.kind[edges.target[i]];
+
+        elements.push({
+            group: 'edges',
+            data: {
+                id: 'edge-' + i.toString(),
+                source: nodes.id[edges.source[i]],
+                target: nodes.id[edges.target[i]],
+                weight: edges.weight[i],
+                kind: target_kind === 'organisation' ? 'organisation' : 'person',
+                lineColor: target_kind === 'organisation' ? 'black' : 'grey',
+                lineArrowShape: 'triangle'
+            }
+        });
     }
+
+    cy.add(elements);
+    organisation_nodes = cy.nodes('[kind = "organisation"]');
     organisation_edges = cy.edges('[kind = "organisation"]');
 
-    // Optimise graph layout
-    var layout = cy.layout({
-        name: 'cose',
-        randomize: false,
-        animate: false,
-        nodeRepulsion: function (node) {
-            return 2 ** node.connectedEdges().length;
-        },
-        nodeOverlap: 80
+    cy.on('tap', 'node[kind = "cluster"]', function (event) {
+        $('#id_expand').val(event.target.id());
+        get_network();
     });
 
-    layout.run();
+    cy.fit();
 
     setTimeout(function () {
         document.getElementById('cy').style.height = '100%';
     }, 1000)
 }
 
-$(window).on('load', get_network());
+$(window).on('load', function () {
+    // Expanded cluster belongs to the previous type of aggregation
+    $('#id_aggregate').on('change', function () {
+        $('#id_expand').val('');
+    });
+
+    get_network();
+});
@@ -0,0 +1,30 @@
+/**
+ * Request chains of contacts from the current user to the person whose profile is shown and list them.
+ */
+function get_paths() {
+    var container = document.getElementById('paths');
+    var list = $('#path-list').empty();
+
+    $.getJSON(container.dataset.url, $('#path-form').serialize()).done(function (data) {
+        if (data.paths.length === 0) {
+            list.append($('<li>').text('No known chain of contacts'));
+        }
+
+        for (var path of data.paths) {
+            var names = path.map(function (node) {
+                return node.name;
+            });
+
+            list.append($('<li>').text(names.join(' → ')));
+        }
+    }).fail(function () {
+        list.append($('<li>').text('Not in the current network'));
+    });
+}
+
+$(window).on('load', function () {
+    if (document.getElementById('paths')) {
+        $('#id_weight').on('change', get_paths);
+        get_paths();
+    }
+});
@@ -88,7 +88,39 @@ urlpatterns = [
          views.map.MapView.as_view(),
          name='map'),
 
+    path('map/clusters',
+         views.map.MapClustersView.as_view(),
+         name='map.clusters'),
+
+    path('map/features',
+         views.map.MapFeaturesView.as_view(),
+         name='map.features'),
+
     path('network',
          views.network.NetworkView.as_view(),
          name='network'),
+
+    path('network/data',
+         views.network.NetworkDataView.as_view(),
+         name='network.data'),
+
+    path('network/analytics',
+         views.network.NetworkAnalyticsView.as_view(),
+         name='network.analytics'),
+
+    path('network/diff',
+         views.network.NetworkDiffView.as_view(),
+         name='network.diff'),
+
+    path('network/aggregate',
+         views.network.NetworkAggregateView.as_view(),
+         name='network.aggregate'),
+
+    path('network/ego/<int:pk>',
+         views.network.NetworkEgoView.as_view(),
+         name='network.ego'),
+
+    path('network/path/<int:pk>',
+         views.network.NetworkPathView.as_view(),
+         name='network.path'),
 ]
@@ -2,51 +2,64 @@ import typing
 
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.models import QuerySet
+from django.http import JsonResponse
 from django.urls import reverse
 from django.utils import timezone
-from django.views.generic import TemplateView
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
+from django.views.generic import TemplateView, View
 
-from people import forms, models, permissions
+from people import forms, geo, models, permissions
 
 
 def get_map_data(obj: typing.Union[models.Person, models.Organisation]) -> typing.Dict[str, typing.Any]:
     """Prepare data to mark people or organisations on a map."""
-    answer_set = obj.current_answers
-    organisation = getattr(answer_set, 'organisation', None)
+    if isinstance(obj, models.Person):
+        markers = geo.build_markers(people=models.Person.objects.filter(pk=obj.pk),
+                                    organisations=models.Organisation.objects.none())
 
-    try:
-        country = answer_set.country_of_residence.name
+    else:
+        markers = geo.build_markers(people=models.Person.objects.none(),
+                                    organisations=models.Organisation.objects.filter(pk=obj.pk))
 
-    except AttributeError:
-        country = None
-
-    return {
-        'name': obj.name,
-        'lat': getattr(answer_set, 'latitude', None),
-        'lng': getattr(answer_set, 'longitude', None),
-        'organisation': getattr(organisation, 'name', None),
-        'org_lat': getattr(organisation, 'latitude', None),
-        'org_lng': getattr(organisation, 'longitude', None),
-        'country': country,
-        'url': obj.get_absolute_url(),
-        'type': type(obj).__name__,
-    }
+    return markers[0]
 
 
 class MapView(LoginRequiredMixin, TemplateView):
-    """View displaying a map of :class:`Person` and :class:`Organisation` locations."""
+    """View displaying a map of :class:`Person` and :class:`Organisation` locations.
+
+    Markers are loaded separately, in clusters, from :class:`MapClustersView`.
+    """
     template_name = 'people/map.html'
 
-    def get_context_data(self,
-                         **kwargs: typing.Any) -> typing.Dict[str, typing.Any]:
-        context = super().get_context_data(**kwargs)
 
-        map_markers = []
+@method_decorator(gzip_page, name='dispatch')
+class MapClustersView(LoginRequiredMixin, View):
+    """View returning clusters of :class:`Person` and :class:`Organisation` markers as JSON."""
+    def get(self, request, *args, **kwargs):
+        form = forms.MapClusterForm(data=request.GET)
+        if not form.is_valid():
+            return JsonResponse(form.errors, status=400)
+
+        return JsonResponse({'clusters': geo.get_clusters(form.cleaned_data['zoom'])})
+
+
+@method_decorator(gzip_page, name='dispatch')
+class MapFeaturesView(LoginRequiredMixin, View):
+    """View returning :class:`Person` and :class:`Organisation` markers within an area as GeoJSON.
+
+    The area is either a bounding box, or a location and radius in kilometres.
+    """
+    def get(self, request, *args, **kwargs):
+        form = forms.MapFeaturesForm(data=request.GET)
+        if not form.is_valid():
+            return JsonResponse(form.errors, status=400)
+
+        if form.cleaned_data['bbox'] is not None:
+            points = geo.find_points(form.cleaned_data['bbox'])
 
-        map_markers.extend(
-            get_map_data(person) for person in models.Person.objects.all())
-        map_markers.extend(
-            get_map_data(org) for org in models.Organisation.objects.all())
-        context['map_markers'] = map_markers
+        else:
+            points = geo.find_points_within(form.cleaned_data['lat'], form.cleaned_data['lng'],
+                                            form.cleaned_data['radius'])
 
-        return context
+        return JsonResponse(geo.to_geojson(points))
@@ -5,69 +5,25 @@ Views for displaying networks of :class:`People` and :class:`Relationship`s.
 import logging
 
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q, QuerySet
+from django.core.exceptions import ObjectDoesNotExist
 from django.forms import ValidationError
-from django.utils import timezone
-from django.views.generic import TemplateView
+from django.http import Http404, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag
+from django.views.decorators.gzip import gzip_page
+from django.views.generic import TemplateView, View
 
-from people import forms, models, serializers
+from people import aggregation, analytics, forms, graph, network
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
+#: Parameters for encoding JSON responses without unnecessary whitespace
+COMPACT_JSON = {'separators': (',', ':')}
 
-def filter_by_form_answers(queryset: QuerySet, answerset_queryset: QuerySet, relationship_key: str):
-    """Build a filter to select based on form responses."""
-    def inner(form, at_date=None):
-        # Filter on timestamp__date doesn't seem to work on MySQL
-        # To compare datetimes we need at_date to be midnight at
-        # the *end* of the day in question - so add one day
-
-        if not at_date:
-            at_date = timezone.now().date()
-        at_date += timezone.timedelta(days=1)
-
-        # Filter to answersets valid at required time
-        answerset_set = answerset_queryset.prefetch_related('question_answers').filter(
-            Q(replaced_timestamp__gte=at_date)
-            | Q(replaced_timestamp__isnull=True),
-            timestamp__lte=at_date
-        )
-
-        # Filter to answersets containing required answers
-        for field, values in form.cleaned_data.items():
-            if field.startswith(f'{form.question_prefix}question_') and values:
-                answerset_set = answerset_set.filter(question_answers__in=values)
-
-        return queryset.filter(pk__in=answerset_set.values_list(relationship_key, flat=True))
-
-    return inner
-
-
-filter_relationships = filter_by_form_answers(
-    models.Relationship.objects.prefetch_related('source', 'target'),
-    models.RelationshipAnswerSet.objects, 'relationship'
-)
-
-filter_organisations = filter_by_form_answers(
-    models.Organisation.objects, models.OrganisationAnswerSet.objects, 'organisation'
-)
-
-filter_people = filter_by_form_answers(
-    models.Person.objects, models.PersonAnswerSet.objects, 'person'
-)
-
-
-class NetworkView(LoginRequiredMixin, TemplateView):
-    """View to display relationship network."""
-    template_name = 'people/network.html'
-
-    def post(self, request, *args, **kwargs):
-        all_forms = self.get_forms()
-        if all(map(lambda f: f.is_valid(), all_forms.values())):
-            return self.forms_valid(all_forms)
-
-        return self.forms_invalid(all_forms)
 
+class NetworkFilterMixin:
+    """Mixin providing the forms used to filter the network."""
     def get_forms(self):
         form_kwargs = self.get_form_kwargs()
 
@@ -90,8 +46,23 @@ class NetworkView(LoginRequiredMixin, TemplateView):
 
         return kwargs
 
+
+class NetworkView(LoginRequiredMixin, NetworkFilterMixin, TemplateView):
+    """View to display relationship network.
+
+    The network itself is loaded separately from :class:`NetworkDataView`.
+    """
+    template_name = 'people/network.html'
+
+    def post(self, request, *args, **kwargs):
+        all_forms = self.get_forms()
+        if all(map(lambda f: f.is_valid(), all_forms.values())):
+            return self.forms_valid(all_forms)
+
+        return self.forms_invalid(all_forms)
+
     def get_context_data(self, **kwargs):
-        """Add filtered QuerySets of :class:`Person` and :class:`Relationship` to the context."""
+        """Add network filter forms to the context."""
         context = super().get_context_data(**kwargs)
         context['full_width_page'] = True
 
@@ -101,47 +72,17 @@ class NetworkView(LoginRequiredMixin, TemplateView):
         context['organisation_form'] = all_forms['organisation']
         context['date_form'] = all_forms['date']
 
-        if not all(map(lambda f: f.is_valid(), all_forms.values())):
-            return context
-
-        date = all_forms['date'].cleaned_data['date']
-
-        context['person_set'] = serializers.PersonSerializer(
-            filter_people(all_forms['person'], at_date=date), many=True
-        ).data
-
-        context['organisation_set'] = serializers.OrganisationSerializer(
-            filter_organisations(all_forms['organisation'], at_date=date), many=True
-        ).data
-
-        context['relationship_set'] = serializers.RelationshipSerializer(
-            filter_relationships(all_forms['relationship'], at_date=date), many=True
-        ).data
-
-        context['organisation_relationship_set'] = serializers.OrganisationRelationshipSerializer(
-            models.OrganisationRelationship.objects.prefetch_related('source', 'target').all(),
-            many=True
-        ).data
-
-        for person in models.Person.objects.all():
-            try:
-                context['organisation_relationship_set'].append(
-                    {
-                        'pk': f'membership-{person.pk}',
-                        'source': serializers.PersonSerializer(person).data,
-                        'target': serializers.OrganisationSerializer(
-                            person.current_answers.organisation
-                        ).data,
-                        'kind': 'organisation-membership'
-                    }
-                )
-
-            except AttributeError:
-                pass
-
-        logger.info(
-            'Found %d distinct relationships matching filters', len(context['relationship_set'])
-        )
+        # Comparison date doesn't affect which network is shown so isn't a filter form
+        context['compare_form'] = forms.NetworkCompareForm(**self.get_form_kwargs())
+        context['aggregate_form'] = forms.NetworkAggregateForm(**self.get_form_kwargs())
+        context['ego_form'] = forms.NetworkEgoForm(**self.get_form_kwargs())
+
+        # Validate forms so that errors are displayed
+        for form in [
+            *all_forms.values(), context['compare_form'], context['aggregate_form'],
+            context['ego_form']
+        ]:
+            form.is_valid()
 
         return context
 
@@ -154,3 +95,173 @@ class NetworkView(LoginRequiredMixin, TemplateView):
 
     def forms_invalid(self, all_forms):
         return self.render_to_response(self.get_context_data())
+
+
+@method_decorator(gzip_page, name='dispatch')
+class NetworkDataView(LoginRequiredMixin, NetworkFilterMixin, View):
+    """View returning the filtered relationship network as JSON.
+
+    Accepts the same filter parameters as :class:`NetworkView`.
+    The network is returned in the compact columnar format described by :data:`network.Snapshot`.
+    Responses carry an ETag which changes with the underlying data so repeat requests
+    may be answered with '304 Not Modified'.
+    """
+    def get(self, request, *args, **kwargs):
+        all_forms = self.get_forms()
+        if not all(map(lambda f: f.is_valid(), all_forms.values())):
+            return JsonResponse(
+                {name: form.errors for name, form in all_forms.items()}, status=400
+            )
+
+        key = network.snapshot_key(all_forms)
+        etag = quote_etag(key.rsplit('.', 1)[-1])
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            snapshot = network.get_snapshot(all_forms, key=key)
+            logger.info(
+                'Found %d distinct relationships matching filters',
+                len(snapshot['relationships']['id'])
+            )
+
+            response = JsonResponse(snapshot, json_dumps_params=COMPACT_JSON)
+
+        response['ETag'] = etag
+        # Browser must revalidate every time, but may reuse its copy if we respond 304
+        patch_cache_control(response, private=True, no_cache=True)
+
+        return response
+
+
+@method_decorator(gzip_page, name='dispatch')
+class NetworkAnalyticsView(LoginRequiredMixin, NetworkFilterMixin, View):
+    """View returning metrics of the filtered relationship network as JSON.
+
+    Accepts the same filter parameters as :class:`NetworkView`.
+    """
+    def get(self, request, *args, **kwargs):
+        all_forms = self.get_forms()
+        if not all(map(lambda f: f.is_valid(), all_forms.values())):
+            return JsonResponse(
+                {name: form.errors for name, form in all_forms.items()}, status=400
+            )
+
+        return JsonResponse(analytics.get_metrics(all_forms), json_dumps_params=COMPACT_JSON)
+
+
+@method_decorator(gzip_page, name='dispatch')
+class NetworkDiffView(LoginRequiredMixin, NetworkFilterMixin, View):
+    """View returning the changes to the filtered relationship network since an earlier date as
+    JSON.
+
+    Accepts the same filter parameters as :class:`NetworkView`, plus a 'compare_date'.
+    Only elements which differ between the two dates are returned.
+    """
+    def get(self, request, *args, **kwargs):
+        all_forms = self.get_forms()
+        compare_form = forms.NetworkCompareForm(**self.get_form_kwargs())
+
+        if not all(map(lambda f: f.is_valid(), [*all_forms.values(), compare_form])):
+            errors = {name: form.errors for name, form in all_forms.items()}
+            errors['compare'] = compare_form.errors
+            return JsonResponse(errors, status=400)
+
+        compare_date = compare_form.cleaned_data['compare_date']
+        if compare_date is None:
+            return JsonResponse({'compare': {'compare_date': ['This field is required.']}},
+                                status=400)
+
+        return JsonResponse(network.get_diff(all_forms, compare_date),
+                            json_dumps_params=COMPACT_JSON)
+
+
+@method_decorator(gzip_page, name='dispatch')
+class NetworkAggregateView(LoginRequiredMixin, NetworkFilterMixin, View):
+    """View returning a simplified version of the filtered relationship network as JSON.
+
+    Accepts the same filter parameters as :class:`NetworkView`, plus those of
+    :class:`forms.NetworkAggregateForm`.
+    People may be grouped into clusters, one of which may be expanded, or only the most connected
+    people may be returned - in the same format as :class:`NetworkDataView`.
+    """
+    def get(self, request, *args, **kwargs):
+        all_forms = self.get_forms()
+        aggregate_form = forms.NetworkAggregateForm(**self.get_form_kwargs())
+
+        if not all(map(lambda f: f.is_valid(), [*all_forms.values(), aggregate_form])):
+            errors = {name: form.errors for name, form in all_forms.items()}
+            errors['aggregate'] = aggregate_form.errors
+            return JsonResponse(errors, status=400)
+
+        grouping = aggregate_form.cleaned_data['aggregate']
+        if not grouping:
+            return JsonResponse({'aggregate': {'aggregate': ['This field is required.']}},
+                                status=400)
+
+        if grouping == 'top':
+            result = aggregation.get_top(
+                all_forms, aggregate_form.cleaned_data['top_k'] or aggregation.TOP_K_DEFAULT
+            )
+
+        else:
+            result = aggregation.get_aggregate(
+                all_forms, grouping, aggregate_form.cleaned_data['expand'] or None
+            )
+
+        return JsonResponse(result, json_dumps_params=COMPACT_JSON)
+
+
+@method_decorator(gzip_page, name='dispatch')
+class NetworkEgoView(LoginRequiredMixin, NetworkFilterMixin, View):
+    """View returning the part of the filtered relationship network around a person as JSON.
+
+    Accepts the same filter parameters as :class:`NetworkView`, plus a number of 'hops'.
+    The network is returned in the same format as :class:`NetworkDataView`.
+    """
+    def get(self, request, *args, **kwargs):
+        all_forms = self.get_forms()
+        ego_form = forms.NetworkEgoForm(**self.get_form_kwargs())
+
+        if not all(map(lambda f: f.is_valid(), [*all_forms.values(), ego_form])):
+            errors = {name: form.errors for name, form in all_forms.items()}
+            errors['ego'] = ego_form.errors
+            return JsonResponse(errors, status=400)
+
+        snapshot = graph.get_ego_network(
+            all_forms, kwargs['pk'], ego_form.cleaned_data['hops'] or graph.DEFAULT_HOPS
+        )
+        if snapshot is None:
+            raise Http404('Person is not in the filtered network')
+
+        return JsonResponse(snapshot, json_dumps_params=COMPACT_JSON)
+
+
+@method_decorator(gzip_page, name='dispatch')
+class NetworkPathView(LoginRequiredMixin, NetworkFilterMixin, View):
+    """View returning chains of contacts from the current user to a person as JSON.
+
+    Accepts the same filter parameters as :class:`NetworkView`, plus an optional relationship
+    question by which to 'weight' the relationships.
+    """
+    def get(self, request, *args, **kwargs):
+        all_forms = self.get_forms()
+        path_form = forms.NetworkPathForm(**self.get_form_kwargs())
+
+        if not all(map(lambda f: f.is_valid(), [*all_forms.values(), path_form])):
+            errors = {name: form.errors for name, form in all_forms.items()}
+            errors['path'] = path_form.errors
+            return JsonResponse(errors, status=400)
+
+        try:
+            source = request.user.person
+
+        except ObjectDoesNotExist:
+            raise Http404('User has no linked person')
+
+        paths = graph.find_paths(
+            all_forms, source.pk, kwargs['pk'], question=path_form.cleaned_data['weight']
+        )
+        if paths is None:
+            raise Http404('Person is not in the filtered network')
+
+        return JsonResponse({'paths': paths}, json_dumps_params=COMPACT_JSON)
@@ -3,6 +3,7 @@ import typing
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import QuerySet
 from django.utils import timezone
 from django.views.generic import CreateView, DetailView, ListView, UpdateView
 
@@ -34,6 +35,9 @@ class OrganisationListView(LoginRequiredMixin, ListView):
     model = models.Organisation
     template_name = 'people/organisation/list.html'
 
+    def get_queryset(self) -> QuerySet:
+        return super().get_queryset().with_current_answers()
+
     @staticmethod
     def sort_organisation_countries(
         orgs_by_country: typing.MutableMapping[str, typing.Any]
@@ -99,7 +103,7 @@ class OrganisationListView(LoginRequiredMixin, ListView):
         try:
             existing_relationships = set(
                 self.request.user.person.organisation_relationships_as_source.filter(
-                    answer_sets__replaced_timestamp__isnull=True
+                    current_answer_set__isnull=False
                 ).values_list('target_id', flat=True)
             )
 
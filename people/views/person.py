@@ -43,7 +43,7 @@ class PersonListView(LoginRequiredMixin, ListView):
         try:
             existing_relationships = set(
                 self.request.user.person.relationships_as_source.filter(
-                    answer_sets__replaced_timestamp__isnull=True
+                    current_answer_set__isnull=False
                 ).values_list('target_id', flat=True)
             )
 
@@ -118,6 +118,16 @@ class ProfileView(LoginRequiredMixin, DetailView):
         except models.Relationship.DoesNotExist:
             pass
 
+        # Chains of contacts are found from the current user to this person
+        context['path_form'] = None
+        try:
+            if self.request.user.person != self.object:
+                context['path_form'] = forms.NetworkPathForm()
+
+        except ObjectDoesNotExist:
+            # No linked Person yet
+            pass
+
         return context
 
 
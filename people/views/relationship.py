@@ -3,12 +3,14 @@
 import typing
 
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
 from django.urls import reverse
 from django.utils import timezone
 from django.views.generic import DetailView, RedirectView, UpdateView
 from django.views.generic.detail import SingleObjectMixin
 
-from people import forms, models, permissions
+from export import changes, versioning
+from people import forms, models, network, permissions
 
 
 class RelationshipDetailView(permissions.UserIsLinkedPersonMixin, DetailView):
@@ -126,9 +128,18 @@ class RelationshipEndView(permissions.UserIsLinkedPersonMixin,
         now_date = timezone.now().date()
         relationship = self.get_object()
 
-        relationship.answer_sets.filter(
-            replaced_timestamp__isnull=True).update(
-                replaced_timestamp=now_date)
+        answer_sets = relationship.answer_sets.filter(replaced_timestamp__isnull=True)
+        ended = list(answer_sets.values_list('pk', flat=True))
+
+        with transaction.atomic():
+            answer_sets.update(replaced_timestamp=now_date, valid_to=now_date)
+            self.model.objects.filter(pk=relationship.pk).update_current_answers()
+
+        # QuerySet.update does not send signals
+        network.invalidate_snapshots()
+        versioning.invalidate()
+        changes.record(answer_sets.model, ended)
+        changes.record(self.model, [relationship.pk])
 
         return relationship.target.get_absolute_url()
 